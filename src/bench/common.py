@@ -0,0 +1,97 @@
+import os
+import types
+from typing import TYPE_CHECKING, Optional
+
+import asyncpg
+from discord.ext import commands
+from discord.ext.commands.view import StringView
+
+if TYPE_CHECKING:
+    from main import DebtBot
+
+# Above any real snowflake, everything at or over these ids was seeded
+USER_BASE = 9_000_000_000_000_000_000
+GUILD_BASE = 9_100_000_000_000_000_000
+
+
+async def connect() -> asyncpg.Connection:
+    """Connects to the database the bot would use."""
+    return await asyncpg.connect(
+        database=os.environ.get("DB_NAME") or "postgres",
+        user=os.environ.get("DB_USER") or "postgres",
+        host=os.environ.get("DB_HOST") or "localhost",
+        port=os.environ.get("DB_PORT") or 5432,
+        password=os.environ.get("DB_PASSWORD") or "postgres",
+    )
+
+
+class FakeUser:
+    """A user, with what the services and cogs read from one."""
+
+    def __init__(self, id: int) -> None:
+        self.id = id
+        self.name = self.display_name = f"bench-{id - USER_BASE}"
+        self.mention = f"<@{id}>"
+        self.accent_color = None
+        self.display_avatar = types.SimpleNamespace(url="https://cdn.discordapp.com")
+        self.bot = False
+
+
+class FakeGuild:
+    """A guild, with what the services and cogs read from one."""
+
+    def __init__(self, id: int, owner_id: int = 0) -> None:
+        self.id = id
+        self.owner_id = owner_id
+        self.shard_id = 0
+
+
+class FakeContext(commands.Context["DebtBot"]):
+    """
+    A context that never reaches discord, replies are only counted.
+
+    Attributes
+    ----------
+    replies : int
+        The amount of messages the command sent.
+    """
+
+    def __init__(
+        self,
+        bot: "DebtBot",
+        author: FakeUser,
+        guild: Optional[FakeGuild],
+        command: Optional[commands.Command] = None,
+    ) -> None:
+        message = types.SimpleNamespace(
+            _state=bot._connection,
+            id=0,
+            content=f"{bot.base_prefix}bench",
+            author=author,
+            guild=guild,
+            channel=None,
+        )
+        super().__init__(
+            message=message,  # type: ignore
+            bot=bot,
+            view=StringView(""),
+            prefix=bot.base_prefix,
+            command=command,
+        )
+        # Cached properties, these shadow them
+        self.author = author  # type: ignore
+        self.guild = guild  # type: ignore
+        self.replies = 0
+
+    async def reply(self, *_, **__) -> None:  # type: ignore
+        self.replies += 1
+
+    async def send(self, *_, **__) -> None:  # type: ignore
+        self.replies += 1
+
+
+def fake_interaction(
+    bot: "DebtBot", user: FakeUser, guild: Optional[FakeGuild]
+) -> types.SimpleNamespace:
+    """Returns an interaction with what autocompletions read from one."""
+    return types.SimpleNamespace(client=bot, user=user, guild=guild)
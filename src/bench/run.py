@@ -0,0 +1,382 @@
+"""
+Benchmarks the services and cogs against a seeded database.
+
+Usage, from `src/` after `python -m bench.seed`:
+    python -m bench.run --concurrency 50 --duration 30 --output results.json
+    python -m bench.run --compare results.json
+
+Under `STORAGE_BACKEND=memory` no database is needed, the storage is seeded
+in process with the seed's arguments and its snapshot is thrown away:
+    STORAGE_BACKEND=memory python -m bench.run --users 100000
+
+Every operation runs through fake contexts and interactions, nothing
+reaches discord. Throughput and latency percentiles are reported per
+operation and saved as JSON so runs on different commits can be compared.
+"""
+
+import argparse
+import asyncio
+import datetime
+import json
+import logging
+import os
+import random
+import statistics
+import subprocess
+import tempfile
+import time
+from collections import Counter, defaultdict
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+import discord
+
+from bench.common import (
+    GUILD_BASE,
+    USER_BASE,
+    FakeContext,
+    FakeGuild,
+    FakeUser,
+    fake_interaction,
+)
+from bench.seed import add_arguments, seed_memory
+from main import DebtBot
+from services import Account, Config, Currency
+from services.currency import CurrencyWithAmount
+from services.storage import MemoryStorage
+from utils import completions
+
+logger = logging.getLogger("bench.run")
+
+# Background jobs would skew the results
+SKIPPED_EXTENSIONS = ("cogs.maintenance", "cogs.utility")
+
+# Reported alongside the results, they change what is being measured
+SETTINGS = (
+    "DB_POOL_MIN",
+    "DB_POOL_MAX",
+    "WRITE_BEHIND_INTERVAL",
+    "LEDGER_BATCH_SIZE",
+    "SEARCH_BACKEND",
+    "STORAGE_BACKEND",
+    "MEMORY_SNAPSHOT_INTERVAL",
+    "CACHE_SIZE",
+)
+
+
+class Scenario:
+    """Picks random guilds, users and currencies out of the seed."""
+
+    def __init__(
+        self,
+        bot: DebtBot,
+        guilds: List[Tuple[int, List[int]]],
+        users: int,
+        names: Dict[int, str],
+        rng: random.Random,
+    ) -> None:
+        self.bot = bot
+        self.guilds = guilds
+        self.users = users
+        self.names = names
+        self.rng = rng
+
+    def user(self) -> FakeUser:
+        return FakeUser(USER_BASE + self.rng.randint(1, self.users))
+
+    def pick(self) -> Tuple[FakeContext, int]:
+        """Returns a context of a random user in a random guild, and one of its currencies."""
+        id, currencies = self.rng.choice(self.guilds)
+        ctx = FakeContext(self.bot, self.user(), FakeGuild(id))
+        return ctx, self.rng.choice(currencies)
+
+
+async def config_get(s: Scenario) -> None:
+    ctx, _ = s.pick()
+    await Config.get(ctx)
+
+
+async def currency_get(s: Scenario) -> None:
+    ctx, currency = s.pick()
+    await Currency.get(ctx, currency)
+
+
+async def account_get(s: Scenario) -> None:
+    ctx, currency = s.pick()
+    await Account.get(ctx, ctx.author, currency)
+
+
+async def account_add_money(s: Scenario) -> None:
+    ctx, currency = s.pick()
+    account = await Account.get(ctx, ctx.author, currency)
+    await account.add_money(1, reason="bench")
+
+
+async def account_transfer(s: Scenario) -> None:
+    ctx, currency = s.pick()
+    account, target = await asyncio.gather(
+        Account.get(ctx, ctx.author, currency), Account.get(ctx, s.user(), currency)
+    )
+    await account.transfer_money(1, target, reason="bench")
+
+
+async def resolve_currency(s: Scenario) -> None:
+    ctx, currency = s.pick()
+    await CurrencyWithAmount.convert(ctx, f"1,000 {s.names[currency]}")
+
+
+async def autocomplete(s: Scenario) -> None:
+    ctx, _ = s.pick()
+    interaction = fake_interaction(s.bot, ctx.author, ctx.guild)
+    await completions.currency_with_amount(interaction, "10 ben")  # type: ignore
+
+
+async def cog_balance(s: Scenario) -> None:
+    cog = s.bot.get_cog("Economy")
+    ctx, _ = s.pick()
+    await cog.balance.callback(cog, ctx, None, currency=None)  # type: ignore
+
+
+async def cog_pay(s: Scenario) -> None:
+    cog = s.bot.get_cog("Economy")
+    ctx, currency = s.pick()
+    amount = CurrencyWithAmount.from_currency(await Currency.get(ctx, currency), 1)
+    await cog.pay.callback(cog, ctx, s.user(), currency=amount)  # type: ignore
+
+
+async def cog_leaderboard(s: Scenario) -> None:
+    cog = s.bot.get_cog("Economy")
+    ctx, currency = s.pick()
+    await cog.leaderboard.callback(  # type: ignore
+        cog, ctx, await Currency.get(ctx, currency), s.rng.randint(1, 3)
+    )
+
+
+async def cog_currencies(s: Scenario) -> None:
+    cog = s.bot.get_cog("CurrencyCog")
+    ctx, _ = s.pick()
+    await cog.currencies.callback(cog, ctx)  # type: ignore
+
+
+OPERATIONS: Dict[str, Callable[[Scenario], Awaitable[None]]] = {
+    "config.get": config_get,
+    "currency.get": currency_get,
+    "account.get": account_get,
+    "account.add_money": account_add_money,
+    "account.transfer": account_transfer,
+    "resolver.convert": resolve_currency,
+    "autocomplete.currency_with_amount": autocomplete,
+    "cog.balance": cog_balance,
+    "cog.pay": cog_pay,
+    "cog.leaderboard": cog_leaderboard,
+    "cog.currencies": cog_currencies,
+}
+
+
+async def worker(
+    s: Scenario,
+    operations: List[str],
+    deadline: float,
+    latencies: Dict[str, List[float]],
+    errors: Dict[str, Counter],
+) -> None:
+    while time.perf_counter() < deadline:
+        name = s.rng.choice(operations)
+        start = time.perf_counter()
+        try:
+            await OPERATIONS[name](s)
+        except Exception as err:
+            errors[name][type(err).__name__] += 1
+        else:
+            latencies[name].append(time.perf_counter() - start)
+
+
+def summarize(latencies: List[float], errors: Counter, duration: float) -> Dict:
+    """Returns the throughput and latency percentiles of an operation, in milliseconds."""
+    result: Dict = {
+        "count": len(latencies),
+        "errors": dict(errors),
+        "throughput": len(latencies) / duration,
+    }
+    if len(latencies) >= 2:
+        cuts = statistics.quantiles(latencies, n=100)
+        result.update(
+            mean=statistics.fmean(latencies) * 1000,
+            p50=cuts[49] * 1000,
+            p95=cuts[94] * 1000,
+            p99=cuts[98] * 1000,
+            max=max(latencies) * 1000,
+        )
+    return result
+
+
+def commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def change(new: Optional[float], old: Optional[float]) -> str:
+    """Formats the relative change from a previous run, n/a without a baseline to compare to."""
+    if new is None or not old:
+        return f"{'n/a':>10}"
+    return f"{new / old - 1:>+10.1%}"
+
+
+def report(results: Dict, previous: Optional[Dict] = None) -> None:
+    header = (
+        f"{'operation':<36}{'ops/s':>10}{'p50':>10}{'p95':>10}{'p99':>10}{'errors':>8}"
+    )
+    print(header)
+    print("-" * len(header))
+    for name, r in results["operations"].items():
+        print(
+            f"{name:<36}{r['throughput']:>10.1f}{r.get('p50', 0):>8.2f}ms"
+            f"{r.get('p95', 0):>8.2f}ms{r.get('p99', 0):>8.2f}ms{sum(r['errors'].values()):>8}"
+        )
+        if previous and (old := previous["operations"].get(name)):
+            print(
+                f"{'  vs ' + str(previous.get('commit')):<36}"
+                + "".join(
+                    change(r.get(key), old.get(key))
+                    for key in ("throughput", "p50", "p95", "p99")
+                )
+            )
+
+
+async def load_seed(
+    bot: DebtBot, args: argparse.Namespace
+) -> Tuple[List[Tuple[int, List[int]]], int, Dict[int, str]]:
+    """Returns the seeded guilds with their currencies, the amount of users and the currency names."""
+    if isinstance(bot.storage, MemoryStorage):
+        await seed_memory(bot.storage, args)
+        await bot.search.load()
+        guilds = [
+            (GUILD_BASE + g, await bot.storage.fetch_config(GUILD_BASE + g))
+            for g in range(1, args.guilds + 1)
+        ]
+        names = {r["id"]: r["name"] for r in await bot.storage.list_currencies()}
+        return guilds, args.users, names
+
+    async with bot.pool.acquire() as con:
+        guilds = [
+            (r["guildid"], r["currencies"])
+            for r in await con.fetch(
+                """SELECT guildid, array_agg(currencyid ORDER BY position) AS currencies
+                FROM guild_currencies WHERE guildid >= $1 GROUP BY guildid LIMIT $2;""",
+                GUILD_BASE,
+                args.guilds,
+            )
+        ]
+        users = await con.fetchval(
+            "SELECT max(userid) - $1 FROM banks WHERE userid >= $1;", USER_BASE
+        )
+        names = {
+            r["id"]: r["name"]
+            for r in await con.fetch(
+                "SELECT id, name FROM currencies WHERE owner >= $1;", USER_BASE
+            )
+        }
+    return guilds, users, names
+
+
+async def run(args: argparse.Namespace) -> Dict:
+    # Only written by the memory backend, its seed must not replace a real snapshot
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ["MEMORY_SNAPSHOT_PATH"] = os.path.join(directory, "bench.json")
+        return await benchmark(args)
+
+
+async def benchmark(args: argparse.Namespace) -> Dict:
+    bot = DebtBot(intents=discord.Intents.default())
+    await bot.setup_hook()
+    for ext in SKIPPED_EXTENSIONS:
+        if ext in bot.extensions:
+            await bot.unload_extension(ext)
+
+    try:
+        guilds, users, names = await load_seed(bot, args)
+        if not guilds or not users:
+            raise SystemExit("Nothing to benchmark, run `python -m bench.seed` first")
+
+        operations = args.operations or list(OPERATIONS)
+        rng = random.Random(args.seed)
+        latencies: Dict[str, List[float]] = defaultdict(list)
+        errors: Dict[str, Counter] = defaultdict(Counter)
+
+        for phase, duration in (("warmup", args.warmup), ("run", args.duration)):
+            latencies.clear()
+            errors.clear()
+            logger.info("Starting the %s, %.0fs", phase, duration)
+            deadline = time.perf_counter() + duration
+            scenarios = [
+                Scenario(bot, guilds, users, names, random.Random(rng.random()))
+                for _ in range(args.concurrency)
+            ]
+            started = time.perf_counter()
+            await asyncio.gather(
+                *[worker(s, operations, deadline, latencies, errors) for s in scenarios]
+            )
+            elapsed = time.perf_counter() - started
+
+        total = [latency for name in operations for latency in latencies[name]]
+        return {
+            "commit": commit(),
+            "started_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "arguments": vars(args),
+            "settings": {key: os.environ.get(key) for key in SETTINGS},
+            "operations": {
+                name: summarize(latencies[name], errors[name], elapsed)
+                for name in operations
+            },
+            "total": summarize(
+                total, sum(errors.values(), Counter()), elapsed  # type: ignore
+            ),
+        }
+    finally:
+        # The bot never logged in, only its services need closing
+        await bot.close_services()
+        if bot.storage.sql:
+            await bot.pool.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--warmup", type=float, default=5)
+    parser.add_argument(
+        "--guilds", type=int, default=1000, help="Seeded guilds to pick from."
+    )
+    # Only read under the memory backend, which is seeded by the run itself
+    add_arguments(parser)
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the random picks.")
+    parser.add_argument(
+        "--operations", nargs="*", choices=list(OPERATIONS), help="Defaults to all."
+    )
+    parser.add_argument("--output", help="Where to save the results as JSON.")
+    parser.add_argument("--compare", help="Results of a previous run to compare with.")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    previous = None
+    if args.compare:
+        with open(args.compare) as file:
+            previous = json.load(file)
+
+    results = asyncio.run(run(args))
+    report(results, previous)
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+        logger.info("Saved the results to %s", args.output)
+
+
+if __name__ == "__main__":
+    main()
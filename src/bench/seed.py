@@ -0,0 +1,172 @@
+"""
+Seeds the database with synthetic guilds, currencies and accounts.
+
+Usage, from `src/` with the same `DB_*` variables as the bot:
+    python -m bench.seed --guilds 1000 --currencies 2000 --users 1000000 --accounts-per-user 3
+
+Seeded rows use ids above any real snowflake, `--reset` deletes them.
+Under `STORAGE_BACKEND=memory` there is nothing to seed ahead of time,
+`bench.run` seeds the same shape into its storage with `seed_memory`.
+"""
+
+import argparse
+import asyncio
+import logging
+import random
+import time
+
+from bench.common import GUILD_BASE, USER_BASE, connect
+from services import migrations
+from services.storage import MemoryStorage
+
+logger = logging.getLogger("bench.seed")
+
+
+async def reset(con) -> None:
+    """Deletes everything a previous seed created."""
+    async with con.transaction():
+        await con.execute("DELETE FROM banks WHERE userid >= $1;", USER_BASE)
+        await con.execute(
+            "DELETE FROM balance_snapshots WHERE userid >= $1;", USER_BASE
+        )
+        await con.execute("DELETE FROM transactions WHERE userid >= $1;", USER_BASE)
+        await con.execute(
+            """DELETE FROM currency_stats WHERE currencyid IN (
+                SELECT id FROM currencies WHERE owner >= $1
+            );""",
+            USER_BASE,
+        )
+        await con.execute("DELETE FROM currencies WHERE owner >= $1;", USER_BASE)
+        await con.execute(
+            "DELETE FROM guild_currencies WHERE guildid >= $1;", GUILD_BASE
+        )
+
+
+async def seed(args: argparse.Namespace) -> None:
+    con = await connect()
+    try:
+        await migrations.migrate(con, logger)
+        if args.reset:
+            logger.info("Deleting the previous seed")
+            await reset(con)
+
+        start = time.perf_counter()
+        ids = [
+            r["id"]
+            for r in await con.fetch(
+                """INSERT INTO currencies (name, owner, icon)
+                SELECT 'bench ' || g, $1::bigint + 1 + g % $2, ''
+                FROM generate_series(1, $3) g RETURNING id;""",
+                USER_BASE,
+                args.users,
+                args.currencies,
+            )
+        ]
+        logger.info("Created %d currencies", len(ids))
+
+        per_guild = min(5, len(ids))
+        # Positions are left to their sequence, in the order of the records
+        await con.copy_records_to_table(
+            "guild_currencies",
+            records=[
+                (GUILD_BASE + g, ids[(g * per_guild + k) % len(ids)])
+                for g in range(1, args.guilds + 1)
+                for k in range(per_guild)
+            ],
+            columns=("guildid", "currencyid"),
+        )
+        logger.info("Created %d guilds", args.guilds)
+
+        # Generated server side, in chunks to keep each transaction short
+        per_user = min(args.accounts_per_user, len(ids))
+        chunk = max(1, args.chunk // per_user)
+        for first in range(1, args.users + 1, chunk):
+            last = min(first + chunk - 1, args.users)
+            await con.execute(
+                """INSERT INTO banks (userid, currencyid, wallet, bank)
+                SELECT $1::bigint + u, ($2::integer[])[1 + (u * $3 + k) % cardinality($2::integer[])],
+                (random() * $4)::integer, (random() * $4)::integer
+                FROM generate_series($5::bigint, $6::bigint) u, generate_series(0, $3 - 1) k
+                ON CONFLICT DO NOTHING;""",
+                USER_BASE,
+                ids,
+                per_user,
+                args.max_balance,
+                first,
+                last,
+            )
+            logger.info("Created accounts for %d/%d users", last, args.users)
+
+        await con.execute("ANALYZE currencies, guild_currencies, banks;")
+        logger.info("Seeded in %.1fs", time.perf_counter() - start)
+    finally:
+        await con.close()
+
+
+async def seed_memory(storage: MemoryStorage, args: argparse.Namespace) -> None:
+    """Seeds the same guilds, currencies and accounts as `seed` through the storage's methods."""
+    start = time.perf_counter()
+    ids = []
+    for g in range(1, args.currencies + 1):
+        record = await storage.create_currency(
+            f"bench {g}", "", USER_BASE + 1 + g % args.users
+        )
+        ids.append(record["id"])
+
+    per_guild = min(5, len(ids))
+    for g in range(1, args.guilds + 1):
+        for k in range(per_guild):
+            await storage.add_guild_currency(
+                GUILD_BASE + g, ids[(g * per_guild + k) % len(ids)]
+            )
+
+    rng = random.Random(0)
+    per_user = min(args.accounts_per_user, len(ids))
+    chunk = max(1, args.chunk // per_user)
+    for first in range(1, args.users + 1, chunk):
+        keys = [
+            (USER_BASE + u, ids[(u * per_user + k) % len(ids)])
+            for u in range(first, min(first + chunk - 1, args.users) + 1)
+            for k in range(per_user)
+        ]
+        await storage.fetch_accounts(keys)
+        await storage.apply_deltas(
+            [
+                (
+                    userid,
+                    currencyid,
+                    rng.randint(0, args.max_balance),
+                    rng.randint(0, args.max_balance),
+                )
+                for userid, currencyid in keys
+            ]
+        )
+
+    logger.info("Seeded the memory storage in %.1fs", time.perf_counter() - start)
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    """Adds the shape of the seed to a parser, shared with `bench.run`."""
+    parser.add_argument("--currencies", type=int, default=2000)
+    parser.add_argument("--users", type=int, default=100000)
+    parser.add_argument("--accounts-per-user", type=int, default=3)
+    parser.add_argument("--max-balance", type=int, default=100000)
+    parser.add_argument(
+        "--chunk", type=int, default=1000000, help="Accounts per statement."
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--guilds", type=int, default=1000)
+    add_arguments(parser)
+    parser.add_argument(
+        "--reset", action="store_true", help="Delete the previous seed first."
+    )
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    asyncio.run(seed(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import signal
+import time
+from typing import Dict, List
+
+import aiohttp
+import discord
+
+logger = logging.getLogger("discord.cluster")
+
+
+async def recommended_shards(token: str) -> int:
+    """Asks discord how many shards the bot should run."""
+    async with aiohttp.ClientSession() as session:
+        async with session.get(
+            "https://discord.com/api/v10/gateway/bot",
+            headers={"Authorization": f"Bot {token}"},
+        ) as response:
+            response.raise_for_status()
+            return (await response.json())["shards"]
+
+
+def split_shards(shard_count: int, workers: int) -> List[List[int]]:
+    """Splits the shards into contiguous ranges, as even as possible."""
+    workers = max(1, min(workers, shard_count))
+    size, extra = divmod(shard_count, workers)
+
+    ranges, start = [], 0
+    for i in range(workers):
+        end = start + size + (1 if i < extra else 0)
+        ranges.append(list(range(start, end)))
+        start = end
+    return ranges
+
+
+def worker(
+    cluster_id: int, shard_ids: List[int], shard_count: int, pool_max: int
+) -> None:
+    """Runs a bot for a range of shards, the entrypoint of every worker process."""
+    os.environ["DB_POOL_MAX"] = str(pool_max)
+    os.environ["DB_POOL_MIN"] = str(min(2, pool_max))
+    # Ctrl-C reaches the whole process group, the supervisor stops us with SIGTERM
+    # instead, which the bot turns into a graceful close
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    from main import DebtBot
+
+    intents = discord.Intents.default()
+    intents.message_content = True
+
+    bot = DebtBot(
+        intents=intents,
+        shard_ids=shard_ids,
+        shard_count=shard_count,
+        cluster_id=cluster_id,
+    )
+    bot.run(os.environ["TOKEN"])
+
+
+class Supervisor:
+    """
+    Runs the shards over multiple processes and restarts the ones that die.
+
+    Each worker's pool is sized so the total stays under `DB_MAX_CONNECTIONS`,
+    minus a few connections kept for migrations and manual access.
+
+    Raises
+    ------
+    ValueError
+        If the connections can not give every worker a usable pool.
+    """
+
+    def __init__(
+        self, shard_count: int, workers: int, max_connections: int, reserved: int = 5
+    ) -> None:
+        self.shards = split_shards(shard_count, workers)
+        self.shard_count = shard_count
+        # Every worker also holds a connection for its invalidation listener
+        self.pool_max = (max_connections - reserved) // len(self.shards)
+        if self.pool_max < 2:
+            raise ValueError(
+                f"{max_connections} database connections can not serve "
+                f"{len(self.shards)} workers, lower CLUSTER_WORKERS or raise DB_MAX_CONNECTIONS"
+            )
+        self._processes: Dict[int, multiprocessing.Process] = {}
+        self._restarts: Dict[int, List[float]] = {}
+        self._stopping = False
+
+    def _spawn(self, cluster_id: int) -> None:
+        process = multiprocessing.get_context("spawn").Process(
+            target=worker,
+            args=(cluster_id, self.shards[cluster_id], self.shard_count, self.pool_max),
+            name=f"debtbot-cluster-{cluster_id}",
+        )
+        process.start()
+        self._processes[cluster_id] = process
+        logger.info(
+            "Started cluster %d (pid %d) with shards %s",
+            cluster_id,
+            process.pid,
+            self.shards[cluster_id],
+        )
+
+    def stop(self, *_) -> None:
+        """Asks every worker to close, they flush what they buffered before exiting."""
+        self._stopping = True
+        for process in self._processes.values():
+            if process.is_alive():
+                process.terminate()
+
+    def run(self) -> None:
+        """Starts the workers and restarts them until stopped."""
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        for cluster_id in range(len(self.shards)):
+            self._spawn(cluster_id)
+
+        while not self._stopping:
+            time.sleep(1)
+            for cluster_id, process in list(self._processes.items()):
+                if process.is_alive() or self._stopping:
+                    continue
+
+                # Back off if the worker keeps dying
+                now = time.monotonic()
+                restarts = [
+                    t for t in self._restarts.get(cluster_id, []) if now - t < 300
+                ]
+                delay = min(2 ** len(restarts), 60)
+                if restarts and now - restarts[-1] < delay:
+                    continue
+
+                logger.warning(
+                    "Cluster %d exited with code %s, restarting",
+                    cluster_id,
+                    process.exitcode,
+                )
+                self._restarts[cluster_id] = restarts + [now]
+                self._spawn(cluster_id)
+
+        deadline = time.monotonic() + 30
+        for cluster_id, process in self._processes.items():
+            process.join(timeout=max(0, deadline - time.monotonic()))
+            if process.is_alive():
+                logger.error("Cluster %d did not close in time, killing it", cluster_id)
+                process.kill()
+                process.join()
+
+
+if __name__ == "__main__":
+    discord.utils.setup_logging()
+
+    token = os.environ.get("TOKEN")
+    if not token:
+        raise Exception("Missing TOKEN")
+
+    shard_count = int(os.environ.get("SHARD_COUNT") or 0) or asyncio.run(
+        recommended_shards(token)
+    )
+    workers = int(os.environ.get("CLUSTER_WORKERS") or os.cpu_count() or 1)
+    max_connections = int(os.environ.get("DB_MAX_CONNECTIONS") or 100)
+
+    Supervisor(shard_count, workers, max_connections).run()
@@ -3,6 +3,7 @@ from typing import TYPE_CHECKING, Literal, Optional
 import discord
 from discord.ext import commands
 
+from services import Config, Currency
 from utils.utils import pretty_size
 
 if TYPE_CHECKING:
@@ -13,6 +14,9 @@ class Admin(commands.Cog):
     @commands.is_owner()
     @commands.command()
     async def sql(self, ctx: commands.Context["DebtBot"], *, sql: str) -> None:
+        if not ctx.bot.storage.sql:
+            raise commands.BadArgument("The storage is not a SQL database")
+
         async with ctx.bot.pool.acquire() as con:
             result = await con.fetch(sql)
             output = "\n".join(
@@ -26,22 +30,140 @@ class Admin(commands.Cog):
     @commands.is_owner()
     @commands.command()
     async def cache(self, ctx: commands.Context["DebtBot"]) -> None:
-        tgc = ctx.bot.cache.get_total_guilds()
-        tuc = ctx.bot.cache.get_total_users()
-        sgc = ctx.bot.cache.get_sizeof_guilds()
-        suc = ctx.bot.cache.get_sizeof_users()
-        tc = tgc + tuc
-        sc = sgc + suc
-
-        msg = (
-            "```\nCached currencies\n"
-            f"| Guild currencies : {tgc} ({pretty_size(sgc)})\n"
-            f"| User currencies : {tuc} ({pretty_size(suc)})\n"
-            f"| All currencies : {tc} ({pretty_size(sc)})```"
+        caches = (
+            ("Guild currencies", ctx.bot.cache.guilds),
+            ("User currencies", ctx.bot.cache.users),
+            ("Currency records", Currency.cache),
+            ("Guild configs", Config.cache),
+        )
+
+        msg = ""
+        for title, lru in caches:
+            size = (
+                f" ({pretty_size(lru.bytes)}/{pretty_size(lru.max_bytes)})"
+                if lru.max_bytes is not None
+                else ""
+            )
+            msg += (
+                f"```\n{title}\n"
+                f"| Entries : {len(lru)}/{lru.maxsize}{size}\n"
+                f"| Hits : {lru.hits} ({lru.hit_ratio:.1%})\n"
+                f"| Misses : {lru.misses}\n"
+                f"| Evictions : {lru.evictions}\n"
+                f"| Expirations : {lru.expirations}```"
+            )
+
+        p50, p99, worst = ctx.bot.cache.latency_percentiles()
+        msg += (
+            "```\nAutocomplete\n"
+            f"| p50 : {p50 * 1000:.3f}ms\n"
+            f"| p99 : {p99 * 1000:.3f}ms\n"
+            f"| Max : {worst * 1000:.3f}ms\n"
+            f"| Over budget ({ctx.bot.cache.budget * 1000:g}ms) : {ctx.bot.cache.over_budget}```"
+        )
+
+        msg += (
+            "```\nInvalidation\n"
+            f"| Events received : {ctx.bot.invalidator.received}\n"
+            f"| Resyncs : {ctx.bot.invalidator.resyncs}```"
+        )
+
+        msg += (
+            "```\nLedger\n"
+            f"| Pending entries : {ctx.bot.ledger.pending}\n"
+            f"| Written : {ctx.bot.ledger.written}\n"
+            f"| Dropped : {ctx.bot.ledger.dropped}```"
         )
 
+        if wb := ctx.bot.write_behind:
+            msg += (
+                "```\nWrite-behind\n"
+                f"| Pending accounts : {wb.pending}\n"
+                f"| Merged last flush : {wb.last_merged}\n"
+                f"| Merged total : {wb.total_merged} ({wb.total_flushes} flushes)```"
+            )
+
         await ctx.reply(msg, mention_author=False)
 
+    @commands.is_owner()
+    @commands.command()
+    async def metrics(self, ctx: commands.Context["DebtBot"]) -> None:
+        metrics = ctx.bot.metrics
+
+        lines = ["Command | Calls | p50 | p95"]
+        slowest = sorted(
+            metrics.commands.series.items(), key=lambda s: s[1].sum, reverse=True
+        )
+        for labels, series in slowest[:10]:
+            _, command, outcome = labels
+            lines.append(
+                f"{command} ({outcome}) | {series.count} | "
+                f"{metrics.commands.quantile(labels, 0.5) * 1000:.0f}ms | "
+                f"{metrics.commands.quantile(labels, 0.95) * 1000:.0f}ms"
+            )
+        msg = "```\n" + "\n".join(lines) + "```"
+
+        lines = ["Statement | Calls | Total | Avg"]
+        heaviest = sorted(
+            metrics.queries.series.items(), key=lambda s: s[1].sum, reverse=True
+        )
+        for (statement,), series in heaviest[:5]:
+            lines.append(
+                f"{statement[:60]} | {series.count} | {series.sum * 1000:.0f}ms | "
+                f"{series.sum / series.count * 1000:.2f}ms"
+            )
+        msg += "```\n" + "\n".join(lines) + "```"
+
+        if ctx.bot.storage.sql:
+            pool = ctx.bot.pool
+            msg += (
+                "```\nPool\n"
+                f"| In use : {pool.get_size() - pool.get_idle_size()}/{pool.get_max_size()}\n"
+                f"| Acquire p50 : {metrics.acquires.quantile((), 0.5) * 1000:.2f}ms\n"
+                f"| Acquire p99 : {metrics.acquires.quantile((), 0.99) * 1000:.2f}ms```"
+            )
+
+        if statements := getattr(ctx.bot.storage, "statements", None):
+            msg += (
+                "```\nPrepared statements\n"
+                + "\n".join(
+                    f"| {name} : {calls}"
+                    for name, calls in statements.calls.most_common(8)
+                )
+                + "```"
+            )
+
+        msg += (
+            "```\nCache hit ratios\n"
+            + "\n".join(
+                f"| {name} : {lru.hit_ratio:.1%}" for name, lru in metrics.caches()
+            )
+            + "```"
+        )
+
+        await ctx.reply(msg[:2000], mention_author=False)
+
+    @commands.is_owner()
+    @commands.command()
+    async def queries(self, ctx: commands.Context["DebtBot"]) -> None:
+        tracer = ctx.bot.tracer
+        lines = [
+            f"Budget : {tracer.budget} statements, {tracer.repeat_limit} repeats",
+            "Command | Calls | Avg | Max | Over budget",
+        ]
+        heaviest = sorted(
+            tracer.commands.items(),
+            key=lambda c: c[1].queries / c[1].invocations,
+            reverse=True,
+        )
+        for command, stats in heaviest[:15]:
+            lines.append(
+                f"{command} | {stats.invocations} | "
+                f"{stats.queries / stats.invocations:.1f} | {stats.most} | {stats.over_budget}"
+            )
+
+        await ctx.reply("```\n" + "\n".join(lines) + "```", mention_author=False)
+
     @commands.command()
     @commands.guild_only()
     @commands.is_owner()
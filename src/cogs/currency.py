@@ -28,9 +28,7 @@ class CurrencyCog(commands.Cog):
         if len(config.currencies) == 0:
             raise NoCurrenciesError
 
-        description = "\n".join(
-            [str(await Currency.get(ctx, id)) for id in config.currencies]
-        )
+        description = "\n".join([str(c) for c in await config.get_currencies()])
         embed = discord.Embed(
             title="Currencies in this server",
             description=description,
@@ -53,17 +51,17 @@ class CurrencyCog(commands.Cog):
         if not regex.match(r"<a?:.+?:\d{18}>|.{1,4}", icon):
             raise commands.BadArgument("Invalid icon for currency")
 
-        currency = None
-        async with ctx.bot.pool.acquire() as con:
-            currency = Currency(
-                ctx,
-                await con.fetchrow(
-                    "INSERT INTO currencies (name, icon, owner) VALUES ($1, $2, $3) RETURNING *;",
-                    name,
-                    icon,
-                    ctx.author.id,
-                ),
-            )
+        record = await ctx.bot.storage.create_currency(name, icon, ctx.author.id)
+
+        await ctx.bot.invalidator.publish(
+            "currency_created",
+            id=record["id"],
+            owner=ctx.author.id,
+            name=name,
+            icon=icon,
+        )
+        Currency.cache.put(record["id"], record)
+        currency = Currency(ctx, record)
 
         embed = discord.Embed(
             title="Created currency",
@@ -137,20 +135,12 @@ class CurrencyCog(commands.Cog):
         self, ctx: commands.Context["DebtBot"], *, query: str | None = None
     ) -> None:
         """Searches currencies based on their name"""
-        async with ctx.bot.pool.acquire() as con:
-            if query:
-                pattern = "%" + query + "%"
-                currencies = await con.fetch(
-                    "SELECT * FROM currencies WHERE name ILIKE $1 OR icon ILIKE $1 LIMIT 10;",
-                    pattern,
-                )
-            else:
-                currencies = await con.fetch("SELECT * FROM currencies LIMIT 10;")
+        currencies = await ctx.bot.search.search(ctx, query)
 
         if len(currencies) == 0:
             description = "Nothing found."
         else:
-            description = "\n".join([str(Currency(ctx, c)) for c in currencies])
+            description = "\n".join([str(c) for c in currencies])
 
         embed = discord.Embed(
             title="\N{RIGHT-POINTING MAGNIFYING GLASS} The Money Finder",
@@ -167,7 +157,11 @@ class CurrencyCog(commands.Cog):
     ) -> None:
         """Salvages info on currencies"""
         assert isinstance(currency, Currency)
-        uses = await currency.get_uses()
+        uses, supply, counted_at = await currency.get_stats()
+        # The supply is recounted periodically by the reconciliation
+        counted = (
+            f" as of {discord.utils.format_dt(counted_at, 'R')}" if counted_at else ""
+        )
 
         embed = discord.Embed(
             title=(
@@ -178,6 +172,7 @@ class CurrencyCog(commands.Cog):
             description=(
                 f">>> Owned by {currency.owner_mention}\n"
                 f"Used by {uses} users\n"
+                f"{supply:,} {currency.icon} in circulation{counted}\n"
                 f"Created {currency.created_at}\n"
             ),
             color=get_accent_color(ctx.author),
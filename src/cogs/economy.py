@@ -1,3 +1,4 @@
+import asyncio
 import datetime
 from typing import TYPE_CHECKING, Optional
 
@@ -7,6 +8,7 @@ from discord.ext import commands
 
 from services import Account, Config, Currency
 from services.currency import CurrencyWithAmount
+from services.unitofwork import UnitOfWork, transactional
 from utils import get_accent_color
 from utils.completions import currency_with_amount, guild_currencies
 from utils.errors import NotEnoughMoneyError
@@ -37,8 +39,8 @@ class Economy(commands.Cog):
             accounts = await Account.get_all(ctx, _user)
 
         description = ""
-        for currency_id, account in accounts.items():
-            c = await Currency.get(ctx, currency_id)
+        currencies = await asyncio.gather(*[Currency.get(ctx, id) for id in accounts])
+        for c, account in zip(currencies, accounts.values()):
             description += (
                 f"# {c.name}{'' if c.name.endswith('s') else 's'}\n"
                 f"## <:curved_line:1355629405925413044> {account.wallet:,} {c.icon}\n\n"
@@ -54,6 +56,80 @@ class Economy(commands.Cog):
 
         await ctx.reply(embed=embed, mention_author=False)
 
+    # Not a subcommand, slash groups can not be invoked so /balance would become /balance show
+    @commands.hybrid_command("history", aliases=["balhistory"])
+    @app_commands.autocomplete(currency=guild_currencies)
+    @app_commands.describe(
+        currency="The currency to look into.",
+        days="How many days to go back, up to 60.",
+        user="The one you're trying to spy on.",
+    )
+    async def balance_history(
+        self,
+        ctx: commands.Context["DebtBot"],
+        currency: Currency,
+        days: commands.Range[int, 1, 60] = 14,
+        user: Optional[Member | User] = None,
+    ) -> None:
+        """Returns your balance over the last days."""
+        assert isinstance(currency, Currency)
+        # The memory storage takes no daily snapshots
+        if not ctx.bot.storage.sql:
+            raise commands.BadArgument("Balance histories are not kept by this storage")
+
+        _user = user or ctx.author
+        end = datetime.datetime.now(datetime.timezone.utc).date() - datetime.timedelta(
+            days=1
+        )
+        start = end - datetime.timedelta(days=days - 1)
+        history = await Account.get_history(ctx, _user, currency, start, end)
+
+        description = "\n".join(
+            f"`{day:%Y-%m-%d}` {wallet:,} {currency.icon}"
+            + (f" ({bank:,} in bank)" if bank else "")
+            for day, wallet, bank in history
+        )
+        embed = discord.Embed(
+            title=f"{_user.display_name}'s {currency.name} history",
+            description=description,
+            color=get_accent_color(_user),
+            timestamp=datetime.datetime.now(),
+        )
+        embed.set_thumbnail(url=_user.display_avatar.url)
+        embed.set_footer(text="Balances at the end of each day (UTC)")
+
+        await ctx.reply(embed=embed, mention_author=False)
+
+    @commands.hybrid_command(aliases=["lb", "top"])
+    @app_commands.autocomplete(currency=guild_currencies)
+    @app_commands.describe(
+        currency="The currency to rank.", page="The page to show, 10 per page."
+    )
+    async def leaderboard(
+        self,
+        ctx: commands.Context["DebtBot"],
+        currency: Currency,
+        page: commands.Range[int, 1] = 1,
+    ) -> None:
+        """Returns the richest wallets of a currency."""
+        assert isinstance(currency, Currency)
+        entries = await ctx.bot.leaderboards.get_page(currency.id, page - 1)
+
+        start = (page - 1) * 10
+        description = "\n".join(
+            f"`#{start + i}` <@{userid}> {wallet:,} {currency.icon}"
+            for i, (userid, wallet) in enumerate(entries, 1)
+        )
+        embed = discord.Embed(
+            title=f"{currency.name} leaderboard",
+            description=description or "> Nobody here yet",
+            color=discord.Color.blurple(),
+            timestamp=datetime.datetime.now(),
+        )
+        embed.set_footer(text=f"Page {page}")
+
+        await ctx.reply(embed=embed, mention_author=False)
+
     @commands.hybrid_command(name="update")
     @app_commands.autocomplete(currency=currency_with_amount)
     @app_commands.rename(currency="amount")
@@ -61,6 +137,7 @@ class Economy(commands.Cog):
         currency="The amount of currency changed.",
         user="The user to update, defaults to yourself.",
     )
+    @transactional()
     @Config.has_permission("banker")
     async def update_account(
         self,
@@ -77,6 +154,8 @@ class Economy(commands.Cog):
         await account.add_money(
             currency.amount, True, "printed" if currency.amount > 0 else "burned"
         )
+        # Not holding the account's lock while replying
+        await UnitOfWork.commit()
 
         embed = discord.Embed(
             title="Printed money" if currency.amount > 0 else "Burned money",
@@ -99,16 +178,14 @@ class Economy(commands.Cog):
     ) -> None:
         """Spends money, if you have it."""
         assert isinstance(currency, Currency)
+        amount = abs(currency.amount)
         account = await Account.get(ctx, ctx.author, currency)
-        old_money = account.wallet
-        if abs(currency.amount) > old_money:
-            raise NotEnoughMoneyError(old_money - currency.amount, currency.icon)
-
-        await account.add_money(-abs(currency.amount), True, reason="spent")
+        if not await account.spend(amount, reason="spent"):
+            raise NotEnoughMoneyError(amount - account.wallet, currency.icon)
 
         embed = discord.Embed(
             title="Spent money",
-            description=f"> {old_money:,}  → {account.wallet:,} {currency.icon}",
+            description=f"> {account.wallet + amount:,}  → {account.wallet:,} {currency.icon}",
             color=get_accent_color(ctx.author),
             timestamp=datetime.datetime.now(),
         )
@@ -116,6 +193,45 @@ class Economy(commands.Cog):
 
         await ctx.reply(embed=embed, mention_author=False)
 
+    @commands.hybrid_command()
+    @app_commands.autocomplete(currency=currency_with_amount)
+    @app_commands.rename(currency="amount")
+    @app_commands.describe(
+        user="The one getting paid.",
+        currency="The amount to pay.",
+    )
+    async def pay(
+        self,
+        ctx: commands.Context["DebtBot"],
+        user: Member | User,
+        *,
+        currency: CurrencyWithAmount,
+    ) -> None:
+        """Pays someone from your wallet."""
+        assert isinstance(currency, Currency)
+        if user.id == ctx.author.id:
+            raise commands.BadArgument("You can not pay yourself")
+
+        amount = abs(currency.amount)
+        account, target = await asyncio.gather(
+            Account.get(ctx, ctx.author, currency), Account.get(ctx, user, currency)
+        )
+        if not await account.transfer_money(amount, target, reason="paid"):
+            raise NotEnoughMoneyError(amount - account.wallet, currency.icon)
+
+        embed = discord.Embed(
+            title="Paid money",
+            description=(
+                f"> {ctx.author.mention} {account.wallet:,} {currency.icon}\n"
+                f"> {user.mention} {target.wallet:,} {currency.icon}"
+            ),
+            color=get_accent_color(ctx.author),
+            timestamp=datetime.datetime.now(),
+        )
+        embed.set_thumbnail(url=user.display_avatar.url)
+
+        await ctx.reply(embed=embed, mention_author=False)
+
 
 async def setup(bot: "DebtBot") -> None:
     await bot.add_cog(Economy())
@@ -0,0 +1,75 @@
+import datetime
+import logging
+from typing import TYPE_CHECKING
+
+from discord.ext import commands, tasks
+
+from services import snapshots, stats
+
+if TYPE_CHECKING:
+    from main import DebtBot
+
+
+class Maintenance(commands.Cog):
+    """Background jobs, they do not have any commands."""
+
+    def __init__(self, bot: "DebtBot") -> None:
+        self.bot = bot
+        self.logger = logging.getLogger("discord.maintenance")
+
+    async def cog_load(self) -> None:
+        # Both jobs are written in SQL
+        if self.bot.storage.sql:
+            self.snapshot.start()
+            self.reconcile_stats.start()
+
+    async def cog_unload(self) -> None:
+        self.snapshot.cancel()
+        self.reconcile_stats.cancel()
+
+    async def _snapshot(self) -> None:
+        """Snapshots every day since the last snapshot, up to yesterday."""
+        yesterday = datetime.datetime.now(
+            datetime.timezone.utc
+        ).date() - datetime.timedelta(days=1)
+        latest = await snapshots.latest_snapshot(self.bot)
+        day = yesterday if latest is None else latest + datetime.timedelta(days=1)
+
+        while day <= yesterday:
+            written = await snapshots.take_snapshot(self.bot, day)
+            if written is None:
+                return
+            self.logger.info("Snapshotted %d balances for %s", written, day)
+            day += datetime.timedelta(days=1)
+
+    @tasks.loop(time=datetime.time(0, 0, tzinfo=datetime.timezone.utc))
+    async def snapshot(self) -> None:
+        """Snapshots the balances at the end of every day."""
+        try:
+            await self._snapshot()
+        except Exception as err:
+            self.logger.error("Failed to snapshot the balances : %s", err)
+
+    @snapshot.before_loop
+    async def before_snapshot(self) -> None:
+        # Catch up on the days missed while the bot was down
+        try:
+            await self._snapshot()
+        except Exception as err:
+            self.logger.error("Failed to catch up on snapshots : %s", err)
+
+    @tasks.loop(hours=1)
+    async def reconcile_stats(self) -> None:
+        """Corrects the currency counters and refreshes their supply."""
+        try:
+            corrected = await stats.reconcile(self.bot)
+        except Exception as err:
+            self.logger.error("Failed to reconcile the currency stats : %s", err)
+            return
+
+        if corrected:
+            self.logger.warning("Corrected %d drifted currency counters", corrected)
+
+
+async def setup(bot: "DebtBot") -> None:
+    await bot.add_cog(Maintenance(bot))
@@ -1,13 +1,65 @@
-from typing import TYPE_CHECKING
+import math
+import os
+from collections import Counter
+from typing import TYPE_CHECKING, List, Tuple
 
 import discord
-from discord.ext import commands
+from discord.ext import commands, tasks
 
 if TYPE_CHECKING:
     from main import DebtBot
 
 
 class Utility(commands.Cog):
+    def __init__(self, bot: "DebtBot") -> None:
+        self.bot = bot
+
+    async def cog_load(self) -> None:
+        # Without Postgres there is no other process to share with
+        if self.bot.storage.sql:
+            self.report_shards.start()
+
+    async def cog_unload(self) -> None:
+        self.report_shards.cancel()
+
+    def _local_shards(self, commands_ran: Counter[int]) -> List[Tuple]:
+        """Returns the (shardid, clusterid, pid, latency, guilds, commands) of this process' shards."""
+        guilds = {id: 0 for id in self.bot.shards}
+        for guild in self.bot.guilds:
+            guilds[guild.shard_id] = guilds.get(guild.shard_id, 0) + 1
+
+        return [
+            (
+                id,
+                self.bot.cluster_id,
+                os.getpid(),
+                None if math.isinf(shard.latency) else shard.latency,
+                guilds[id],
+                commands_ran[id],
+            )
+            for id, shard in self.bot.shards.items()
+        ]
+
+    @tasks.loop(seconds=30)
+    async def report_shards(self) -> None:
+        """Shares the latency and load of this process' shards with the others."""
+        commands_ran, self.bot.shard_commands = self.bot.shard_commands, Counter()
+        rows = self._local_shards(commands_ran)
+
+        async with self.bot.pool.acquire() as con:
+            await con.executemany(
+                """INSERT INTO cluster_shards (shardid, clusterid, pid, latency, guilds, commands)
+                VALUES ($1, $2, $3, $4, $5, $6)
+                ON CONFLICT (shardid) DO UPDATE SET
+                clusterid = EXCLUDED.clusterid, pid = EXCLUDED.pid, latency = EXCLUDED.latency,
+                guilds = EXCLUDED.guilds, commands = EXCLUDED.commands, updated_at = NOW();""",
+                rows,
+            )
+
+    @report_shards.before_loop
+    async def before_report_shards(self) -> None:
+        await self.bot.wait_until_ready()
+
     @commands.hybrid_command()
     async def ping(self, ctx: commands.Context["DebtBot"]):
         """Simplest command, ping \N{TABLE TENNIS PADDLE AND BALL}"""
@@ -18,6 +70,41 @@ class Utility(commands.Cog):
         )
         return await ctx.reply(embed=embed, mention_author=False)
 
+    @commands.hybrid_command()
+    async def shards(self, ctx: commands.Context["DebtBot"]):
+        """Shows the latency and load of every shard."""
+        if ctx.bot.storage.sql:
+            async with ctx.bot.pool.acquire() as con:
+                records = await con.fetch(
+                    """SELECT *, NOW() - updated_at > interval '2 minutes' AS stale
+                    FROM cluster_shards ORDER BY shardid;"""
+                )
+        else:
+            # A single process, its counters are not reset since nothing reports them
+            columns = ("shardid", "clusterid", "pid", "latency", "guilds", "commands")
+            records = [
+                {**dict(zip(columns, row)), "stale": False}
+                for row in self._local_shards(ctx.bot.shard_commands)
+            ]
+
+        lines = ["Shard | Cluster | Latency | Guilds | Commands/30s"]
+        for r in records:
+            latency = "-" if r["latency"] is None else f"{round(r['latency'] * 1000)}ms"
+            lines.append(
+                f"{r['shardid']:>5} | {r['clusterid']:>7} | {latency:>7} | "
+                f"{r['guilds']:>6} | {r['commands']:>12}"
+                + (" (stale)" if r["stale"] else "")
+            )
+
+        current = ctx.guild.shard_id if ctx.guild else 0
+        embed = discord.Embed(
+            title="Shards",
+            description="```\n" + "\n".join(lines) + "```",
+            color=discord.Color.blurple(),
+        )
+        embed.set_footer(text=f"This server is on shard {current}")
+        return await ctx.reply(embed=embed, mention_author=False)
+
 
 async def setup(bot: "DebtBot") -> None:
-    await bot.add_cog(Utility())
+    await bot.add_cog(Utility(bot))
@@ -1,6 +1,10 @@
+import asyncio
+import functools
 import logging
 import os
-from typing import List
+import signal
+from collections import Counter
+from typing import List, Optional
 
 import asyncpg
 import discord
@@ -8,8 +12,23 @@ from asyncpg.connection import traceback
 from discord.ext import commands
 
 import services.cache as cache
+from services import Account, Config, Currency, migrations
+from services.deletion import CurrencyDeletion
+from services.invalidation import Invalidator
+from services.leaderboard import Leaderboards
+from services.metrics import InstrumentedPool, Metrics
+from services.tracing import QueryTracer
+from services.unitofwork import UnitOfWork
+from services.resolver import CurrencyResolver
+from services.ledger import Ledger
+from services.search import CurrencySearch
+from services.storage import MemoryStorage, PostgresStorage, Storage
+from services.storage.postgres import STATEMENTS
+from services.storage.statements import Connection
+from services.writebehind import WriteBehind
 from cogs import EXTENSIONS
 from utils import errors
+from utils.loader import BatchLoader
 
 
 def prefix(bot: "DebtBot", msg: discord.Message) -> List[str]:
@@ -19,30 +38,114 @@ def prefix(bot: "DebtBot", msg: discord.Message) -> List[str]:
         return [bot.base_prefix]
 
 
-class DebtBot(commands.Bot):
+class DebtBot(commands.AutoShardedBot):
     owner_id = 493107597281329185
 
-    def __init__(self, intents: discord.Intents) -> None:
-        super().__init__(prefix, intents=intents)
-        self.pool: asyncpg.Pool
-        self.cache = cache.Cache()
+    def __init__(
+        self,
+        intents: discord.Intents,
+        shard_ids: Optional[List[int]] = None,
+        shard_count: Optional[int] = None,
+        cluster_id: int = 0,
+    ) -> None:
+        super().__init__(
+            prefix, intents=intents, shard_ids=shard_ids, shard_count=shard_count
+        )
+        self.cluster_id = cluster_id
+        self.shard_commands: Counter[int] = Counter()
+        self.pool: InstrumentedPool
+        self.storage: Storage = (
+            MemoryStorage(
+                os.environ.get("MEMORY_SNAPSHOT_PATH") or "debtbot.json",
+                float(os.environ.get("MEMORY_SNAPSHOT_INTERVAL") or 60),
+            )
+            if os.environ.get("STORAGE_BACKEND") == "memory"
+            else PostgresStorage(self)
+        )
+        self.metrics = Metrics(self)
+        self.tracer = QueryTracer(
+            budget=int(os.environ.get("QUERY_BUDGET") or 10),
+            repeat_limit=int(os.environ.get("QUERY_REPEAT_LIMIT") or 3),
+        )
+        self.cache = cache.Cache(self)
+        self.write_behind: Optional[WriteBehind] = None
+        self._sigterm: Optional[asyncio.Task] = None
+        # Batches are shared between commands, but not with a running transaction
+        self.currency_loader = BatchLoader(
+            functools.partial(Currency.fetch_records, self), scope=UnitOfWork.scope
+        )
+        self.account_loader = BatchLoader(
+            functools.partial(Account.fetch_records, self), scope=UnitOfWork.scope
+        )
+        self.invalidator = Invalidator(self)
+        self.ledger = Ledger(
+            self,
+            max_size=int(os.environ.get("LEDGER_BATCH_SIZE") or 500),
+            max_age=float(os.environ.get("LEDGER_BATCH_AGE") or 5),
+        )
+        # pg_trgm is only available in Postgres
+        self.search = CurrencySearch(
+            self,
+            in_memory=os.environ.get("SEARCH_BACKEND") == "memory"
+            or not self.storage.sql,
+        )
+        self.deletion = CurrencyDeletion(
+            self,
+            batch_size=int(os.environ.get("CURRENCY_DELETE_BATCH") or 1000),
+            pause=float(os.environ.get("CURRENCY_DELETE_PAUSE") or 0.1),
+        )
+        self.leaderboards = Leaderboards(
+            self,
+            size=int(os.environ.get("LEADERBOARD_SIZE") or 100),
+            max_age=float(os.environ.get("LEADERBOARD_MAX_AGE") or 300),
+            max_pages=int(os.environ.get("LEADERBOARD_MAX_PAGES") or 100),
+        )
         self.on_command_error = errors.global_error_handler
+        self.add_listener(self._on_command_failed, "on_command_error")
+        self.after_invoke(self._after_invoke)
         self.logger = logging.getLogger("discord")
         self.base_prefix = os.environ.get("BOT_PREFIX", "$")
 
     async def setup_hook(self) -> None:
-        # Setup db pool
-        password = os.environ.get("DB_PASSWORD") or "postgres"
-        database = os.environ.get("DB_NAME") or "postgres"
-        user = os.environ.get("DB_USER") or "postgres"
-        host = os.environ.get("DB_HOST") or "localhost"
-        port = os.environ.get("DB_PORT") or 5432
+        # docker stop and the cluster supervisor send SIGTERM, close like on Ctrl-C
+        try:
+            asyncio.get_running_loop().add_signal_handler(
+                signal.SIGTERM, self._on_sigterm
+            )
+        except NotImplementedError:
+            pass
 
-        pool = await asyncpg.create_pool(
-            database=database, user=user, host=host, port=port, password=password
-        )
-        assert pool
-        self.pool = pool
+        if self.storage.sql:
+            # Set per worker by the cluster launcher to stay under the database's limit
+            max_size = int(os.environ.get("DB_POOL_MAX") or 10)
+            await self.create_pool(
+                min_size=min(int(os.environ.get("DB_POOL_MIN") or 10), max_size),
+                max_size=max_size,
+                statement_cache_size=int(
+                    os.environ.get("DB_STATEMENT_CACHE_SIZE") or 100
+                ),
+            )
+        await self.storage.start()
+
+        await self.search.load()
+        await self.invalidator.start()
+        self.ledger.start()
+        # A single worker resumes the interrupted deletions
+        if self.cluster_id == 0:
+            await self.deletion.start()
+
+        # Opt-in, each worker of a cluster serves on its own port
+        if metrics_port := os.environ.get("METRICS_PORT"):
+            await self.metrics.start(
+                os.environ.get("METRICS_HOST") or "127.0.0.1",
+                int(metrics_port) + self.cluster_id,
+            )
+
+        # Coalesce balance updates, opt-in, in memory they are already cheap
+        interval = float(os.environ.get("WRITE_BEHIND_INTERVAL") or 0)
+        if interval > 0 and self.storage.sql:
+            self.write_behind = WriteBehind(self, interval)
+            self.write_behind.start()
 
         for ext in EXTENSIONS:
             try:
@@ -57,6 +160,122 @@ class DebtBot(commands.Bot):
                     ),
                 )
 
+    async def create_pool(
+        self, min_size: int, max_size: int, statement_cache_size: int
+    ) -> None:
+        """
+        Brings the schema up to date then connects the pool.
+
+        Parameters
+        ----------
+        min_size : int
+            The amount of connections opened right away.
+        max_size : int
+            The maximum amount of connections.
+        statement_cache_size : int
+            The amount of ad-hoc statements kept prepared per connection, on
+            top of the registered ones.
+        """
+        credentials = dict(
+            database=os.environ.get("DB_NAME") or "postgres",
+            user=os.environ.get("DB_USER") or "postgres",
+            host=os.environ.get("DB_HOST") or "localhost",
+            port=os.environ.get("DB_PORT") or 5432,
+            password=os.environ.get("DB_PASSWORD") or "postgres",
+        )
+
+        # Before the pool, its connections prepare statements on the migrated tables
+        con = await asyncpg.connect(**credentials)
+        try:
+            await migrations.migrate(con, self.logger)
+        finally:
+            await con.close()
+
+        pool = await asyncpg.create_pool(
+            **credentials,
+            min_size=min_size,
+            max_size=max_size,
+            # The registered statements share the cache with the ad-hoc ones
+            statement_cache_size=statement_cache_size + len(STATEMENTS),
+            # They are prepared once per connection, they must not expire after 5 minutes
+            max_cached_statement_lifetime=0,
+            connection_class=Connection,
+            init=self.init_connection,
+        )
+        assert pool
+        self.pool = self.metrics.instrument(pool)
+
+    async def init_connection(self, con: Connection) -> None:
+        """Sets up every new connection of the pool."""
+        await self.metrics.init_connection(con)
+        con.add_query_logger(self.tracer.on_query)
+        if isinstance(self.storage, PostgresStorage):
+            await self.storage.init_connection(con)
+
+    async def get_context(self, origin, /, *, cls=commands.Context):
+        ctx = await super().get_context(origin, cls=cls)
+        # Started here so the checks and converters share its connection and trace too
+        if ctx.command is not None:
+            self.tracer.start(ctx)
+            if self.storage.sql:
+                UnitOfWork.begin(ctx)
+        return ctx
+
+    async def _after_invoke(self, ctx: commands.Context["DebtBot"]) -> None:
+        if unit := getattr(ctx, "unit_of_work", None):
+            await unit.finish(failed=ctx.command_failed)
+        await self.tracer.finish(ctx)
+
+    async def on_command(self, ctx: commands.Context["DebtBot"]) -> None:
+        self.shard_commands[ctx.guild.shard_id if ctx.guild else 0] += 1
+        self.metrics.command_started(ctx)
+
+    async def on_command_completion(self, ctx: commands.Context["DebtBot"]) -> None:
+        self.metrics.command_finished(ctx)
+
+    async def _on_command_failed(
+        self, ctx: commands.Context["DebtBot"], error: Exception
+    ) -> None:
+        # The command did not reach its after_invoke if it failed before running
+        if unit := getattr(ctx, "unit_of_work", None):
+            await unit.finish(failed=True)
+        await self.tracer.finish(ctx)
+        self.metrics.command_finished(ctx, error)
+
+    async def on_guild_remove(self, guild: discord.Guild) -> None:
+        Config.invalidate(guild.id)
+        CurrencyResolver.invalidate(guild.id)
+        self.cache.guilds.invalidate(guild.id)
+
+    def _on_sigterm(self) -> None:
+        if self._sigterm is None and not self.is_closed():
+            self._sigterm = asyncio.create_task(self.close())
+
+    async def close_services(self) -> None:
+        """Flushes and releases the services, the storage last, a failing one does not stop the others."""
+        for service in (
+            self.deletion,
+            self.invalidator,
+            self.write_behind,
+            self.ledger,
+            self.storage,
+            self.metrics,
+        ):
+            if service is None:
+                continue
+            try:
+                await service.close()
+            except Exception as err:
+                self.logger.error(
+                    "Failed to close %s : %s", service.__class__.__name__, err
+                )
+
+    async def close(self) -> None:
+        try:
+            await self.close_services()
+        finally:
+            await super().close()
+
 
 if __name__ == "__main__":
     intents = discord.Intents.default()
@@ -0,0 +1,20 @@
+-- Drop duplicated accounts before enforcing uniqueness, add_money updated
+-- every copy so keeping any of them keeps the balance
+DELETE FROM banks a USING banks b
+WHERE a.userid = b.userid AND a.currencyid = b.currencyid AND a.ctid < b.ctid;
+
+-- Databases created from the init.sql that briefly declared it already have it
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_constraint WHERE conrelid = 'banks'::regclass AND contype = 'p'
+    ) THEN
+        ALTER TABLE banks ADD PRIMARY KEY (userid, currencyid);
+    END IF;
+END $$;
+CREATE INDEX banks_currencyid_idx ON banks (currencyid);
+
+CREATE INDEX currencies_owner_idx ON currencies (owner);
+
+CREATE INDEX transactions_currencyid_idx ON transactions (currencyid);
+CREATE INDEX transactions_guildid_timestamp_idx ON transactions (guildid, timestamp);
@@ -0,0 +1,5 @@
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- Serves both `name ILIKE '%q%'` and the word similarity operators
+CREATE INDEX currencies_name_trgm_idx ON currencies USING gin (name gin_trgm_ops);
+CREATE INDEX currencies_icon_idx ON currencies (icon);
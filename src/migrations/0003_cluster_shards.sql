@@ -0,0 +1,10 @@
+-- Reported periodically by every process running shards
+CREATE TABLE cluster_shards (
+	shardid integer PRIMARY KEY,
+	clusterid integer NOT NULL,
+	pid integer NOT NULL,
+	latency real,
+	guilds integer NOT NULL DEFAULT 0,
+	commands integer NOT NULL DEFAULT 0,
+	updated_at timestamp DEFAULT NOW()
+);
@@ -0,0 +1,6 @@
+-- One row per balance change instead of one per user
+ALTER TABLE transactions DROP CONSTRAINT transactions_pkey;
+ALTER TABLE transactions ADD COLUMN id bigserial PRIMARY KEY;
+ALTER TABLE transactions ADD COLUMN to_wallet boolean NOT NULL DEFAULT TRUE;
+
+CREATE INDEX transactions_userid_timestamp_idx ON transactions (userid, timestamp);
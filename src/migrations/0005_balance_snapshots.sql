@@ -0,0 +1,9 @@
+-- Balance at the end of a day, only for the days it changed, a missing first row means 0
+CREATE TABLE balance_snapshots (
+	userid bigint NOT NULL,
+	currencyid integer NOT NULL,
+	day date NOT NULL,
+	wallet integer NOT NULL,
+	bank integer NOT NULL,
+	PRIMARY KEY (userid, currencyid, day) INCLUDE (wallet, bank)
+);
@@ -0,0 +1,3 @@
+-- Serves the leaderboards and their keyset pagination, also covers lookups by currency
+CREATE INDEX banks_currencyid_wallet_idx ON banks (currencyid, wallet DESC, userid);
+DROP INDEX banks_currencyid_idx;
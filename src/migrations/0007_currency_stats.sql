@@ -0,0 +1,45 @@
+-- Per-currency counters, accounts are kept exact by the triggers below and
+-- supply is refreshed by the reconciliation job, which also corrects any drift
+CREATE TABLE currency_stats (
+	currencyid integer PRIMARY KEY,
+	accounts bigint NOT NULL DEFAULT 0,
+	supply bigint NOT NULL DEFAULT 0,
+	reconciled_at timestamp DEFAULT NOW()
+);
+
+INSERT INTO currency_stats (currencyid, accounts, supply)
+SELECT currencyid, count(*), sum(wallet::bigint + bank) FROM banks GROUP BY currencyid;
+
+-- Statement level, a batch of accounts only touches each counter once
+CREATE FUNCTION currency_stats_created() RETURNS trigger AS $$
+BEGIN
+	INSERT INTO currency_stats (currencyid, accounts, supply)
+	SELECT currencyid, count(*), sum(wallet::bigint + bank) FROM created GROUP BY currencyid
+	ON CONFLICT (currencyid) DO UPDATE SET
+	accounts = currency_stats.accounts + EXCLUDED.accounts,
+	supply = currency_stats.supply + EXCLUDED.supply;
+	RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE FUNCTION currency_stats_deleted() RETURNS trigger AS $$
+BEGIN
+	UPDATE currency_stats SET
+	accounts = currency_stats.accounts - d.accounts,
+	supply = currency_stats.supply - d.supply
+	FROM (
+		SELECT currencyid, count(*) AS accounts, sum(wallet::bigint + bank) AS supply
+		FROM deleted GROUP BY currencyid
+	) d
+	WHERE currency_stats.currencyid = d.currencyid;
+	RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER banks_created AFTER INSERT ON banks
+REFERENCING NEW TABLE AS created
+FOR EACH STATEMENT EXECUTE FUNCTION currency_stats_created();
+
+CREATE TRIGGER banks_deleted AFTER DELETE ON banks
+REFERENCING OLD TABLE AS deleted
+FOR EACH STATEMENT EXECUTE FUNCTION currency_stats_deleted();
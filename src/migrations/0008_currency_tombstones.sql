@@ -0,0 +1,4 @@
+-- Deleted currencies are hidden right away and their rows purged in the
+-- background, the tombstone goes last so an interrupted purge can resume
+ALTER TABLE currencies ADD COLUMN deleted_at timestamp;
+CREATE INDEX currencies_deleted_idx ON currencies (id) WHERE deleted_at IS NOT NULL;
@@ -0,0 +1,18 @@
+-- One row per currency of a guild, indexed both ways so adding, removing
+-- and finding the guilds of a currency do not rewrite or scan every config
+CREATE TABLE guild_currencies (
+	guildid bigint NOT NULL,
+	currencyid integer NOT NULL,
+	position integer NOT NULL,
+	PRIMARY KEY (guildid, currencyid)
+);
+CREATE INDEX guild_currencies_currencyid_idx ON guild_currencies (currencyid, guildid);
+
+-- array_append kept duplicates, only their first position is kept
+INSERT INTO guild_currencies (guildid, currencyid, position)
+SELECT guildid, currencyid, min(position)
+FROM guildconfigs, unnest(currencies) WITH ORDINALITY AS c(currencyid, position)
+GROUP BY guildid, currencyid;
+
+-- guildconfigs stays for the other guild settings
+ALTER TABLE guildconfigs DROP COLUMN currencies;
@@ -0,0 +1,6 @@
+-- The ledger and the tombstones are written in UTC like the snapshot days,
+-- rows written before are read in the session's time zone
+ALTER TABLE transactions ALTER COLUMN timestamp TYPE timestamptz;
+ALTER TABLE currencies
+	ALTER COLUMN created_at TYPE timestamptz,
+	ALTER COLUMN deleted_at TYPE timestamptz;
@@ -0,0 +1,2 @@
+-- Deleted currencies purge their snapshots in batches, without a scan each
+CREATE INDEX balance_snapshots_currencyid_idx ON balance_snapshots (currencyid);
@@ -0,0 +1,19 @@
+-- Positions come from a sequence, currencies added to a guild at the same
+-- time used to read the same max(position) and share it
+CREATE SEQUENCE guild_currencies_position_seq AS integer OWNED BY guild_currencies.position;
+SELECT setval('guild_currencies_position_seq', coalesce(max(position), 0) + 1, false)
+FROM guild_currencies;
+ALTER TABLE guild_currencies
+	ALTER COLUMN position SET DEFAULT nextval('guild_currencies_position_seq');
+
+-- Positions that were shared go last, in a fixed order
+UPDATE guild_currencies g SET position = nextval('guild_currencies_position_seq')
+FROM (
+	SELECT guildid, currencyid,
+		row_number() OVER (PARTITION BY guildid, position ORDER BY currencyid) AS n
+	FROM guild_currencies
+) d
+WHERE g.guildid = d.guildid AND g.currencyid = d.currencyid AND d.n > 1;
+
+ALTER TABLE guild_currencies
+	ADD CONSTRAINT guild_currencies_guildid_position_key UNIQUE (guildid, position);
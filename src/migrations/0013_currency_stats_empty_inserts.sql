@@ -0,0 +1,19 @@
+-- Accounts are upserted by nearly every command but rarely created, the
+-- trigger returns before touching currency_stats when nothing was inserted
+CREATE OR REPLACE FUNCTION currency_stats_created() RETURNS trigger AS $$
+BEGIN
+	IF NOT EXISTS (SELECT 1 FROM created) THEN
+		RETURN NULL;
+	END IF;
+
+	INSERT INTO currency_stats (currencyid, accounts, supply)
+	SELECT currencyid, count(*), sum(wallet::bigint + bank) FROM created GROUP BY currencyid
+	ON CONFLICT (currencyid) DO UPDATE SET
+	accounts = currency_stats.accounts + EXCLUDED.accounts,
+	supply = currency_stats.supply + EXCLUDED.supply;
+	RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Shown next to the supply, written in UTC like the other timestamps
+ALTER TABLE currency_stats ALTER COLUMN reconciled_at TYPE timestamptz;
@@ -2,5 +2,6 @@ from .account import Account
 from .config import Config
 from .currency import Currency
 from .cache import Cache
+from .writebehind import WriteBehind
 
-__all__ = ["Account", "Config", "Currency", "Cache"]
+__all__ = ["Account", "Config", "Currency", "Cache", "WriteBehind"]
@@ -1,12 +1,14 @@
-from typing import TYPE_CHECKING, Dict, Optional, Self
+import datetime
+from typing import TYPE_CHECKING, Dict, List, Optional, Self, Tuple
 
 from asyncpg import Record
 from discord.abc import User
 from discord.ext import commands
-from discord.ext.commands import NotOwner
+from discord.ext.commands import BadArgument, NotOwner
 
 import services
-from utils.errors import NoCurrenciesError
+from services.unitofwork import UnitOfWork
+from utils.errors import CurrencyNotFoundError, NoCurrenciesError
 
 if TYPE_CHECKING:
     from main import DebtBot
@@ -72,22 +74,9 @@ class Account:
             currency.id if isinstance(currency, services.Currency) else currency
         )
 
-        async with ctx.bot.pool.acquire() as con:
-            record = await con.fetchrow(
-                "SELECT * FROM banks WHERE userid = $1 AND currencyid = $2;",
-                account_id,
-                currency_id,
-            )
-
-            # Create an account for each currency if the member has none
-            if not record:
-                record = await con.fetchrow(
-                    "INSERT INTO banks (userid, currencyid) VALUES ($1, $2) RETURNING *;",
-                    account_id,
-                    currency_id,
-                )
-
-            return cls(ctx, record)
+        record = await ctx.bot.account_loader.load((account_id, currency_id))
+        assert record
+        return cls(ctx, cls._pending(ctx, record))
 
     @classmethod
     async def get_all(
@@ -110,31 +99,95 @@ class Account:
         """
         account_id = user if isinstance(user, int) else user.id
 
-        async with ctx.bot.pool.acquire() as con:
-            config = await services.Config.get(ctx)
-            if len(config.currencies) == 0:
-                raise NoCurrenciesError
+        config = await services.Config.get(ctx)
+        if len(config.currencies) == 0:
+            raise NoCurrenciesError
 
-            records = await con.fetch(
-                "SELECT * FROM banks WHERE userid = $1 AND currencyid = any($2::integer[]);",
-                account_id,
-                config.currencies,
-            )
+        records = await ctx.bot.account_loader.load_many(
+            [(account_id, id) for id in config.currencies]
+        )
+        return {r["currencyid"]: cls(ctx, cls._pending(ctx, r)) for r in records if r}
 
-            # Create missing accounts
-            missing = config.currencies.copy()
-            for record in records:
-                id = record["currencyid"]
-                if id in missing:
-                    missing.remove(record["currencyid"])
+    @staticmethod
+    async def fetch_records(
+        bot: "DebtBot", keys: List[Tuple[int, int]]
+    ) -> Dict[Tuple[int, int], Record]:
+        """
+        Fetches accounts, creating the missing ones, used as the batch of `DebtBot.account_loader`.
 
-            for id in missing:
-                insert = await con.prepare(
-                    "INSERT INTO banks (userid, currencyid) VALUES ($1, $2) RETURNING *;"
-                )
-                records.append(await insert.fetchrow(account_id, id))
+        Parameters
+        ----------
+        bot : DebtBot
+            The bot.
+        keys : List[Tuple[int, int]]
+            The (userid, currencyid) of the accounts.
+
+        Returns
+        -------
+        Dict[Tuple[int, int], Record]
+            The accounts, by (userid, currencyid).
+        """
+        return await bot.storage.fetch_accounts(keys)
+
+    @classmethod
+    async def get_history(
+        cls,
+        ctx: commands.Context["DebtBot"],
+        user: User | int,
+        currency: "services.Currency | int",
+        start: datetime.date,
+        end: datetime.date,
+    ) -> List[Tuple[datetime.date, int, int]]:
+        """
+        Returns the daily balances of an account, from its snapshots.
+
+        Parameters
+        ----------
+        ctx : Context
+            The context of the command.
+        user : User | int
+            The user owning the account.
+        currency : Currency | int
+            The currency of the account.
+        start : date
+            The first day, included.
+        end : date
+            The last day, included.
+
+        Returns
+        -------
+        List[Tuple[date, int, int]]
+            The (day, wallet, bank) at the end of every day of the range.
+        """
+        account_id = user if isinstance(user, int) else user.id
+        currency_id = (
+            currency.id if isinstance(currency, services.Currency) else currency
+        )
+
+        records = await ctx.bot.storage.balance_snapshots(
+            account_id, currency_id, start, end
+        )
 
-            return {r["currencyid"]: cls(ctx, r) for r in records}
+        history, wallet, bank = [], 0, 0
+        changes = {r["day"]: r for r in records}
+        if records and records[0]["day"] < start:
+            wallet, bank = records[0]["wallet"], records[0]["bank"]
+
+        day = start
+        while day <= end:
+            if change := changes.get(day):
+                wallet, bank = change["wallet"], change["bank"]
+            history.append((day, wallet, bank))
+            day += datetime.timedelta(days=1)
+
+        return history
+
+    @staticmethod
+    def _pending(ctx: commands.Context["DebtBot"], record: Record) -> Record | Dict:
+        """Applies the deltas that have not been written yet, if any."""
+        if ctx.bot.write_behind:
+            return ctx.bot.write_behind.apply(record)
+        return record
 
     async def add_money(
         self,
@@ -153,24 +206,74 @@ class Account:
             Whether to add the money to the account's wallet or bank.
         reason : str
             The reason for this transaction.
+
+        Raises
+        ------
+        CurrencyNotFoundError
+            The currency was deleted since the account was loaded.
+
+        Note
+        ----
+        If write-behind is enabled, the change is only applied to this object
+        and written to the storage on the next flush. Transactional commands
+        write it right away, so it rolls back with the rest of their changes.
         """
-        async with self._ctx.bot.pool.acquire() as con:
+        if self._ctx.bot.write_behind and not UnitOfWork.in_transaction():
+            self._ctx.bot.write_behind.add(self.id, self._currency, amount, to_wallet)
             if to_wallet:
-                record = await con.fetchrow(
-                    "UPDATE banks SET wallet = wallet + $1 WHERE currencyid = $2 AND userid = $3 RETURNING *;",
-                    amount,
-                    self._currency,
-                    self.id,
-                )
+                self._wallet += amount
             else:
-                record = await con.fetchrow(
-                    "UPDATE banks SET bank = bank + $1 WHERE currencyid = $2 AND userid = $3 RETURNING *;",
-                    amount,
-                    self._currency,
-                    self.id,
-                )
+                self._bank += amount
+            self._log(amount, reason, to_wallet=to_wallet)
+            return
 
-            self.__init__(self._ctx, record)
+        record = await self._ctx.bot.storage.add_money(
+            self.id, self._currency, amount, to_wallet
+        )
+        if record is None:
+            # The currency was deleted since the account was loaded
+            raise CurrencyNotFoundError
+        self.__init__(self._ctx, self._pending(self._ctx, record))
+
+        self._log(amount, reason, to_wallet=to_wallet)
+
+    async def spend(self, amount: int, reason: Optional[str] = None) -> bool:
+        """
+        Removes money from the account's wallet, if it has enough.
+
+        Parameters
+        ----------
+        amount : int
+            The amount to spend.
+        reason : Optional[str]
+            The reason for this transaction.
+
+        Returns
+        -------
+        bool
+            Whether the wallet had enough money, the account is updated
+            with its current balance either way.
+
+        Raises
+        ------
+        CurrencyNotFoundError
+            The currency was deleted since the account was loaded.
+        """
+        if amount < 0:
+            raise BadArgument("You can not spend a negative amount")
+
+        if self._ctx.bot.write_behind:
+            await self._ctx.bot.write_behind.flush([(self.id, self._currency)])
+
+        debited, wallet = await self._ctx.bot.storage.spend(
+            self.id, self._currency, amount
+        )
+        if wallet is None:
+            raise CurrencyNotFoundError
+        self._wallet = wallet
+        if debited:
+            self._log(-amount, reason)
+        return debited
 
     async def transfer_money(
         self,
@@ -178,7 +281,7 @@ class Account:
         target: Optional[Self | User] = None,
         to_wallet: bool = True,
         reason: Optional[str] = None,
-    ) -> None:
+    ) -> bool:
         """
         Transfers money from an account to another.
 
@@ -192,7 +295,21 @@ class Account:
             Wheter to transfer from your wallet to your bank or vice-versa, only use this parameter if transfering to yourself.
         reason : Optional[str]
             The reason for the transfer
+
+        Returns
+        -------
+        bool
+            Whether the source had enough money, both accounts are updated
+            with their new balances.
+
+        Raises
+        ------
+        CurrencyNotFoundError
+            The currency was deleted since the accounts were loaded.
         """
+        if amount < 0:
+            raise BadArgument("You can not transfer a negative amount")
+
         if isinstance(target, User):
             target = await self.__class__.get(self._ctx, target, self._currency)
 
@@ -200,9 +317,52 @@ class Account:
             if not to_wallet:
                 raise NotOwner("You can not transfer money to somebody else's bank !")
 
-            await self.add_money(-amount, True, reason)
-            await target.add_money(amount, True, reason)
+            if self._ctx.bot.write_behind:
+                await self._ctx.bot.write_behind.flush(
+                    [(self.id, self._currency), (target.id, self._currency)]
+                )
+
+            debited, wallet, target_wallet = await self._ctx.bot.storage.transfer(
+                self.id, target.id, self._currency, amount
+            )
+            if wallet is None or target_wallet is None:
+                raise CurrencyNotFoundError
+            self._wallet = wallet
+            if debited:
+                target._wallet = target_wallet
+                self._log(-amount, reason, target=target.id)
+                target._log(amount, reason, target=self.id)
+            return debited
+
+        if self._ctx.bot.write_behind:
+            await self._ctx.bot.write_behind.flush([(self.id, self._currency)])
+
+        moved, record = await self._ctx.bot.storage.move(
+            self.id, self._currency, amount, to_wallet
+        )
+        if record is None:
+            raise CurrencyNotFoundError
+        self.__init__(self._ctx, self._pending(self._ctx, record))
+        if moved:
+            self._log(-amount, reason, to_wallet=not to_wallet)
+            self._log(amount, reason, to_wallet=to_wallet)
+        return moved
+
+    def _log(
+        self,
+        amount: int,
+        reason: Optional[str],
+        target: int = 0,
+        to_wallet: bool = True,
+    ) -> None:
+        """Records a change of this account in the ledger and its leaderboard, once it is committed."""
+        bot, wallet = self._ctx.bot, self._wallet
+        guildid = (self._ctx.guild or self._ctx.author).id
+
+        def log() -> None:
+            bot.leaderboards.update(self._currency, self.id, wallet)
+            bot.ledger.record(
+                self.id, guildid, self._currency, amount, reason, target, to_wallet
+            )
 
-        else:
-            await self.add_money(-amount, not to_wallet, reason)
-            await self.add_money(amount, to_wallet, reason)
+        UnitOfWork.after_commit(log)
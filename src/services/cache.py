@@ -1,19 +1,121 @@
-from sys import getsizeof
-from typing import TYPE_CHECKING, Dict, List
+import os
+import statistics
+from collections import deque
+from typing import TYPE_CHECKING, Deque, Dict, FrozenSet, Iterable, List, Tuple
 
+from asyncpg import Record
 from discord import Guild, Member, User
 from discord.ext.commands import Context
 
 from services import Config, Currency
+from utils.lru import LRUCache
 
 if TYPE_CHECKING:
     from main import DebtBot
 
 
+class CurrencyIndex:
+    """
+    Currencies with their names precomputed for matching as the user types.
+
+    Attributes
+    ----------
+    records : Tuple[Record, ...]
+        The currencies, sorted by name.
+    ids : FrozenSet[int]
+        The ids of the currencies.
+    """
+
+    __slots__ = ("records", "ids", "_names", "_prefixes")
+
+    # Longer queries are checked against the matches of their first characters
+    PREFIX_LENGTH = 8
+
+    def __init__(self, records: Iterable[Record]) -> None:
+        self.records: Tuple[Record, ...] = tuple(
+            sorted(records, key=lambda r: (r["name"].casefold(), r["id"]))
+        )
+        self.ids: FrozenSet[int] = frozenset(r["id"] for r in self.records)
+        self._names = tuple(r["name"].casefold() for r in self.records)
+
+        prefixes: Dict[str, List[int]] = {}
+        for i, name in enumerate(self._names):
+            for end in range(1, min(len(name), self.PREFIX_LENGTH) + 1):
+                prefixes.setdefault(name[:end], []).append(i)
+        self._prefixes = {k: tuple(v) for k, v in prefixes.items()}
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def search(self, query: str, limit: int = 25) -> List[Record]:
+        """
+        Returns the currencies matching a query, those starting with it first.
+
+        Parameters
+        ----------
+        query : str
+            What was typed so far, the currency's icon also matches.
+        limit : int
+            The maximum amount of currencies returned.
+
+        Returns
+        -------
+        List[Record]
+            The matching currencies.
+        """
+        query = query.strip()
+        needle = query.casefold()
+        if not needle:
+            return list(self.records[:limit])
+
+        prefixed = [
+            i
+            for i in self._prefixes.get(needle[: self.PREFIX_LENGTH], ())
+            if len(needle) <= self.PREFIX_LENGTH or self._names[i].startswith(needle)
+        ]
+        found = set(prefixed)
+        others = [
+            i
+            for i, name in enumerate(self._names)
+            if i not in found and (needle in name or self.records[i]["icon"] == query)
+        ]
+        return [self.records[i] for i in (prefixed + others)[:limit]]
+
+
 class Cache:
-    def __init__(self) -> None:
-        self._guild_currencies: Dict[int, List[Currency]] = {}
-        self._user_currencies: Dict[int, List[Currency]] = {}
+    """
+    The currencies of guilds and users, indexed for autocompletion.
+
+    Entries are keyed by guild and user ids so completions never build a
+    context, and only query the database on a miss. Both caches are bounded
+    by entries and memory, expire after a while and share a single query
+    between concurrent misses.
+
+    Attributes
+    ----------
+    guilds : LRUCache[int, CurrencyIndex]
+        The currencies of each guild (or DM).
+    users : LRUCache[int, CurrencyIndex]
+        The currencies owned by each user.
+    budget : float
+        The time in seconds a completion should take at most.
+    over_budget : int
+        The amount of completions that took longer than the budget.
+    """
+
+    def __init__(self, bot: "DebtBot") -> None:
+        self._bot = bot
+        maxsize = int(os.environ.get("CACHE_SIZE") or 10000)
+        ttl = float(os.environ.get("CACHE_TTL") or 600)
+        # Split evenly between guilds and users
+        max_bytes = int(os.environ.get("CACHE_MAX_BYTES") or 32 * 1024 * 1024) // 2
+
+        self.guilds: LRUCache[int, CurrencyIndex] = LRUCache(maxsize, ttl, max_bytes)
+        self.users: LRUCache[int, CurrencyIndex] = LRUCache(maxsize, ttl, max_bytes)
+
+        self.budget = float(os.environ.get("AUTOCOMPLETE_BUDGET_MS") or 1) / 1000
+        self.over_budget = 0
+        self._timings: Deque[float] = deque(maxlen=1024)
 
     async def sync(
         self, ctx: Context["DebtBot"], synced: User | Member | Guild
@@ -27,72 +129,82 @@ class Cache:
             Who to sync.
         """
         if isinstance(synced, User | Member):
-            self._user_currencies[synced.id] = await Currency.get_user_currencies(
-                ctx, synced.id
-            )
+            records = await Currency.get_user_records(ctx.bot, synced.id)
+            self.users.put(synced.id, CurrencyIndex(records))
 
         if isinstance(synced, Guild) or not ctx.guild:
             config = await Config.get(ctx)
-            self._guild_currencies[synced.id] = await config.get_currencies()
+            currencies = await config.get_currencies()
+            self.guilds.put(synced.id, CurrencyIndex(c.record for c in currencies))
 
     def get_total_guilds(self) -> int:
         """Returns the number of guild currencies in cache."""
-        return len(self._guild_currencies)
+        return len(self.guilds)
 
     def get_total_users(self) -> int:
         """Returns the number of user currencies in cache."""
-        return len(self._guild_currencies)
+        return len(self.users)
 
     def get_sizeof_guilds(self) -> int:
         """Returns the size of the cached guild currencies."""
-        return getsizeof(self._guild_currencies)
+        return self.guilds.bytes
 
     def get_sizeof_users(self) -> int:
         """Returns the size of the cached user currencies."""
-        return getsizeof(self._user_currencies)
+        return self.users.bytes
 
-    async def get_guild_currencies(self, ctx: Context["DebtBot"]) -> List[Currency]:
+    async def get_guild_index(self, id: int) -> CurrencyIndex:
         """
-        Returns the currencies within the guild/DM.
+        Returns the currencies within a guild/DM.
 
         Parameters
         ----------
-        ctx : Context["DebtBot"]
-            The context of the command.
+        id : int
+            The id of the guild, or of the user for DMs.
 
         Returns
         -------
-        List[Currency]
-            The list of currencies within the guild/DM.
+        CurrencyIndex
+            The currencies within the guild/DM.
         """
-        id = (ctx.guild or ctx.author).id
-        currencies = self._guild_currencies.get(id)
 
-        if not currencies:
-            config = await Config.get(ctx)
-            currencies = await config.get_currencies()
-            self._guild_currencies[id] = currencies
+        async def load() -> CurrencyIndex:
+            ids = await Config.get_currencies_of(self._bot, id)
+            return CurrencyIndex(await Currency.get_records(self._bot, ids))
 
-        return currencies
+        return await self.guilds.get_or_load(id, load)
 
-    async def get_user_currencies(self, ctx: Context["DebtBot"]) -> List[Currency]:
+    async def get_user_index(self, id: int) -> CurrencyIndex:
         """
-        Returns the currencies owned by the user.
+        Returns the currencies owned by a user.
 
         Parameters
         ----------
-        ctx : Context["DebtBot"]
-            The context of the command.
+        id : int
+            The id of the user.
 
         Returns
         -------
-        List[Currency]
+        CurrencyIndex
             The currencies owned by the user.
         """
-        currencies = self._user_currencies.get(ctx.author.id)
 
-        if not currencies:
-            currencies = await Currency.get_user_currencies(ctx, ctx.author.id)
-            self._user_currencies[ctx.author.id] = currencies
+        async def load() -> CurrencyIndex:
+            return CurrencyIndex(await Currency.get_user_records(self._bot, id))
+
+        return await self.users.get_or_load(id, load)
+
+    def record_latency(self, seconds: float) -> None:
+        """Records how long a completion took."""
+        self._timings.append(seconds)
+        if seconds > self.budget:
+            self.over_budget += 1
+
+    def latency_percentiles(self) -> Tuple[float, float, float]:
+        """Returns the p50, p99 and max of the recent completions, in seconds."""
+        if len(self._timings) < 2:
+            latest = self._timings[0] if self._timings else 0.0
+            return latest, latest, latest
 
-        return currencies
+        cuts = statistics.quantiles(self._timings, n=100)
+        return cuts[49], cuts[98], max(self._timings)
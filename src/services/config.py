@@ -1,4 +1,5 @@
 import functools
+import os
 from typing import TYPE_CHECKING, Callable, List, Self
 
 import discord
@@ -8,7 +9,9 @@ from discord.ext.commands import MissingPermissions
 
 import services
 import utils
+from services.unitofwork import UnitOfWork
 from utils.errors import NoCurrenciesError, SimilarCurrencyError, TooManyCurrenciesError
+from utils.lru import LRUCache
 
 if TYPE_CHECKING:
     from main import DebtBot
@@ -24,10 +27,19 @@ class Config:
         The currencies in the guild.
     """
 
+    # The currencies of each guild (or DM), written through by add_currency and remove_currency
+    cache: LRUCache[int, List[int]] = LRUCache(
+        int(os.environ.get("CONFIG_CACHE_SIZE") or 16384)
+    )
+
     def __init__(self, ctx: commands.Context["DebtBot"], record: Record) -> None:
         self._currencies = record["currencies"]
         self._ctx = ctx
 
+    @property
+    def id(self) -> int:
+        return (self._ctx.guild or self._ctx.author).id
+
     @property
     def max_currencies(self) -> int:
         return 5 if self._ctx.guild else 1
@@ -50,12 +62,7 @@ class Config:
         NoCurrenciesError
             No currencies were found, quite rare.
         """
-        async with self._ctx.bot.pool.acquire() as con:
-            records = await con.fetch(
-                "SELECT * FROM currencies WHERE id = any($1::integer[]);",
-                self.currencies,
-            )
-            return [services.Currency(self._ctx, r) for r in records]
+        return await services.Currency.get_many(self._ctx, self.currencies)
 
     @classmethod
     async def get(cls, ctx: commands.Context["DebtBot"]) -> Self:
@@ -72,20 +79,39 @@ class Config:
         Config
             The config for the server.
         """
-        assert ctx.guild
-        async with ctx.bot.pool.acquire() as con:
-            record = await con.fetchrow(
-                "SELECT * FROM guildconfigs WHERE id = $1;", ctx.guild.id
-            )
+        currencies = await cls.get_currencies_of(ctx.bot, (ctx.guild or ctx.author).id)
+        return cls(ctx, {"currencies": currencies.copy()})
 
-            # If no config exist, create a new one
-            if not record:
-                record = await con.fetchrow(
-                    "INSERT INTO guildconfigs (id) VALUES ($1) RETURNING config;",
-                    ctx.guild.id,
-                )
+    @classmethod
+    async def get_currencies_of(cls, bot: "DebtBot", id: int) -> List[int]:
+        """
+        Gets the currency ids of a guild without a context.
 
-            return cls(ctx, record)
+        Parameters
+        ----------
+        bot : DebtBot
+            The bot.
+        id : int
+            The id of the guild (or user for DMs).
+
+        Returns
+        -------
+        List[int]
+            The ids of the currencies in the guild, shared with the cache so do not mutate it.
+        """
+        return await cls.cache.get_or_load(id, lambda: bot.storage.fetch_config(id))
+
+    @classmethod
+    def invalidate(cls, id: int) -> None:
+        """
+        Drops a guild's config from the cache.
+
+        Parameters
+        ----------
+        id : int
+            The id of the guild (or user for DMs).
+        """
+        cls.cache.invalidate(id)
 
     async def add_currency(
         self,
@@ -121,12 +147,10 @@ class Config:
         if not utils.is_sudo(self._ctx) and len(self.currencies) == self.max_currencies:
             raise TooManyCurrenciesError(self.max_currencies)
 
-        async with self._ctx.bot.pool.acquire() as con:
-            await con.execute(
-                """UPDATE guildconfigs SET currencies = array_append(currencies, $1) WHERE id = $2;""",
-                currency.id,
-                self._ctx.guild.id if self._ctx.guild else self._ctx.author.id,
-            )
+        self._currencies = await self._ctx.bot.storage.add_guild_currency(
+            self.id, currency.id
+        )
+        await self._publish()
 
         embed = discord.Embed(
             title="Added currency to guild",
@@ -158,16 +182,13 @@ class Config:
             else await services.Currency.get(self._ctx, currency)
         )
 
-        config = await services.Config.get(self._ctx)
-        if not currency.id in config.currencies:
+        if not currency.id in self.currencies:
             raise NoCurrenciesError
 
-        async with self._ctx.bot.pool.acquire() as con:
-            await con.execute(
-                """UPDATE guildconfigs SET currencies = array_remove(currencies, $1) WHERE id = $2;""",
-                currency.id,
-                self._ctx.guild.id if self._ctx.guild else self._ctx.author.id,
-            )
+        self._currencies = await self._ctx.bot.storage.remove_guild_currency(
+            self.id, currency.id
+        )
+        await self._publish()
 
         embed = discord.Embed(
             title="Removed currency to guild",
@@ -176,6 +197,12 @@ class Config:
         )
         await self._ctx.reply(embed=embed, mention_author=False)
 
+    async def _publish(self) -> None:
+        """Writes the currencies through the cache and to the other processes, once committed."""
+        id, currencies = self.id, self._currencies.copy()
+        UnitOfWork.after_commit(lambda: self.cache.put(id, currencies.copy()))
+        await self._ctx.bot.invalidator.publish("config", id=id, currencies=currencies)
+
     @classmethod
     def has_permission(cls, permission: str):
         def decorator(func: Callable):
@@ -1,13 +1,15 @@
-import difflib
+import datetime
+import os
 import re
-from typing import TYPE_CHECKING, List, Self
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Self, Tuple
 
 import discord
 from asyncpg import Record
 from discord.ext import commands
 
-from services.config import Config
-from utils.errors import CurrencyNotFoundError, NoCurrenciesError
+from services.resolver import CurrencyResolver
+from utils.errors import CurrencyNotFoundError
+from utils.lru import LRUCache
 
 if TYPE_CHECKING:
     from main import DebtBot
@@ -35,10 +37,18 @@ class Currency:
         Returns the date of its creation in a discord time format.
     hidden : bool
         Whether or not the currency is hidden.
+    record : Record
+        The row the currency was built from, safe to keep around unlike the currency itself.
     """
 
+    # Shared by every context, records are cached rather than instances so no context is kept alive
+    cache: LRUCache[int, Record] = LRUCache(
+        int(os.environ.get("CURRENCY_CACHE_SIZE") or 4096)
+    )
+
     def __init__(self, ctx: commands.Context["DebtBot"], record: Record) -> None:
         self._ctx = ctx
+        self._record = record
         self._id = record["id"]
         self._name = record["name"]
         self._icon = record["icon"]
@@ -50,6 +60,10 @@ class Currency:
     def __str__(self) -> str:
         return f"`#{self.id}` {self.name} - {self.icon}"
 
+    @property
+    def record(self) -> Record:
+        return self._record
+
     @property
     def owner_mention(self) -> str:
         return f"<@{self.owner_id}>"
@@ -89,10 +103,21 @@ class Currency:
         int
             The amount of accounts using this currency.
         """
-        async with self._ctx.bot.pool.acquire() as con:
-            return await con.fetchval(
-                "SELECT COUNT(*) FROM banks WHERE currencyid = $1;", self.id
-            )
+        accounts, _, _ = await self.get_stats()
+        return accounts
+
+    async def get_stats(self) -> Tuple[int, int, Optional[datetime.datetime]]:
+        """
+        Reads the counters of the currency, in Postgres the supply is as of the last reconciliation.
+
+        Returns
+        -------
+        Tuple[int, int, Optional[datetime]]
+            The amount of accounts using this currency, the money they hold
+            and when it was counted, None if it is always up to date.
+        """
+        stats = await self._ctx.bot.storage.currency_stats(self.id)
+        return stats or (0, 0, None)
 
     @classmethod
     async def get(cls, ctx: commands.Context["DebtBot"], id: int) -> Self:
@@ -116,11 +141,99 @@ class Currency:
         CurrencyNotFoundError
             If the currency does not exist or is hidden.
         """
-        async with ctx.bot.pool.acquire() as con:
-            record = await con.fetchrow("SELECT * FROM currencies WHERE id = $1;", id)
+        record = cls.cache.get(id)
+        if record is None:
+            record = await ctx.bot.currency_loader.load(id)
             if not record:
                 raise CurrencyNotFoundError
-            return cls(ctx, record)
+
+        return cls(ctx, record)
+
+    @classmethod
+    async def get_many(
+        cls, ctx: commands.Context["DebtBot"], ids: Iterable[int]
+    ) -> List[Self]:
+        """
+        Gets multiple currencies, only querying the ones that are not cached.
+
+        Parameters
+        ----------
+        ctx : Context
+            The context of the command.
+        ids : Iterable[int]
+            The ids of the currencies.
+
+        Returns
+        -------
+        List[Currency]
+            The currencies that exist, in the same order as the ids.
+        """
+        return [cls(ctx, record) for record in await cls.get_records(ctx.bot, ids)]
+
+    @classmethod
+    async def get_records(cls, bot: "DebtBot", ids: Iterable[int]) -> List[Record]:
+        """
+        Gets the records of multiple currencies without a context, only querying the ones that are not cached.
+
+        Parameters
+        ----------
+        bot : DebtBot
+            The bot.
+        ids : Iterable[int]
+            The ids of the currencies.
+
+        Returns
+        -------
+        List[Record]
+            The records of the currencies that exist, in the same order as the ids.
+        """
+        ids = list(ids)
+        records = {id: record for id in ids if (record := cls.cache.get(id))}
+
+        if missing := [id for id in ids if id not in records]:
+            loaded = await bot.currency_loader.load_many(missing)
+            records.update({r["id"]: r for r in loaded if r})
+
+        return [records[id] for id in ids if id in records]
+
+    @classmethod
+    async def fetch_records(cls, bot: "DebtBot", ids: List[int]) -> Dict[int, Record]:
+        """
+        Fetches currencies from the storage and caches them, used as the batch of `DebtBot.currency_loader`.
+
+        Parameters
+        ----------
+        bot : DebtBot
+            The bot.
+        ids : List[int]
+            The ids of the currencies.
+
+        Returns
+        -------
+        Dict[int, Record]
+            The currencies found, by id.
+        """
+        tokens = {id: cls.cache.begin_load(id) for id in ids}
+        found: Dict[int, Record] = {}
+        try:
+            found = {r["id"]: r for r in await bot.storage.fetch_currencies(ids)}
+        finally:
+            # Not cached if the currency was updated or deleted while fetching
+            for id, token in tokens.items():
+                cls.cache.end_load(id, token, found.get(id))
+        return found
+
+    @classmethod
+    def invalidate(cls, id: int) -> None:
+        """
+        Drops a currency from the cache, must be called whenever a currency is edited or deleted.
+
+        Parameters
+        ----------
+        id : int
+            The id of the currency.
+        """
+        cls.cache.invalidate(id)
 
     @classmethod
     async def get_user_currencies(
@@ -141,10 +254,32 @@ class Currency:
         List[Currency]
             The currencies owned by the user.
         """
-        async with ctx.bot.pool.acquire() as con:
-            id = user.id if isinstance(user, discord.User) else user
-            records = await con.fetch("SELECT * FROM currencies WHERE owner = $1", id)
-            return [cls(ctx, record) for record in records]
+        id = user.id if isinstance(user, discord.User) else user
+        records = await cls.get_user_records(ctx.bot, id)
+        return [cls(ctx, record) for record in records]
+
+    @classmethod
+    async def get_user_records(cls, bot: "DebtBot", id: int) -> List[Record]:
+        """
+        Gets the records of the currencies owned by a user, without a context.
+
+        Parameters
+        ----------
+        bot : DebtBot
+            The bot.
+        id : int
+            The id of the owner.
+
+        Returns
+        -------
+        List[Record]
+            The records of the currencies owned by the user.
+        """
+        records = await bot.storage.fetch_user_currencies(id)
+
+        for record in records:
+            cls.cache.put(record["id"], record)
+        return records
 
     @classmethod
     async def convert(cls, ctx: commands.Context["DebtBot"], argument: str) -> Self:
@@ -204,7 +339,7 @@ class CurrencyWithAmount(Currency):
 
     @classmethod
     async def convert(cls, ctx: commands.Context["DebtBot"], argument: str) -> Self:
-        match = re.match(r"([0-9,.]+) *([a-zA-Z ]+)", argument)
+        match = re.match(r"([0-9,.]+) *(.+)", argument.strip())
         if not match:
             raise commands.BadArgument(
                 f"Failed to convert currency with name `{argument}`"
@@ -213,19 +348,5 @@ class CurrencyWithAmount(Currency):
         amount, query = match.groups()
         amount = int(amount.replace(",", "").replace(".", ""))
 
-        config = await Config.get(ctx)
-        currencies = await config.get_currencies()
-        if len(currencies) == 0:
-            raise NoCurrenciesError
-
-        for currency in currencies:
-            if (
-                currency.icon == query
-                or difflib.SequenceMatcher(
-                    a=currency.name.lower(), b=query.lower()
-                ).ratio()
-                >= 0.9
-            ):
-                return cls.from_currency(currency, amount)
-
-        raise CurrencyNotFoundError
+        resolver = await CurrencyResolver.get(ctx)
+        return cls(ctx, resolver.resolve(query), amount)
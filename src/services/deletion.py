@@ -0,0 +1,148 @@
+import asyncio
+import contextvars
+import logging
+import time
+from typing import TYPE_CHECKING, Awaitable, Callable, Dict, Optional
+
+if TYPE_CHECKING:
+    from main import DebtBot
+
+
+# Called with the amount of accounts deleted, the amount to delete and whether it is over
+Progress = Callable[[int, int, bool], Awaitable[None]]
+
+
+class CurrencyDeletion:
+    """
+    Deletes currencies in the background, in bounded batches.
+
+    The currency is tombstoned first, hidden everywhere at once, then its
+    accounts, transactions and balance snapshots are deleted `batch_size`
+    rows at a time, each batch in its own short statement so no lock is held
+    for long. The currency row goes last, so tombstoned currencies found on
+    startup are resumed where they were left.
+
+    Attributes
+    ----------
+    batch_size : int
+        The amount of rows deleted per statement.
+    pause : float
+        The amount of seconds between batches, leaving room to other queries.
+    max_retries : int
+        The amount of failed batches in a row before giving up until the next startup.
+    report_interval : float
+        The minimum amount of seconds between progress reports.
+    """
+
+    def __init__(
+        self,
+        bot: "DebtBot",
+        batch_size: int = 1000,
+        pause: float = 0.1,
+        max_retries: int = 5,
+        report_interval: float = 2.0,
+    ) -> None:
+        self._bot = bot
+        self._jobs: Dict[int, asyncio.Task] = {}
+        self.logger = logging.getLogger("discord.deletion")
+        self.batch_size = batch_size
+        self.pause = pause
+        self.max_retries = max_retries
+        self.report_interval = report_interval
+
+    @property
+    def running(self) -> int:
+        """Returns the number of currencies being purged."""
+        return len(self._jobs)
+
+    async def start(self) -> None:
+        """Resumes the deletions interrupted by the last shutdown."""
+        for id in await self._bot.storage.tombstoned_currencies():
+            self.logger.info("Resuming the deletion of currency %s", id)
+            self._spawn(id, 0, None)
+
+    async def delete(
+        self, id: int, owner: int, progress: Optional[Progress] = None
+    ) -> None:
+        """
+        Hides a currency right away and purges its rows in the background.
+
+        Parameters
+        ----------
+        id : int
+            The id of the currency.
+        owner : int
+            The owner of the currency.
+        progress : Optional[Progress]
+            Called as batches are deleted, at most every `report_interval` seconds and once at the end.
+        """
+        stats = await self._bot.storage.currency_stats(id)
+        await self._bot.storage.tombstone_currency(id)
+        await self._bot.invalidator.publish("currency_deleted", id=id, owner=owner)
+        self._spawn(id, stats[0] if stats else 0, progress)
+
+    def _spawn(self, id: int, total: int, progress: Optional[Progress]) -> None:
+        if id in self._jobs:
+            return
+
+        # In a fresh context, the purge outlives the command's unit of work
+        task = asyncio.create_task(
+            self._purge(id, total, progress), context=contextvars.Context()
+        )
+        self._jobs[id] = task
+        task.add_done_callback(lambda _: self._jobs.pop(id, None))
+
+    async def _purge(self, id: int, total: int, progress: Optional[Progress]) -> None:
+        deleted = 0
+        failures = 0
+        reported = time.monotonic()
+
+        while True:
+            # Buffered entries would be written back once the transactions are gone
+            self._bot.ledger.discard(id)
+            try:
+                step, count = await self._bot.storage.purge_currency(
+                    id, self.batch_size
+                )
+            except Exception as err:
+                failures += 1
+                if failures >= self.max_retries:
+                    self.logger.error(
+                        "Gave up deleting currency %s until the next startup : %s",
+                        id,
+                        err,
+                    )
+                    return
+                await asyncio.sleep(2**failures)
+                continue
+
+            failures = 0
+            if step == "done":
+                break
+            if step == "accounts":
+                deleted += count
+
+            if progress and time.monotonic() - reported >= self.report_interval:
+                reported = time.monotonic()
+                await self._report(progress, deleted, max(total, deleted), False)
+            await asyncio.sleep(self.pause)
+
+        self.logger.info("Deleted currency %s and %s accounts", id, deleted)
+        if progress:
+            await self._report(progress, deleted, max(total, deleted), True)
+
+    async def _report(
+        self, progress: Progress, deleted: int, total: int, done: bool
+    ) -> None:
+        try:
+            await progress(deleted, total, done)
+        except Exception as err:
+            # The purge goes on without anyone watching
+            self.logger.warning("Failed to report a deletion's progress : %s", err)
+
+    async def close(self) -> None:
+        """Stops the running purges, they resume on the next startup."""
+        jobs = list(self._jobs.values())
+        for job in jobs:
+            job.cancel()
+        await asyncio.gather(*jobs, return_exceptions=True)
@@ -0,0 +1,201 @@
+import asyncio
+import json
+import logging
+import uuid
+from typing import TYPE_CHECKING, Any, Optional
+
+from asyncpg import Connection
+from asyncpg.pool import PoolConnectionProxy
+
+from services import Config, Currency
+from services.resolver import CurrencyResolver
+from services.unitofwork import UnitOfWork
+
+if TYPE_CHECKING:
+    from main import DebtBot
+
+
+CHANNEL = "debtbot_invalidate"
+
+
+class Invalidator:
+    """
+    Keeps the caches of every process coherent through Postgres LISTEN/NOTIFY.
+
+    Mutations are published as small events, applied locally right away and
+    by every other process when they receive them. Events that could have
+    been missed while disconnected are made up for by a full resync.
+    Without Postgres there is a single process, events are only applied locally.
+
+    Events
+    ------
+    config : id, currencies
+        A guild's currencies changed.
+    currency_created : id, owner, name, icon
+        A currency was created.
+    currency_updated : id, owner, name, icon
+        A currency was edited.
+    currency_deleted : id, owner
+        A currency was deleted.
+    """
+
+    def __init__(self, bot: "DebtBot") -> None:
+        self._bot = bot
+        self._con: Optional[PoolConnectionProxy] = None
+        self._reconnecting: Optional[asyncio.Task] = None
+        self._closed = False
+        self.origin = uuid.uuid4().hex
+        self.logger = logging.getLogger("discord.invalidation")
+        self.received = 0
+        self.resyncs = 0
+
+    async def start(self) -> None:
+        """Starts listening on a dedicated connection."""
+        if not self._bot.storage.sql:
+            return
+
+        con = await self._bot.pool.acquire()
+        try:
+            con.add_termination_listener(self._on_termination)
+            await con.add_listener(CHANNEL, self._on_notification)
+        except BaseException:
+            await self._bot.pool.release(con)
+            raise
+        self._con = con
+
+    async def close(self) -> None:
+        """Stops listening and gives the connection back."""
+        self._closed = True
+        if self._reconnecting:
+            self._reconnecting.cancel()
+
+        if self._con:
+            con, self._con = self._con, None
+            if not con.is_closed():
+                con.remove_termination_listener(self._on_termination)
+                await con.remove_listener(CHANNEL, self._on_notification)
+            await self._bot.pool.release(con)
+
+    async def publish(self, event: str, **data: Any) -> None:
+        """
+        Applies an event locally once the command commits, and sends it to the other processes.
+
+        Parameters
+        ----------
+        event : str
+            The kind of event.
+        **data : Any
+            The payload of the event, must be JSON serializable.
+        """
+        # Other commands must not see a change that could still roll back
+        UnitOfWork.after_commit(lambda: self.apply(event, data))
+        if not self._bot.storage.sql:
+            return
+
+        payload = json.dumps({"origin": self.origin, "event": event, **data})
+        try:
+            # Delivered when the command's transaction commits, if it has one
+            async with UnitOfWork.acquire(self._bot.pool) as con:
+                await con.execute("SELECT pg_notify($1, $2);", CHANNEL, payload)
+        except Exception as err:
+            # The others resync when their listener reconnects, not when we fail to publish
+            self.logger.error("Failed to publish %s : %s", event, err)
+
+    def apply(self, event: str, data: dict) -> None:
+        """
+        Applies an event to the caches of this process.
+
+        Parameters
+        ----------
+        event : str
+            The kind of event.
+        data : dict
+            The payload of the event.
+        """
+        match event:
+            case "config":
+                if data["id"] in Config.cache:
+                    Config.cache.put(data["id"], list(data["currencies"]))
+                else:
+                    # A load in flight could have read the previous config
+                    Config.invalidate(data["id"])
+                self._bot.cache.guilds.invalidate(data["id"])
+                CurrencyResolver.invalidate(data["id"])
+
+            case "currency_created" | "currency_updated":
+                Currency.invalidate(data["id"])
+                self._bot.cache.users.invalidate(data["owner"])
+                self._bot.search.add(data["id"], data["name"], data["icon"])
+                if event == "currency_updated":
+                    self._drop_from_guilds(data["id"], keep_configs=True)
+
+            case "currency_deleted":
+                Currency.invalidate(data["id"])
+                self._bot.cache.users.invalidate(data["owner"])
+                self._bot.search.remove(data["id"])
+                self._bot.leaderboards.invalidate(data["id"])
+                self._drop_from_guilds(data["id"])
+
+            case _:
+                self.logger.warning("Unknown invalidation event %s", event)
+
+    def _drop_from_guilds(self, id: int, keep_configs: bool = False) -> None:
+        """Updates the guilds using a currency, only touching those entries."""
+        CurrencyResolver.invalidate_currency(id)
+        if not keep_configs:
+            for guild, currencies in Config.cache.items():
+                if id in currencies:
+                    Config.cache.put(guild, [c for c in currencies if c != id])
+
+        for guild, index in self._bot.cache.guilds.items():
+            if id in index.ids:
+                self._bot.cache.guilds.invalidate(guild)
+
+    def resync(self) -> None:
+        """Drops every cache, used when events could have been missed."""
+        self.resyncs += 1
+        Currency.cache.clear()
+        Config.cache.clear()
+        CurrencyResolver.cache.clear()
+        self._bot.cache.guilds.clear()
+        self._bot.cache.users.clear()
+        self._bot.leaderboards.clear()
+
+    def _on_notification(self, _: Connection, __: int, ___: str, payload: str) -> None:
+        data = json.loads(payload)
+        if data.pop("origin") == self.origin:
+            return
+
+        self.received += 1
+        self.apply(data.pop("event"), data)
+
+    def _on_termination(self, _: Connection) -> None:
+        if self._closed or self._reconnecting:
+            return
+
+        self.logger.warning("Invalidation listener lost its connection")
+        self._reconnecting = asyncio.create_task(self._reconnect())
+
+    async def _reconnect(self) -> None:
+        delay = 1.0
+        try:
+            if self._con:
+                con, self._con = self._con, None
+                await self._bot.pool.release(con)
+
+            while not self._closed:
+                try:
+                    await self.start()
+                except Exception as err:
+                    self.logger.error("Failed to reconnect listener : %s", err)
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 2, 60)
+                    continue
+
+                # Anything could have changed while we were not listening
+                self.resync()
+                await self._bot.search.load()
+                self.logger.info("Invalidation listener reconnected")
+                return
+        finally:
+            self._reconnecting = None
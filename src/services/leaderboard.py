@@ -0,0 +1,229 @@
+import asyncio
+import bisect
+import time
+from typing import TYPE_CHECKING, Dict, List, Tuple
+
+from discord.ext.commands import BadArgument
+
+if TYPE_CHECKING:
+    from main import DebtBot
+
+
+class Board:
+    """
+    The exact top accounts of a currency by wallet, ordered like the `banks_currencyid_wallet_idx` index.
+
+    Attributes
+    ----------
+    size : int
+        The maximum amount of accounts kept.
+    exhaustive : bool
+        Whether every account of the currency is in the board.
+    loaded_at : float
+        When the board was built.
+    """
+
+    def __init__(self, size: int, rows: List[Tuple[int, int]]) -> None:
+        self.size = size
+        # (-wallet, userid), sorted ascending means richest first then lowest id
+        self._entries = sorted((-wallet, userid) for userid, wallet in rows)
+        self._wallets = {userid: wallet for userid, wallet in rows}
+        self.exhaustive = len(rows) < size
+        self.loaded_at = time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def entries(self) -> List[Tuple[int, int]]:
+        """Returns the (userid, wallet) of the board, richest first."""
+        return [(userid, -wallet) for wallet, userid in self._entries]
+
+    def update(self, userid: int, wallet: int) -> None:
+        """Applies a new wallet, keeping the board exact."""
+        key = (-wallet, userid)
+        old = self._wallets.pop(userid, None)
+        if old is not None:
+            del self._entries[bisect.bisect_left(self._entries, (-old, userid))]
+
+        # Anyone outside of the board is at most the tail, so only the better ones can get in
+        if self.exhaustive or (self._entries and key < self._entries[-1]):
+            bisect.insort(self._entries, key)
+            self._wallets[userid] = wallet
+            if len(self._entries) > self.size:
+                _, dropped = self._entries.pop()
+                del self._wallets[dropped]
+                self.exhaustive = False
+
+
+class Leaderboards:
+    """
+    Per-currency leaderboards kept in memory and updated from balance changes.
+
+    Boards are built from an indexed query on first use, rebuilt once they
+    shrank too much or got too old (other processes update balances too),
+    and pages past the board are read with keyset queries, continuing from
+    the last account of the closest page served before.
+
+    Attributes
+    ----------
+    max_pages : int
+        The amount of pages that can be read, jumping straight to a deep
+        page skips every account since the closest page served.
+    """
+
+    def __init__(
+        self,
+        bot: "DebtBot",
+        size: int = 100,
+        max_age: float = 300,
+        max_pages: int = 100,
+    ) -> None:
+        self._bot = bot
+        self._boards: Dict[int, Board] = {}
+        self._loading: Dict[int, List[Tuple[int, int]]] = {}
+        self._rebuilding: Dict[int, asyncio.Future] = {}
+        # The (wallet, userid) served last before a rank, by currency
+        self._cursors: Dict[int, Dict[int, Tuple[int, int]]] = {}
+        self.size = size
+        self.max_age = max_age
+        self.max_pages = max_pages
+
+    def update(self, currencyid: int, userid: int, wallet: int) -> None:
+        """
+        Applies a new wallet to a leaderboard, if it is loaded.
+
+        Parameters
+        ----------
+        currencyid : int
+            The currency of the account.
+        userid : int
+            The owner of the account.
+        wallet : int
+            The new amount in the wallet.
+        """
+        if currencyid in self._loading:
+            self._loading[currencyid].append((userid, wallet))
+        elif board := self._boards.get(currencyid):
+            board.update(userid, wallet)
+
+    def invalidate(self, currencyid: int) -> None:
+        """Drops a leaderboard, it will be rebuilt on its next use."""
+        self._boards.pop(currencyid, None)
+        self._loading.pop(currencyid, None)
+        self._cursors.pop(currencyid, None)
+
+    def clear(self) -> None:
+        """Drops every leaderboard."""
+        self._boards.clear()
+        self._loading.clear()
+        self._cursors.clear()
+
+    async def get(self, currencyid: int) -> Board:
+        """Returns the leaderboard of a currency, concurrent rebuilds of the same one share a single query."""
+        board = self._boards.get(currencyid)
+        if (
+            board is not None
+            and (board.exhaustive or len(board) >= board.size // 2)
+            and time.monotonic() - board.loaded_at <= self.max_age
+        ):
+            return board
+
+        future = self._rebuilding.get(currencyid)
+        if future is None:
+            future = self._rebuilding[currencyid] = (
+                asyncio.get_running_loop().create_future()
+            )
+            try:
+                board = await self._build(currencyid)
+            except BaseException as err:
+                if isinstance(err, Exception):
+                    future.set_exception(err)
+                    # Retrieved here so waiter-less failures are not logged
+                    future.exception()
+                else:
+                    future.cancel()
+                raise
+            else:
+                future.set_result(board)
+            finally:
+                del self._rebuilding[currencyid]
+            return board
+
+        return await asyncio.shield(future)
+
+    async def _build(self, currencyid: int) -> Board:
+        # Changes that happen while querying are replayed on the new board
+        changes: List[Tuple[int, int]] = []
+        self._loading[currencyid] = changes
+        try:
+            if write_behind := self._bot.write_behind:
+                await write_behind.flush(write_behind.keys_of(currencyid))
+            rows = await self._bot.storage.top_accounts(currencyid, self.size)
+        finally:
+            # Not kept if the leaderboard was invalidated meanwhile
+            kept = self._loading.get(currencyid) is changes
+            if kept:
+                del self._loading[currencyid]
+
+        board = Board(self.size, rows)
+        for userid, wallet in changes:
+            board.update(userid, wallet)
+        if kept:
+            self._boards[currencyid] = board
+            self._cursors.pop(currencyid, None)
+        return board
+
+    async def get_page(
+        self, currencyid: int, page: int, per_page: int = 10
+    ) -> List[Tuple[int, int]]:
+        """
+        Returns a page of a leaderboard.
+
+        Parameters
+        ----------
+        currencyid : int
+            The currency of the leaderboard.
+        page : int
+            The page, starting at 0.
+        per_page : int
+            The amount of accounts per page.
+
+        Returns
+        -------
+        List[Tuple[int, int]]
+            The (userid, wallet) of the page, richest first.
+
+        Raises
+        ------
+        BadArgument
+            The page is past `max_pages`.
+        """
+        if page >= self.max_pages:
+            raise BadArgument(f"Only the first {self.max_pages} pages can be read")
+
+        board = await self.get(currencyid)
+        entries = board.entries
+        start = page * per_page
+        if start + per_page <= len(entries) or board.exhaustive:
+            return entries[start : start + per_page]
+
+        # Past the board, continue from the closest account already served
+        head = entries[start:]
+        cursors = self._cursors.setdefault(currencyid, {})
+        rank, after = len(entries), (
+            (entries[-1][1], entries[-1][0]) if entries else None
+        )
+        for served in cursors:
+            if rank < served <= start:
+                rank, after = served, cursors[served]
+
+        rows = await self._bot.storage.top_accounts(
+            currencyid,
+            per_page - len(head),
+            offset=max(0, start - rank),
+            after=after,
+        )
+        if rows:
+            cursors[start + len(head) + len(rows)] = (rows[-1][1], rows[-1][0])
+        return head + rows
@@ -0,0 +1,187 @@
+import asyncio
+import datetime
+import logging
+from typing import TYPE_CHECKING, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from main import DebtBot
+
+
+Entry = Tuple[int, int, int, int, int, str, bool, datetime.datetime]
+
+
+class Ledger:
+    """
+    An append-only record of every balance change, written in batches.
+
+    Entries are buffered and copied into `transactions` once the buffer
+    reaches `max_size` entries or its oldest entry is `max_age` seconds old.
+
+    Attributes
+    ----------
+    max_size : int
+        The amount of buffered entries that triggers a flush.
+    max_age : float
+        The maximum amount of seconds an entry stays buffered.
+    max_buffered : int
+        The amount of entries kept while the storage is unreachable, the oldest are dropped after that.
+    written : int
+        The amount of entries written since startup.
+    dropped : int
+        The amount of entries dropped since startup.
+    """
+
+    COLUMNS = (
+        "userid",
+        "guildid",
+        "currencyid",
+        "amount",
+        "targetid",
+        "reason",
+        "to_wallet",
+        "timestamp",
+    )
+
+    def __init__(
+        self,
+        bot: "DebtBot",
+        max_size: int = 500,
+        max_age: float = 5.0,
+        max_buffered: int = 100000,
+    ) -> None:
+        self._bot = bot
+        self._buffer: List[Entry] = []
+        self._task: Optional[asyncio.Task] = None
+        self._flushing: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+        self.logger = logging.getLogger("discord.ledger")
+        self.max_size = max_size
+        self.max_age = max_age
+        self.max_buffered = max_buffered
+        self.written = 0
+        self.dropped = 0
+
+    @property
+    def pending(self) -> int:
+        """Returns the number of entries waiting to be written."""
+        return len(self._buffer)
+
+    def record(
+        self,
+        userid: int,
+        guildid: int,
+        currencyid: int,
+        amount: int,
+        reason: Optional[str] = None,
+        targetid: int = 0,
+        to_wallet: bool = True,
+    ) -> None:
+        """
+        Buffers a balance change.
+
+        Parameters
+        ----------
+        userid : int
+            The owner of the account that changed.
+        guildid : int
+            The guild (or user for DMs) it happened in.
+        currencyid : int
+            The currency of the account.
+        amount : int
+            The amount added, negative if removed.
+        reason : Optional[str]
+            The reason for the change.
+        targetid : int
+            The other side of a transfer, if any.
+        to_wallet : bool
+            Whether the wallet or the bank changed.
+        """
+        self._buffer.append(
+            (
+                userid,
+                guildid,
+                currencyid,
+                amount,
+                targetid,
+                reason or "",
+                to_wallet,
+                datetime.datetime.now(datetime.timezone.utc),
+            )
+        )
+
+        if len(self._buffer) >= self.max_size and not self._flushing:
+            self._flushing = asyncio.create_task(self._flush_soon())
+
+    def discard(self, currencyid: int) -> int:
+        """
+        Drops the buffered entries of a currency, used when it is deleted.
+
+        Parameters
+        ----------
+        currencyid : int
+            The deleted currency.
+
+        Returns
+        -------
+        int
+            The amount of entries dropped.
+        """
+        kept = [entry for entry in self._buffer if entry[2] != currencyid]
+        dropped = len(self._buffer) - len(kept)
+        self._buffer = kept
+        return dropped
+
+    async def _flush_soon(self) -> None:
+        try:
+            await self.flush()
+        except Exception as err:
+            self.logger.error("Failed to flush the ledger : %s", err)
+        finally:
+            self._flushing = None
+
+    async def flush(self) -> int:
+        """
+        Writes the buffered entries.
+
+        Returns
+        -------
+        int
+            The amount of entries written.
+        """
+        async with self._lock:
+            batch, self._buffer = self._buffer, []
+            if not batch:
+                return 0
+
+            try:
+                await self._bot.storage.insert_transactions(self.COLUMNS, batch)
+            except Exception:
+                # Keep them for the next flush, without growing forever
+                self._buffer = batch + self._buffer
+                if (overflow := len(self._buffer) - self.max_buffered) > 0:
+                    del self._buffer[:overflow]
+                    self.dropped += overflow
+                raise
+
+            self.written += len(batch)
+            return len(batch)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.max_age)
+            try:
+                await self.flush()
+            except Exception as err:
+                self.logger.error("Failed to flush the ledger : %s", err)
+
+    def start(self) -> None:
+        """Starts flushing in the background."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        """Stops the background flushes and writes everything that is left."""
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
@@ -0,0 +1,350 @@
+import bisect
+import logging
+import time
+import weakref
+from collections import Counter
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence, Tuple
+
+from aiohttp import web
+from asyncpg import Connection, Pool
+from asyncpg.connection import LoggedQuery
+from discord import app_commands
+from discord.ext import commands
+
+from services import Config, Currency
+from services.resolver import CurrencyResolver
+from utils.lru import LRUCache
+
+if TYPE_CHECKING:
+    from main import DebtBot
+
+COMMAND_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1, 5)
+
+
+def fingerprint(query: str, length: int = 120) -> str:
+    """Returns a statement with its whitespace collapsed, short enough to be a label."""
+    return " ".join(query.split())[:length]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Series:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self, buckets: int) -> None:
+        self.counts = [0] * (buckets + 1)
+        self.sum = 0.0
+        self.count = 0
+
+
+class Histogram:
+    """
+    A Prometheus histogram, one series per combination of labels.
+
+    Attributes
+    ----------
+    name : str
+        The name of the metric.
+    labels : Tuple[str, ...]
+        The names of its labels.
+    buckets : Tuple[float, ...]
+        The upper bounds of its buckets, in seconds.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: Tuple[str, ...],
+        buckets: Tuple[float, ...],
+    ) -> None:
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self.series: Dict[Tuple[str, ...], _Series] = {}
+
+    def observe(self, values: Tuple[str, ...], seconds: float) -> None:
+        """Records a duration under the given label values."""
+        series = self.series.get(values)
+        if series is None:
+            series = self.series[values] = _Series(len(self.buckets))
+        series.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        series.sum += seconds
+        series.count += 1
+
+    def quantile(self, values: Tuple[str, ...], q: float) -> float:
+        """Estimates a quantile of a series, interpolating within its bucket like Prometheus does."""
+        series = self.series.get(values)
+        if series is None or series.count == 0:
+            return 0.0
+
+        rank, seen = q * series.count, 0
+        for i, count in enumerate(series.counts):
+            if seen + count >= rank and count:
+                if i == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[i - 1] if i else 0.0
+                return lower + (self.buckets[i] - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+    def render(self) -> List[str]:
+        """Returns the histogram in the Prometheus text format."""
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for values, series in self.series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, series.counts):
+                cumulative += count
+                le = _labels(self.labels, values, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            inf = _labels(self.labels, values, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{inf} {series.count}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, values)} {series.sum}")
+            lines.append(
+                f"{self.name}_count{_labels(self.labels, values)} {series.count}"
+            )
+        return lines
+
+
+class _TimedAcquire:
+    """Acquires a connection, recording how long it waited for one."""
+
+    __slots__ = ("_pool", "_metrics", "_timeout", "_con")
+
+    def __init__(self, pool: Pool, metrics: "Metrics", timeout: Optional[float]):
+        self._pool = pool
+        self._metrics = metrics
+        self._timeout = timeout
+        self._con = None
+
+    async def _acquire(self):
+        start = time.perf_counter()
+        con = await self._pool.acquire(timeout=self._timeout)
+        self._metrics.acquires.observe((), time.perf_counter() - start)
+        return con
+
+    def __await__(self):
+        return self._acquire().__await__()
+
+    async def __aenter__(self):
+        self._con = await self._acquire()
+        return self._con
+
+    async def __aexit__(self, *_) -> None:
+        con, self._con = self._con, None
+        await self._pool.release(con)
+
+
+class InstrumentedPool:
+    """
+    The connection pool, with its acquisitions timed.
+
+    Everything but `acquire` is forwarded to the wrapped pool.
+    """
+
+    def __init__(self, pool: Pool, metrics: "Metrics") -> None:
+        self._pool = pool
+        self._metrics = metrics
+
+    def __getattr__(self, name: str):
+        return getattr(self._pool, name)
+
+    def acquire(self, *, timeout: Optional[float] = None) -> _TimedAcquire:
+        return _TimedAcquire(self._pool, self._metrics, timeout)
+
+
+class Metrics:
+    """
+    Latency and health metrics, exported in the Prometheus text format.
+
+    Commands are timed from `on_command` to their completion or error,
+    statements through the query logger of every pool connection, and
+    pool acquisitions through `InstrumentedPool`. Pool and cache gauges
+    are read when scraped.
+
+    Attributes
+    ----------
+    commands : Histogram
+        Command latencies by cog, command and outcome.
+    queries : Histogram
+        Statement latencies by fingerprint.
+    acquires : Histogram
+        How long acquiring a connection waited.
+    query_errors : Counter[str]
+        The amount of failed statements by fingerprint.
+    """
+
+    # Past that many distinct statements, new ones share a single series
+    MAX_STATEMENTS = 500
+
+    def __init__(self, bot: "DebtBot") -> None:
+        self._bot = bot
+        self._started: weakref.WeakKeyDictionary[commands.Context, float] = (
+            weakref.WeakKeyDictionary()
+        )
+        self._runner: Optional[web.AppRunner] = None
+        self.logger = logging.getLogger("discord.metrics")
+        self.commands = Histogram(
+            "debtbot_command_duration_seconds",
+            "Time spent running commands.",
+            ("cog", "command", "outcome"),
+            COMMAND_BUCKETS,
+        )
+        self.queries = Histogram(
+            "debtbot_query_duration_seconds",
+            "Time spent running statements.",
+            ("statement",),
+            QUERY_BUCKETS,
+        )
+        self.acquires = Histogram(
+            "debtbot_pool_acquire_seconds",
+            "Time spent waiting for a pool connection.",
+            (),
+            QUERY_BUCKETS,
+        )
+        self.query_errors: Counter[str] = Counter()
+
+    def command_started(self, ctx: commands.Context["DebtBot"]) -> None:
+        self._started[ctx] = time.perf_counter()
+
+    def command_finished(
+        self, ctx: commands.Context["DebtBot"], error: Optional[Exception] = None
+    ) -> None:
+        start = self._started.pop(ctx, None)
+        if start is None or ctx.command is None:
+            return
+
+        if error is None:
+            outcome = "ok"
+        else:
+            while original := getattr(error, "original", None):
+                error = original
+            # Errors meant for the user are not failures of the bot
+            expected = (commands.CommandError, app_commands.AppCommandError)
+            outcome = "rejected" if isinstance(error, expected) else "error"
+
+        cog = ctx.cog.qualified_name if ctx.cog else "none"
+        self.commands.observe(
+            (cog, ctx.command.qualified_name, outcome), time.perf_counter() - start
+        )
+
+    def statement(self, query: str) -> str:
+        """Returns the label of a statement, bounded to `MAX_STATEMENTS` distinct ones."""
+        label = fingerprint(query)
+        if (label,) in self.queries.series or len(
+            self.queries.series
+        ) < self.MAX_STATEMENTS:
+            return label
+        return "other"
+
+    def on_query(self, record: LoggedQuery) -> None:
+        label = self.statement(record.query)
+        self.queries.observe((label,), record.elapsed)
+        if record.exception is not None:
+            self.query_errors[label] += 1
+
+    async def init_connection(self, con: Connection) -> None:
+        """Registers the query logger, used as the `init` of the pool."""
+        con.add_query_logger(self.on_query)
+
+    def instrument(self, pool: Pool) -> InstrumentedPool:
+        return InstrumentedPool(pool, self)
+
+    def caches(self) -> List[Tuple[str, LRUCache]]:
+        """Returns the LRU caches worth reporting, by name."""
+        return [
+            ("currencies", Currency.cache),
+            ("configs", Config.cache),
+            ("resolvers", CurrencyResolver.cache),
+            ("guild_completions", self._bot.cache.guilds),
+            ("user_completions", self._bot.cache.users),
+        ]
+
+    def render(self) -> str:
+        """Returns every metric in the Prometheus text format."""
+        lines: List[str] = []
+        for histogram in (self.commands, self.queries, self.acquires):
+            lines.extend(histogram.render())
+
+        lines += [
+            "# HELP debtbot_query_errors_total Failed statements.",
+            "# TYPE debtbot_query_errors_total counter",
+        ]
+        for label, count in self.query_errors.items():
+            lines.append(
+                f"debtbot_query_errors_total{_labels(('statement',), (label,))} {count}"
+            )
+
+        statements = getattr(self._bot.storage, "statements", None)
+        if statements is not None:
+            lines += [
+                "# HELP debtbot_prepared_calls_total Executions of registered statements.",
+                "# TYPE debtbot_prepared_calls_total counter",
+            ]
+            for name in statements.sql:
+                lines.append(
+                    f"debtbot_prepared_calls_total{_labels(('statement',), (name,))} "
+                    f"{statements.calls[name]}"
+                )
+
+        pool = getattr(self._bot, "pool", None)
+        if pool is not None:
+            size, idle = pool.get_size(), pool.get_idle_size()
+            for name, help, value in (
+                ("debtbot_pool_size", "Open pool connections.", size),
+                ("debtbot_pool_in_use", "Pool connections in use.", size - idle),
+                (
+                    "debtbot_pool_max_size",
+                    "Maximum pool connections.",
+                    pool.get_max_size(),
+                ),
+            ):
+                lines += [
+                    f"# HELP {name} {help}",
+                    f"# TYPE {name} gauge",
+                    f"{name} {value}",
+                ]
+
+        caches = self.caches()
+        for name, help, attr, kind in (
+            ("debtbot_cache_hits_total", "Cache hits.", "hits", "counter"),
+            ("debtbot_cache_misses_total", "Cache misses.", "misses", "counter"),
+            ("debtbot_cache_hit_ratio", "Cache hit ratio.", "hit_ratio", "gauge"),
+            ("debtbot_cache_entries", "Cache entries.", "__len__", "gauge"),
+        ):
+            lines += [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+            for cache, lru in caches:
+                value = len(lru) if attr == "__len__" else getattr(lru, attr)
+                lines.append(f"{name}{_labels(('cache',), (cache,))} {value}")
+
+        return "\n".join(lines) + "\n"
+
+    async def _handle(self, _: web.Request) -> web.Response:
+        return web.Response(
+            text=self.render(), content_type="text/plain", charset="utf-8"
+        )
+
+    async def start(self, host: str, port: int) -> None:
+        """Serves the metrics on `http://host:port/metrics`."""
+        app = web.Application()
+        app.router.add_get("/metrics", self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+        self.logger.info("Serving metrics on http://%s:%d/metrics", host, port)
+
+    async def close(self) -> None:
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
@@ -0,0 +1,106 @@
+import logging
+import re
+from pathlib import Path
+from typing import List, NamedTuple
+
+from asyncpg import Connection
+
+MIGRATIONS_PATH = Path(__file__).parent.parent / "migrations"
+
+# Arbitrary key, keeps two processes from migrating at the same time
+LOCK_KEY = 0x44454254
+
+
+class Migration(NamedTuple):
+    """
+    A schema change, read from `migrations/<version>_<name>.sql`.
+
+    Attributes
+    ----------
+    version : int
+        The order in which the migration is applied.
+    name : str
+        The name of the migration.
+    sql : str
+        The statements of the migration.
+    """
+
+    version: int
+    name: str
+    sql: str
+
+
+def load(path: Path = MIGRATIONS_PATH) -> List[Migration]:
+    """
+    Reads the migrations from a folder.
+
+    Parameters
+    ----------
+    path : Path
+        The folder containing the migrations.
+
+    Returns
+    -------
+    List[Migration]
+        The migrations, sorted by version.
+    """
+    migrations = []
+    for file in path.glob("*.sql"):
+        match = re.fullmatch(r"(\d+)_(\w+)\.sql", file.name)
+        if not match:
+            raise ValueError(f"Invalid migration file name `{file.name}`")
+
+        migrations.append(
+            Migration(int(match.group(1)), match.group(2), file.read_text())
+        )
+
+    migrations.sort(key=lambda m: m.version)
+    for previous, current in zip(migrations, migrations[1:]):
+        if previous.version == current.version:
+            raise ValueError(f"Duplicate migration version {current.version}")
+
+    return migrations
+
+
+async def migrate(con: Connection, logger: logging.Logger) -> List[Migration]:
+    """
+    Applies the migrations that were not applied yet, each in its own transaction.
+
+    Parameters
+    ----------
+    con : Connection
+        The connection to migrate with.
+    logger : Logger
+        Where to report the applied migrations.
+
+    Returns
+    -------
+    List[Migration]
+        The migrations that were applied.
+    """
+    await con.execute("SELECT pg_advisory_lock($1);", LOCK_KEY)
+    try:
+        await con.execute("""CREATE TABLE IF NOT EXISTS schema_migrations (
+                version integer PRIMARY KEY,
+                name text NOT NULL,
+                applied_at timestamp DEFAULT NOW()
+            );""")
+        applied = {
+            r["version"]
+            for r in await con.fetch("SELECT version FROM schema_migrations;")
+        }
+
+        migrations = [m for m in load() if m.version not in applied]
+        for migration in migrations:
+            async with con.transaction():
+                await con.execute(migration.sql)
+                await con.execute(
+                    "INSERT INTO schema_migrations (version, name) VALUES ($1, $2);",
+                    migration.version,
+                    migration.name,
+                )
+            logger.info("Applied migration %04d_%s", migration.version, migration.name)
+
+        return migrations
+    finally:
+        await con.execute("SELECT pg_advisory_unlock($1);", LOCK_KEY)
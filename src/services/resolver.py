@@ -0,0 +1,190 @@
+import difflib
+import os
+import re
+from typing import TYPE_CHECKING, Dict, Iterable, List, Self, Tuple
+
+from asyncpg import Record
+from discord.ext import commands
+
+from services.config import Config
+from utils.errors import (
+    AmbiguousCurrencyError,
+    CurrencyNotFoundError,
+    NoCurrenciesError,
+)
+from utils.lru import LRUCache
+
+if TYPE_CHECKING:
+    from main import DebtBot
+
+CUSTOM_EMOJI = re.compile(r"<a?:(\w+):\d+>")
+
+
+def normalize(text: str) -> str:
+    """Lowercases a name and collapses its whitespace."""
+    return " ".join(text.casefold().split())
+
+
+class CurrencyResolver:
+    """
+    Resolves user input into one of a guild's currencies, without any query.
+
+    Built once per guild from its currencies and dropped by the invalidator
+    whenever they change. Queries are matched, in order, against the icons,
+    the names, the aliases (plural or singular form, name without spaces,
+    custom emoji name) and finally a fuzzy match on the names.
+
+    Attributes
+    ----------
+    ids : frozenset[int]
+        The currencies of the guild.
+    """
+
+    # Resolvers by guild (or user for DMs), they only hold records
+    cache: LRUCache[int, "CurrencyResolver"] = LRUCache(
+        int(os.environ.get("RESOLVER_CACHE_SIZE") or 4096)
+    )
+
+    # Minimum similarity of a fuzzy match
+    THRESHOLD = 0.9
+
+    def __init__(self, records: Iterable[Record]) -> None:
+        records = sorted(records, key=lambda r: r["id"])
+        self.ids = frozenset(r["id"] for r in records)
+        self._records: Dict[int, Record] = {r["id"]: r for r in records}
+        self._icons: Dict[str, int] = {}
+        self._names: Dict[str, int] = {}
+        self._aliases: Dict[str, List[int]] = {}
+        self._matchers: List[Tuple[int, difflib.SequenceMatcher]] = []
+
+        for record in records:
+            id, name, icon = record["id"], normalize(record["name"]), record["icon"]
+            if icon:
+                self._icons.setdefault(icon, id)
+                # Some clients send emojis without their variation selector
+                self._icons.setdefault(
+                    icon.replace("\N{VARIATION SELECTOR-16}", ""), id
+                )
+                if match := CUSTOM_EMOJI.fullmatch(icon):
+                    self._alias(match.group(1).casefold(), id)
+
+            self._names.setdefault(name, id)
+            self._alias(name[:-1] if name.endswith("s") else name + "s", id)
+            self._alias(name.replace(" ", ""), id)
+
+            # The matcher caches what it knows about the name, only the query changes
+            matcher = difflib.SequenceMatcher(autojunk=False)
+            matcher.set_seq2(name)
+            self._matchers.append((id, matcher))
+
+    def _alias(self, alias: str, id: int) -> None:
+        ids = self._aliases.setdefault(alias, [])
+        if id not in ids:
+            ids.append(id)
+
+    def resolve(self, query: str) -> Record:
+        """
+        Resolves a query into a currency.
+
+        Parameters
+        ----------
+        query : str
+            An icon, a name or something close enough to a name.
+
+        Returns
+        -------
+        Record
+            The record of the currency.
+
+        Raises
+        ------
+        NoCurrenciesError
+            If the guild has no currencies.
+        CurrencyNotFoundError
+            If nothing matches.
+        AmbiguousCurrencyError
+            If several currencies match equally well.
+        """
+        if not self._records:
+            raise NoCurrenciesError
+
+        query = query.strip()
+        if (id := self._icons.get(query)) is not None:
+            return self._records[id]
+
+        normalized = normalize(query)
+        if (id := self._names.get(normalized)) is not None:
+            return self._records[id]
+
+        if ids := self._aliases.get(normalized):
+            if len(ids) > 1:
+                raise AmbiguousCurrencyError([self._records[i]["name"] for i in ids])
+            return self._records[ids[0]]
+
+        best, matches = self.THRESHOLD, []
+        for id, matcher in self._matchers:
+            matcher.set_seq1(normalized)
+            # Cheap upper bounds first, most names are not even close
+            if matcher.real_quick_ratio() < best or matcher.quick_ratio() < best:
+                continue
+
+            score = matcher.ratio()
+            if score > best:
+                best, matches = score, [id]
+            elif score == best:
+                matches.append(id)
+
+        if len(matches) > 1:
+            raise AmbiguousCurrencyError([self._records[i]["name"] for i in matches])
+        if matches:
+            return self._records[matches[0]]
+
+        raise CurrencyNotFoundError
+
+    @classmethod
+    async def get(cls, ctx: commands.Context["DebtBot"]) -> Self:
+        """
+        Returns the resolver of the guild, building it if needed.
+
+        Parameters
+        ----------
+        ctx : Context
+            The context of the command.
+
+        Returns
+        -------
+        CurrencyResolver
+            The resolver of the guild.
+        """
+
+        async def load() -> Self:
+            config = await Config.get(ctx)
+            return cls(c.record for c in await config.get_currencies())
+
+        return await cls.cache.get_or_load((ctx.guild or ctx.author).id, load)
+
+    @classmethod
+    def invalidate(cls, id: int) -> None:
+        """
+        Drops the resolver of a guild, must be called whenever its currencies change.
+
+        Parameters
+        ----------
+        id : int
+            The id of the guild.
+        """
+        cls.cache.invalidate(id)
+
+    @classmethod
+    def invalidate_currency(cls, id: int) -> None:
+        """
+        Drops the resolvers of every guild using a currency.
+
+        Parameters
+        ----------
+        id : int
+            The id of the currency.
+        """
+        for guild, resolver in cls.cache.items():
+            if id in resolver.ids:
+                cls.cache.invalidate(guild)
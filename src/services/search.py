@@ -0,0 +1,188 @@
+import re
+from collections import Counter
+from typing import TYPE_CHECKING, Dict, FrozenSet, List, Optional, Set, Tuple
+
+from discord.ext import commands
+
+from services.currency import Currency
+from services.unitofwork import UnitOfWork
+
+if TYPE_CHECKING:
+    from main import DebtBot
+
+
+def trigrams(text: str) -> FrozenSet[str]:
+    """
+    Splits a text into trigrams the same way `pg_trgm` does.
+
+    Each lowercased alphanumeric word is padded with two spaces in front and one behind.
+    """
+    grams = set()
+    for word in re.findall(r"\w+", text.lower()):
+        padded = f"  {word} "
+        grams.update(padded[i : i + 3] for i in range(len(padded) - 2))
+    return frozenset(grams)
+
+
+class TrigramIndex:
+    """
+    An in-process trigram index over currency names and icons.
+
+    Mirrors the `pg_trgm` search for deployments without the extension:
+    exact icons first, then names containing the query, then by similarity.
+    """
+
+    def __init__(self, threshold: float = 0.3) -> None:
+        self.threshold = threshold
+        self._docs: Dict[int, Tuple[str, str, FrozenSet[str]]] = {}
+        self._postings: Dict[str, Set[int]] = {}
+        self._icons: Dict[str, Set[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def add(self, id: int, name: str, icon: str) -> None:
+        """Indexes a currency, replacing it if it was already indexed."""
+        self.remove(id)
+        grams = trigrams(name)
+        self._docs[id] = (name.lower(), icon, grams)
+        for gram in grams:
+            self._postings.setdefault(gram, set()).add(id)
+        self._icons.setdefault(icon, set()).add(id)
+
+    def remove(self, id: int) -> None:
+        """Removes a currency from the index, if it was indexed."""
+        doc = self._docs.pop(id, None)
+        if not doc:
+            return
+
+        _, icon, grams = doc
+        for gram in grams:
+            postings = self._postings[gram]
+            postings.discard(id)
+            if not postings:
+                del self._postings[gram]
+
+        icons = self._icons[icon]
+        icons.discard(id)
+        if not icons:
+            del self._icons[icon]
+
+    def search(self, query: str, limit: int = 10) -> List[int]:
+        """
+        Searches the index.
+
+        Parameters
+        ----------
+        query : str
+            What to look for.
+        limit : int
+            The maximum amount of results.
+
+        Returns
+        -------
+        List[int]
+            The ids of the matching currencies, most relevant first.
+        """
+        lowered = query.lower()
+        grams = trigrams(query)
+
+        shared: Counter[int] = Counter()
+        for gram in grams:
+            shared.update(self._postings.get(gram, ()))
+
+        # Too short to share a trigram with the middle of a name, `ILIKE` still finds them
+        if len(lowered) < 3:
+            for id, (name, _, _) in self._docs.items():
+                if lowered in name and id not in shared:
+                    shared[id] = 0
+
+        scores: Dict[int, Tuple[bool, bool, float]] = {}
+        for id in self._icons.get(query, ()):
+            scores[id] = (True, lowered in self._docs[id][0], 0.0)
+
+        for id, count in shared.items():
+            name, icon, _ = self._docs[id]
+            # Same as `word_similarity`, the share of the query found in the name
+            similarity = count / len(grams) if grams else 0.0
+            contains = lowered in name
+            if contains or similarity >= self.threshold or id in scores:
+                scores[id] = (icon == query, contains, similarity)
+
+        ranked = sorted(
+            scores.items(), key=lambda item: (item[1], item[0]), reverse=True
+        )
+        return [id for id, _ in ranked[:limit]]
+
+
+class CurrencySearch:
+    """
+    Searches currencies by name or icon, most relevant first.
+
+    Uses the `pg_trgm` index by default or an in-process index if `in_memory` is set.
+    """
+
+    def __init__(self, bot: "DebtBot", in_memory: bool = False) -> None:
+        self._bot = bot
+        self.index: Optional[TrigramIndex] = TrigramIndex() if in_memory else None
+
+    async def load(self) -> None:
+        """Fills the in-process index from scratch, if any."""
+        if self.index is None:
+            return
+
+        index = TrigramIndex(self.index.threshold)
+        for record in await self._bot.storage.list_currencies():
+            index.add(record["id"], record["name"], record["icon"])
+        self.index = index
+
+    def add(self, id: int, name: str, icon: str) -> None:
+        """Indexes a newly created or edited currency."""
+        if self.index is not None:
+            self.index.add(id, name, icon)
+
+    def remove(self, currency: Currency | int) -> None:
+        """Removes a deleted currency from the index."""
+        if self.index is not None:
+            self.index.remove(currency if isinstance(currency, int) else currency.id)
+
+    async def search(
+        self, ctx: commands.Context["DebtBot"], query: Optional[str], limit: int = 10
+    ) -> List[Currency]:
+        """
+        Searches currencies.
+
+        Parameters
+        ----------
+        ctx : Context
+            The context of the command.
+        query : Optional[str]
+            What to look for, if empty, returns the latest currencies.
+        limit : int
+            The maximum amount of results.
+
+        Returns
+        -------
+        List[Currency]
+            The matching currencies, most relevant first.
+        """
+        if not query:
+            records = await self._bot.storage.latest_currencies(limit)
+        elif self.index is not None:
+            ids = self.index.search(query, limit)
+            records = await Currency.get_records(self._bot, ids)
+        else:
+            pattern = "%" + re.sub(r"([\\%_])", r"\\\1", query) + "%"
+            async with UnitOfWork.acquire(self._bot.pool) as con:
+                records = await con.fetch(
+                    """SELECT * FROM currencies
+                    WHERE deleted_at IS NULL AND (name ILIKE $2 OR $1 <% name OR icon = $1)
+                    ORDER BY icon = $1 DESC, name ILIKE $2 DESC,
+                    word_similarity($1, name) DESC, id DESC
+                    LIMIT $3;""",
+                    query,
+                    pattern,
+                    limit,
+                )
+
+        return [Currency(ctx, r) for r in records]
@@ -0,0 +1,88 @@
+import datetime
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    from main import DebtBot
+
+# Arbitrary key, only one process takes the daily snapshot
+LOCK_KEY = 0x534E4150
+
+
+async def latest_snapshot(bot: "DebtBot") -> Optional[datetime.date]:
+    """Returns the last day that was snapshotted, if any."""
+    async with bot.pool.acquire() as con:
+        return await con.fetchval("SELECT max(day) FROM balance_snapshots;")
+
+
+async def take_snapshot(bot: "DebtBot", day: datetime.date) -> Optional[int]:
+    """
+    Snapshots the balances that changed since their last snapshot.
+
+    Each currency is snapshotted in its own statement to keep them short.
+    Balances are rewound to the end of the day with the ledger entries
+    written after it, so days missed while the bot was down are exact too.
+
+    Parameters
+    ----------
+    bot : DebtBot
+        The bot.
+    day : date
+        The day the balances are the end of.
+
+    Returns
+    -------
+    Optional[int]
+        The amount of rows written, None if another process is already snapshotting.
+    """
+    if bot.write_behind:
+        await bot.write_behind.flush()
+    await bot.ledger.flush()
+    end = datetime.datetime.combine(
+        day + datetime.timedelta(days=1), datetime.time(), datetime.timezone.utc
+    )
+
+    async with bot.pool.acquire() as con:
+        if not await con.fetchval("SELECT pg_try_advisory_lock($1);", LOCK_KEY):
+            return None
+
+        try:
+            written = 0
+            for currency in await con.fetch(
+                "SELECT id FROM currencies WHERE deleted_at IS NULL;"
+            ):
+                status = await con.execute(
+                    """INSERT INTO balance_snapshots (userid, currencyid, day, wallet, bank)
+                    SELECT b.userid, b.currencyid, $1, b.wallet, b.bank
+                    FROM (
+                        SELECT banks.userid, banks.currencyid,
+                            banks.wallet - coalesce(later.wallet, 0) AS wallet,
+                            banks.bank - coalesce(later.bank, 0) AS bank
+                        FROM banks
+                        LEFT JOIN LATERAL (
+                            SELECT sum(amount) FILTER (WHERE to_wallet) AS wallet,
+                                sum(amount) FILTER (WHERE NOT to_wallet) AS bank
+                            FROM transactions t
+                            WHERE t.userid = banks.userid AND t.currencyid = banks.currencyid
+                            AND t.timestamp >= $3
+                        ) later ON TRUE
+                        WHERE banks.currencyid = $2
+                    ) b
+                    LEFT JOIN LATERAL (
+                        SELECT wallet, bank FROM balance_snapshots s
+                        WHERE s.userid = b.userid AND s.currencyid = b.currencyid AND s.day < $1
+                        ORDER BY s.day DESC LIMIT 1
+                    ) last ON TRUE
+                    WHERE (
+                        last.wallet IS DISTINCT FROM b.wallet OR last.bank IS DISTINCT FROM b.bank
+                    ) AND (last.wallet IS NOT NULL OR b.wallet <> 0 OR b.bank <> 0)
+                    ON CONFLICT (userid, currencyid, day)
+                    DO UPDATE SET wallet = EXCLUDED.wallet, bank = EXCLUDED.bank;""",
+                    day,
+                    currency["id"],
+                    end,
+                )
+                written += int(status.split()[-1])
+
+            return written
+        finally:
+            await con.execute("SELECT pg_advisory_unlock($1);", LOCK_KEY)
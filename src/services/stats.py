@@ -0,0 +1,71 @@
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    from main import DebtBot
+
+# Arbitrary key, only one process reconciles at a time
+LOCK_KEY = 0x53544154
+
+
+async def reconcile(bot: "DebtBot") -> Optional[int]:
+    """
+    Recounts the accounts and supply of every currency.
+
+    The accounts counters are kept by triggers and should not drift, the
+    supply is only refreshed here. Each currency is recounted in its own
+    short transaction, holding its counter's row so the triggers of
+    concurrent statements are applied on top of the recount.
+
+    Parameters
+    ----------
+    bot : DebtBot
+        The bot.
+
+    Returns
+    -------
+    Optional[int]
+        The amount of counters that were corrected, None if another process is already reconciling.
+    """
+    if bot.write_behind:
+        await bot.write_behind.flush()
+
+    async with bot.pool.acquire() as con:
+        if not await con.fetchval("SELECT pg_try_advisory_lock($1);", LOCK_KEY):
+            return None
+
+        try:
+            corrected = 0
+            await con.execute("""DELETE FROM currency_stats s WHERE NOT EXISTS (
+                    SELECT 1 FROM currencies WHERE id = s.currencyid
+                );""")
+            for currency in await con.fetch(
+                "SELECT id FROM currencies WHERE deleted_at IS NULL;"
+            ):
+                async with con.transaction():
+                    await con.execute(
+                        """INSERT INTO currency_stats (currencyid) VALUES ($1)
+                        ON CONFLICT (currencyid) DO NOTHING;""",
+                        currency["id"],
+                    )
+                    old = await con.fetchrow(
+                        "SELECT * FROM currency_stats WHERE currencyid = $1 FOR UPDATE;",
+                        currency["id"],
+                    )
+                    new = await con.fetchrow(
+                        """SELECT count(*) AS accounts, COALESCE(sum(wallet::bigint + bank), 0) AS supply
+                        FROM banks WHERE currencyid = $1;""",
+                        currency["id"],
+                    )
+                    await con.execute(
+                        """UPDATE currency_stats SET accounts = $2, supply = $3, reconciled_at = NOW()
+                        WHERE currencyid = $1;""",
+                        currency["id"],
+                        new["accounts"],
+                        new["supply"],
+                    )
+                    if old["accounts"] != new["accounts"]:
+                        corrected += 1
+
+            return corrected
+        finally:
+            await con.execute("SELECT pg_advisory_unlock($1);", LOCK_KEY)
@@ -0,0 +1,5 @@
+from .base import Storage
+from .memory import MemoryStorage
+from .postgres import PostgresStorage
+
+__all__ = ["Storage", "MemoryStorage", "PostgresStorage"]
@@ -0,0 +1,159 @@
+import datetime
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+# Rows are asyncpg records or plain dicts, both are read by key
+Row = Mapping[str, Any]
+AccountKey = Tuple[int, int]
+
+
+class Storage(ABC):
+    """
+    Where currencies, guild configs and accounts are kept.
+
+    Every service reads and writes through one of these, selected by
+    `STORAGE_BACKEND` when the bot starts.
+
+    Attributes
+    ----------
+    sql : bool
+        Whether this is the Postgres database, features built on raw SQL
+        (snapshots, shard reports, the pg_trgm search...) are disabled otherwise.
+    """
+
+    sql: bool = False
+
+    async def start(self) -> None:
+        """Prepares the storage, called once before anything else."""
+
+    async def close(self) -> None:
+        """Releases the storage, called once when the bot closes."""
+
+    # Currencies
+
+    @abstractmethod
+    async def fetch_currencies(self, ids: Sequence[int]) -> List[Row]:
+        """Returns the currencies that exist among `ids`, in any order."""
+
+    @abstractmethod
+    async def fetch_user_currencies(self, owner: int) -> List[Row]:
+        """Returns the currencies created by a user."""
+
+    @abstractmethod
+    async def latest_currencies(self, limit: int) -> List[Row]:
+        """Returns the most recently created currencies, newest first."""
+
+    @abstractmethod
+    async def list_currencies(self) -> List[Row]:
+        """Returns every currency, used to build in-process indexes."""
+
+    @abstractmethod
+    async def create_currency(self, name: str, icon: str, owner: int) -> Row:
+        """Creates a currency and returns it."""
+
+    @abstractmethod
+    async def tombstone_currency(self, id: int) -> None:
+        """Hides a currency and removes it from every guild, its rows are left to `purge_currency`."""
+
+    @abstractmethod
+    async def tombstoned_currencies(self) -> List[int]:
+        """Returns the currencies that are not purged yet."""
+
+    @abstractmethod
+    async def purge_currency(self, id: int, limit: int) -> Tuple[str, int]:
+        """
+        Deletes up to `limit` rows of a tombstoned currency, then the currency once none are left.
+
+        Returns what was deleted, "accounts", "transactions" or "snapshots",
+        and how many, ("done", 0) once the currency is gone.
+        """
+
+    @abstractmethod
+    async def currency_stats(
+        self, id: int
+    ) -> Optional[Tuple[int, int, Optional[datetime.datetime]]]:
+        """
+        Returns the amount of accounts of a currency and the money they hold.
+
+        Also returns when the money was last counted, None if it is always up to date.
+        """
+
+    # Guild configs
+
+    @abstractmethod
+    async def fetch_config(self, guildid: int) -> List[int]:
+        """Returns the currencies of a guild, in the order they were added."""
+
+    @abstractmethod
+    async def add_guild_currency(self, guildid: int, currencyid: int) -> List[int]:
+        """Adds a currency to a guild unless it is already there and returns its currencies."""
+
+    @abstractmethod
+    async def remove_guild_currency(self, guildid: int, currencyid: int) -> List[int]:
+        """Removes a currency from a guild and returns its currencies."""
+
+    # Accounts
+
+    @abstractmethod
+    async def fetch_accounts(self, keys: Sequence[AccountKey]) -> Dict[AccountKey, Row]:
+        """Returns the accounts by (userid, currencyid), creating the missing ones."""
+
+    @abstractmethod
+    async def add_money(
+        self, userid: int, currencyid: int, amount: int, to_wallet: bool
+    ) -> Optional[Row]:
+        """Adds money to the wallet or bank of an account and returns it, None if it does not exist."""
+
+    @abstractmethod
+    async def apply_deltas(self, deltas: Sequence[Tuple[int, int, int, int]]) -> None:
+        """Adds (userid, currencyid, wallet, bank) deltas to their accounts."""
+
+    @abstractmethod
+    async def spend(
+        self, userid: int, currencyid: int, amount: int
+    ) -> Tuple[bool, Optional[int]]:
+        """Removes money from a wallet if it has enough, returns whether it did and the wallet, None if it does not exist."""
+
+    @abstractmethod
+    async def transfer(
+        self, userid: int, targetid: int, currencyid: int, amount: int
+    ) -> Tuple[bool, Optional[int], Optional[int]]:
+        """
+        Moves money between two wallets if the source has enough and both exist.
+
+        Returns whether it did and both wallets, None for an account that does not exist.
+        """
+
+    @abstractmethod
+    async def move(
+        self, userid: int, currencyid: int, amount: int, to_wallet: bool
+    ) -> Tuple[bool, Optional[Row]]:
+        """Moves money between the bank and the wallet of an account if it has enough, returns whether it did and the account, None if it does not exist."""
+
+    @abstractmethod
+    async def top_accounts(
+        self,
+        currencyid: int,
+        limit: int,
+        offset: int = 0,
+        after: Optional[Tuple[int, int]] = None,
+    ) -> List[Tuple[int, int]]:
+        """Returns (userid, wallet) richest first, starting after the (wallet, userid) `after` if given."""
+
+    @abstractmethod
+    async def balance_snapshots(
+        self,
+        userid: int,
+        currencyid: int,
+        start: datetime.date,
+        end: datetime.date,
+    ) -> List[Row]:
+        """Returns the (day, wallet, bank) snapshots of the range, preceded by the last one before it."""
+
+    # Ledger
+
+    @abstractmethod
+    async def insert_transactions(
+        self, columns: Sequence[str], rows: Sequence[Sequence[Any]]
+    ) -> None:
+        """Appends entries to the ledger."""
@@ -0,0 +1,375 @@
+import asyncio
+import collections
+import datetime
+import heapq
+import json
+import logging
+import os
+from typing import Any, Deque, Dict, List, Optional, Sequence, Set, Tuple
+
+from services.storage.base import AccountKey, Storage
+
+
+class MemoryStorage(Storage):
+    """
+    Keeps everything in indexed dicts, snapshotted to a JSON file.
+
+    Meant for single-process deployments, local testing and benchmarks:
+    reads never leave the process. The state is written to `path` every
+    `interval` seconds if it changed and when the bot closes, so a crash
+    loses at most `interval` seconds of changes.
+
+    Daily balance snapshots are not taken in memory, `history` is disabled.
+
+    Attributes
+    ----------
+    path : str
+        Where the state is snapshotted.
+    interval : float
+        The amount of seconds between two snapshots.
+    """
+
+    def __init__(
+        self, path: str, interval: float = 60, max_transactions: int = 100000
+    ) -> None:
+        self.path = path
+        self.interval = interval
+        self.logger = logging.getLogger("discord.storage")
+        self._task: Optional[asyncio.Task] = None
+        self._dirty = False
+
+        self._currencies: Dict[int, Dict[str, Any]] = {}
+        self._owned: Dict[int, Set[int]] = collections.defaultdict(set)
+        self._next_currency = 1
+        self._configs: Dict[int, List[int]] = {}
+        self._guilds: Dict[int, Set[int]] = collections.defaultdict(set)
+        self._accounts: Dict[AccountKey, Dict[str, int]] = {}
+        self._holders: Dict[int, Set[int]] = collections.defaultdict(set)
+        self._supply: Dict[int, int] = collections.defaultdict(int)
+        self._transactions: Deque[Dict[str, Any]] = collections.deque(
+            maxlen=max_transactions
+        )
+
+    async def start(self) -> None:
+        if os.path.exists(self.path):
+            with open(self.path) as file:
+                self._restore(json.load(file))
+            self.logger.info(
+                "Restored %d currencies and %d accounts from %s",
+                len(self._currencies),
+                len(self._accounts),
+                self.path,
+            )
+        self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        await self.snapshot()
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.snapshot()
+            except Exception as err:
+                self.logger.error("Failed to snapshot the storage : %s", err)
+
+    async def snapshot(self) -> None:
+        """Writes the state to disk if it changed, replacing the previous snapshot atomically."""
+        if not self._dirty:
+            return
+
+        # Copied on the loop so the snapshot is consistent, serialized off it
+        state = self._dump()
+        self._dirty = False
+        try:
+            await asyncio.to_thread(self._write, state)
+        except BaseException:
+            self._dirty = True
+            raise
+
+    def _write(self, state: Dict[str, Any]) -> None:
+        temporary = f"{self.path}.tmp"
+        with open(temporary, "w") as file:
+            json.dump(state, file, separators=(",", ":"))
+        os.replace(temporary, self.path)
+
+    def _dump(self) -> Dict[str, Any]:
+        return {
+            "currencies": [
+                {
+                    **c,
+                    "created_at": c["created_at"].isoformat(),
+                    "deleted_at": c["deleted_at"] and c["deleted_at"].isoformat(),
+                }
+                for c in self._currencies.values()
+            ],
+            "configs": [[id, c.copy()] for id, c in self._configs.items()],
+            "accounts": [
+                [a["userid"], a["currencyid"], a["wallet"], a["bank"]]
+                for a in self._accounts.values()
+            ],
+            "transactions": [
+                {**t, "timestamp": t["timestamp"].isoformat()}
+                for t in self._transactions
+            ],
+        }
+
+    def _restore(self, state: Dict[str, Any]) -> None:
+        for currency in state["currencies"]:
+            currency["created_at"] = datetime.datetime.fromisoformat(
+                currency["created_at"]
+            )
+            if deleted_at := currency.get("deleted_at"):
+                currency["deleted_at"] = datetime.datetime.fromisoformat(deleted_at)
+            else:
+                currency["deleted_at"] = None
+                self._owned[currency["owner"]].add(currency["id"])
+            self._currencies[currency["id"]] = currency
+            self._next_currency = max(self._next_currency, currency["id"] + 1)
+
+        for guildid, currencies in state["configs"]:
+            self._configs[guildid] = currencies
+            for id in currencies:
+                self._guilds[id].add(guildid)
+
+        for userid, currencyid, wallet, bank in state["accounts"]:
+            self._create_account(userid, currencyid, wallet, bank)
+
+        for transaction in state["transactions"]:
+            transaction["timestamp"] = datetime.datetime.fromisoformat(
+                transaction["timestamp"]
+            )
+            self._transactions.append(transaction)
+
+    # Currencies
+
+    def _visible(self, id: int) -> bool:
+        currency = self._currencies.get(id)
+        return currency is not None and currency["deleted_at"] is None
+
+    async def fetch_currencies(self, ids: Sequence[int]) -> List[Dict[str, Any]]:
+        return [self._currencies[id].copy() for id in ids if self._visible(id)]
+
+    async def fetch_user_currencies(self, owner: int) -> List[Dict[str, Any]]:
+        return [
+            self._currencies[id].copy() for id in sorted(self._owned.get(owner, ()))
+        ]
+
+    async def latest_currencies(self, limit: int) -> List[Dict[str, Any]]:
+        ids = heapq.nlargest(limit, filter(self._visible, self._currencies))
+        return [self._currencies[id].copy() for id in ids]
+
+    async def list_currencies(self) -> List[Dict[str, Any]]:
+        return [c.copy() for c in self._currencies.values() if c["deleted_at"] is None]
+
+    async def create_currency(self, name: str, icon: str, owner: int) -> Dict[str, Any]:
+        id, self._next_currency = self._next_currency, self._next_currency + 1
+        self._currencies[id] = {
+            "id": id,
+            "name": name,
+            "owner": owner,
+            "icon": icon,
+            "created_at": datetime.datetime.now(datetime.timezone.utc),
+            "hidden": False,
+            "allowed_roles": None,
+            "deleted_at": None,
+        }
+        self._owned[owner].add(id)
+        self._dirty = True
+        return self._currencies[id].copy()
+
+    async def tombstone_currency(self, id: int) -> None:
+        if not self._visible(id):
+            return
+
+        currency = self._currencies[id]
+        currency["deleted_at"] = datetime.datetime.now(datetime.timezone.utc)
+        self._owned[currency["owner"]].discard(id)
+        for guildid in self._guilds.pop(id, ()):
+            self._configs[guildid] = [c for c in self._configs[guildid] if c != id]
+        self._dirty = True
+
+    async def tombstoned_currencies(self) -> List[int]:
+        return [id for id, c in self._currencies.items() if c["deleted_at"] is not None]
+
+    async def purge_currency(self, id: int, limit: int) -> Tuple[str, int]:
+        if holders := self._holders.get(id):
+            deleted = min(limit, len(holders))
+            for _ in range(deleted):
+                account = self._accounts.pop((holders.pop(), id))
+                self._supply[id] -= account["wallet"] + account["bank"]
+            self._dirty = True
+            return "accounts", deleted
+
+        kept = [t for t in self._transactions if t["currencyid"] != id]
+        if deleted := len(self._transactions) - len(kept):
+            # Filtered in one pass, the deque is bounded anyway
+            self._transactions = collections.deque(
+                kept, maxlen=self._transactions.maxlen
+            )
+            self._dirty = True
+            return "transactions", deleted
+
+        self._currencies.pop(id, None)
+        self._holders.pop(id, None)
+        self._supply.pop(id, None)
+        self._dirty = True
+        return "done", 0
+
+    async def currency_stats(
+        self, id: int
+    ) -> Optional[Tuple[int, int, Optional[datetime.datetime]]]:
+        if id not in self._currencies:
+            return None
+        return len(self._holders.get(id, ())), self._supply.get(id, 0), None
+
+    # Guild configs
+
+    async def fetch_config(self, guildid: int) -> List[int]:
+        return self._configs.get(guildid, []).copy()
+
+    async def add_guild_currency(self, guildid: int, currencyid: int) -> List[int]:
+        currencies = self._configs.setdefault(guildid, [])
+        if currencyid not in currencies:
+            currencies.append(currencyid)
+            self._guilds[currencyid].add(guildid)
+            self._dirty = True
+        return currencies.copy()
+
+    async def remove_guild_currency(self, guildid: int, currencyid: int) -> List[int]:
+        currencies = self._configs.setdefault(guildid, [])
+        self._configs[guildid] = [c for c in currencies if c != currencyid]
+        self._guilds[currencyid].discard(guildid)
+        self._dirty = True
+        return self._configs[guildid].copy()
+
+    # Accounts
+
+    def _create_account(
+        self, userid: int, currencyid: int, wallet: int = 0, bank: int = 0
+    ) -> Dict[str, int]:
+        account = self._accounts[(userid, currencyid)] = {
+            "userid": userid,
+            "currencyid": currencyid,
+            "wallet": wallet,
+            "bank": bank,
+        }
+        self._holders[currencyid].add(userid)
+        self._supply[currencyid] += wallet + bank
+        self._dirty = True
+        return account
+
+    async def fetch_accounts(
+        self, keys: Sequence[AccountKey]
+    ) -> Dict[AccountKey, Dict[str, int]]:
+        found = {}
+        for key in keys:
+            account = self._accounts.get(key)
+            if account is None:
+                # Accounts are only opened under currencies that still exist
+                if not self._visible(key[1]):
+                    continue
+                account = self._create_account(*key)
+            found[key] = account.copy()
+        return found
+
+    def _add(self, userid: int, currencyid: int, wallet: int, bank: int) -> None:
+        account = self._accounts.get((userid, currencyid))
+        if account is None:
+            return
+        account["wallet"] += wallet
+        account["bank"] += bank
+        self._supply[currencyid] += wallet + bank
+        self._dirty = True
+
+    async def add_money(
+        self, userid: int, currencyid: int, amount: int, to_wallet: bool
+    ) -> Optional[Dict[str, int]]:
+        if to_wallet:
+            self._add(userid, currencyid, amount, 0)
+        else:
+            self._add(userid, currencyid, 0, amount)
+        account = self._accounts.get((userid, currencyid))
+        return account.copy() if account else None
+
+    async def apply_deltas(self, deltas: Sequence[Tuple[int, int, int, int]]) -> None:
+        for userid, currencyid, wallet, bank in deltas:
+            self._add(userid, currencyid, wallet, bank)
+
+    async def spend(
+        self, userid: int, currencyid: int, amount: int
+    ) -> Tuple[bool, Optional[int]]:
+        account = self._accounts.get((userid, currencyid))
+        if account is None:
+            return False, None
+        if account["wallet"] < amount:
+            return False, account["wallet"]
+        self._add(userid, currencyid, -amount, 0)
+        return True, account["wallet"]
+
+    async def transfer(
+        self, userid: int, targetid: int, currencyid: int, amount: int
+    ) -> Tuple[bool, Optional[int], Optional[int]]:
+        account = self._accounts.get((userid, currencyid))
+        target = self._accounts.get((targetid, currencyid))
+        if account is None or target is None or account["wallet"] < amount:
+            return (
+                False,
+                account and account["wallet"],
+                target and target["wallet"],
+            )
+        self._add(userid, currencyid, -amount, 0)
+        self._add(targetid, currencyid, amount, 0)
+        return True, account["wallet"], target["wallet"]
+
+    async def move(
+        self, userid: int, currencyid: int, amount: int, to_wallet: bool
+    ) -> Tuple[bool, Optional[Dict[str, int]]]:
+        account = self._accounts.get((userid, currencyid))
+        if account is None:
+            return False, None
+        if account["bank" if to_wallet else "wallet"] < amount:
+            return False, account.copy()
+        if to_wallet:
+            self._add(userid, currencyid, amount, -amount)
+        else:
+            self._add(userid, currencyid, -amount, amount)
+        return True, account.copy()
+
+    async def top_accounts(
+        self,
+        currencyid: int,
+        limit: int,
+        offset: int = 0,
+        after: Optional[Tuple[int, int]] = None,
+    ) -> List[Tuple[int, int]]:
+        keys = (
+            (-self._accounts[(userid, currencyid)]["wallet"], userid)
+            for userid in self._holders.get(currencyid, ())
+        )
+        if after is not None:
+            # Same order as the database, richest first then lowest id
+            bound = (-after[0], after[1])
+            keys = (key for key in keys if key > bound)
+        top = heapq.nsmallest(offset + limit, keys)
+        return [(userid, -wallet) for wallet, userid in top[offset:]]
+
+    async def balance_snapshots(
+        self,
+        userid: int,
+        currencyid: int,
+        start: datetime.date,
+        end: datetime.date,
+    ) -> List[Dict[str, Any]]:
+        return []
+
+    # Ledger
+
+    async def insert_transactions(
+        self, columns: Sequence[str], rows: Sequence[Sequence[Any]]
+    ) -> None:
+        self._transactions.extend(dict(zip(columns, row)) for row in rows)
+        self._dirty = True
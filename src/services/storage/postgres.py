@@ -0,0 +1,409 @@
+import datetime
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    AsyncContextManager,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+from asyncpg import Record
+from asyncpg.pool import PoolConnectionProxy
+
+from services.storage.base import AccountKey, Storage
+from services.storage.statements import Connection, Statements
+from services.unitofwork import UnitOfWork
+
+if TYPE_CHECKING:
+    from main import DebtBot
+
+
+def _move(source: str, destination: str) -> str:
+    return f"""WITH moved AS (
+        UPDATE banks SET {source} = {source} - $1, {destination} = {destination} + $1
+        WHERE userid = $2 AND currencyid = $3 AND {source} >= $1
+        RETURNING *
+    )
+    SELECT *, TRUE AS moved FROM moved UNION ALL
+    SELECT *, FALSE AS moved FROM banks WHERE userid = $2 AND currencyid = $3
+    AND NOT EXISTS (SELECT 1 FROM moved);"""
+
+
+# Ran by nearly every command, prepared on every connection of the pool
+STATEMENTS = {
+    "currencies": "SELECT * FROM currencies WHERE id = any($1::integer[]) AND deleted_at IS NULL;",
+    "user_currencies": "SELECT * FROM currencies WHERE owner = $1 AND deleted_at IS NULL;",
+    "currency_stats": "SELECT accounts, supply, reconciled_at FROM currency_stats WHERE currencyid = $1;",
+    "config": "SELECT currencyid FROM guild_currencies WHERE guildid = $1 ORDER BY position;",
+    # The outer select does not see the insert, its row comes from RETURNING.
+    # The position comes from a sequence so concurrent adds can not share one
+    "add_guild_currency": """WITH added AS (
+        INSERT INTO guild_currencies (guildid, currencyid) VALUES ($1, $2)
+        ON CONFLICT DO NOTHING
+        RETURNING currencyid, position
+    )
+    SELECT currencyid, position FROM added UNION ALL
+    SELECT currencyid, position FROM guild_currencies WHERE guildid = $1
+    ORDER BY position;""",
+    "remove_guild_currency": """WITH removed AS (
+        DELETE FROM guild_currencies WHERE guildid = $1 AND currencyid = $2
+    )
+    SELECT currencyid FROM guild_currencies WHERE guildid = $1 AND currencyid <> $2
+    ORDER BY position;""",
+    "accounts": """WITH created AS (
+        INSERT INTO banks (userid, currencyid)
+        SELECT * FROM unnest($1::bigint[], $2::integer[])
+        ON CONFLICT DO NOTHING
+        RETURNING *
+    )
+    SELECT * FROM created UNION ALL
+    SELECT banks.* FROM banks
+    JOIN unnest($1::bigint[], $2::integer[]) AS k(userid, currencyid)
+    USING (userid, currencyid);""",
+    "accounts_existing": """SELECT banks.* FROM banks
+    JOIN unnest($1::bigint[], $2::integer[]) AS k(userid, currencyid)
+    USING (userid, currencyid);""",
+    "add_to_wallet": "UPDATE banks SET wallet = wallet + $1 WHERE currencyid = $2 AND userid = $3 RETURNING *;",
+    "add_to_bank": "UPDATE banks SET bank = bank + $1 WHERE currencyid = $2 AND userid = $3 RETURNING *;",
+    "spend": """WITH debit AS (
+        UPDATE banks SET wallet = wallet - $1
+        WHERE userid = $2 AND currencyid = $3 AND wallet >= $1
+        RETURNING *
+    )
+    SELECT EXISTS (SELECT 1 FROM debit) AS debited, COALESCE(
+        (SELECT wallet FROM debit),
+        (SELECT wallet FROM banks WHERE userid = $2 AND currencyid = $3)
+    ) AS wallet;""",
+    # Debit and credit in one statement, the credit only happens if the debit did.
+    # Both rows are locked lowest userid first, so opposite transfers can not deadlock,
+    # and nothing is debited unless both exist
+    "transfer": """WITH locked AS (
+        SELECT userid, wallet FROM banks
+        WHERE currencyid = $3 AND userid IN ($2, $4)
+        ORDER BY userid FOR UPDATE
+    ), debit AS (
+        UPDATE banks SET wallet = wallet - $1
+        WHERE userid = $2 AND currencyid = $3 AND wallet >= $1
+        AND (SELECT count(*) FROM locked) = 2
+        RETURNING *
+    ), credit AS (
+        UPDATE banks SET wallet = banks.wallet + $1 FROM debit
+        WHERE banks.userid = $4 AND banks.currencyid = debit.currencyid
+        RETURNING banks.*
+    )
+    SELECT EXISTS (SELECT 1 FROM debit) AS debited, COALESCE(
+        (SELECT wallet FROM debit),
+        (SELECT wallet FROM locked WHERE userid = $2)
+    ) AS wallet, COALESCE(
+        (SELECT wallet FROM credit),
+        (SELECT wallet FROM locked WHERE userid = $4)
+    ) AS target_wallet;""",
+    # Moving between the wallet and the bank is a single row update
+    "move_to_wallet": _move("bank", "wallet"),
+    "move_to_bank": _move("wallet", "bank"),
+}
+
+
+class PostgresStorage(Storage):
+    """
+    Keeps everything in Postgres, through the bot's pool.
+
+    Attributes
+    ----------
+    statements : Statements
+        The hot statements, prepared on every connection of the pool.
+    """
+
+    sql = True
+
+    def __init__(self, bot: "DebtBot") -> None:
+        self._bot = bot
+        self.statements = Statements(STATEMENTS)
+
+    def _acquire(self) -> AsyncContextManager[PoolConnectionProxy]:
+        """Returns the connection of the running command, or one from the pool."""
+        return UnitOfWork.acquire(self._bot.pool)
+
+    async def init_connection(self, con: Connection) -> None:
+        """Prepares the statements on a new connection of the pool."""
+        await self.statements.prepare(con)
+
+    # Currencies
+
+    async def fetch_currencies(self, ids: Sequence[int]) -> List[Record]:
+        async with self._acquire() as con:
+            return await self.statements.fetch(con, "currencies", ids)
+
+    async def fetch_user_currencies(self, owner: int) -> List[Record]:
+        async with self._acquire() as con:
+            return await self.statements.fetch(con, "user_currencies", owner)
+
+    async def latest_currencies(self, limit: int) -> List[Record]:
+        async with self._acquire() as con:
+            return await con.fetch(
+                "SELECT * FROM currencies WHERE deleted_at IS NULL ORDER BY id DESC LIMIT $1;",
+                limit,
+            )
+
+    async def list_currencies(self) -> List[Record]:
+        async with self._acquire() as con:
+            return await con.fetch(
+                "SELECT id, name, icon FROM currencies WHERE deleted_at IS NULL;"
+            )
+
+    async def create_currency(self, name: str, icon: str, owner: int) -> Record:
+        async with self._acquire() as con:
+            return await con.fetchrow(
+                "INSERT INTO currencies (name, icon, owner) VALUES ($1, $2, $3) RETURNING *;",
+                name,
+                icon,
+                owner,
+            )
+
+    async def tombstone_currency(self, id: int) -> None:
+        async with self._acquire() as con, con.transaction():
+            await con.execute(
+                "UPDATE currencies SET deleted_at = NOW() WHERE id = $1 AND deleted_at IS NULL;",
+                id,
+            )
+            await con.execute("DELETE FROM guild_currencies WHERE currencyid = $1;", id)
+
+    async def tombstoned_currencies(self) -> List[int]:
+        async with self._acquire() as con:
+            records = await con.fetch(
+                "SELECT id FROM currencies WHERE deleted_at IS NOT NULL;"
+            )
+        return [r["id"] for r in records]
+
+    async def purge_currency(self, id: int, limit: int) -> Tuple[str, int]:
+        # One short statement per batch, locks are held for a batch at most
+        async with self._acquire() as con:
+            status = await con.execute(
+                """DELETE FROM banks WHERE currencyid = $1 AND userid IN (
+                    SELECT userid FROM banks WHERE currencyid = $1 LIMIT $2
+                );""",
+                id,
+                limit,
+            )
+            if deleted := int(status.split()[-1]):
+                return "accounts", deleted
+
+            status = await con.execute(
+                """DELETE FROM transactions WHERE id IN (
+                    SELECT id FROM transactions WHERE currencyid = $1 LIMIT $2
+                );""",
+                id,
+                limit,
+            )
+            if deleted := int(status.split()[-1]):
+                return "transactions", deleted
+
+            status = await con.execute(
+                """DELETE FROM balance_snapshots WHERE (userid, currencyid, day) IN (
+                    SELECT userid, currencyid, day FROM balance_snapshots
+                    WHERE currencyid = $1 LIMIT $2
+                );""",
+                id,
+                limit,
+            )
+            if deleted := int(status.split()[-1]):
+                return "snapshots", deleted
+
+            async with con.transaction():
+                # Entries another process flushed since the transactions were deleted
+                await con.execute("DELETE FROM transactions WHERE currencyid = $1;", id)
+                await con.execute(
+                    "DELETE FROM currency_stats WHERE currencyid = $1;", id
+                )
+                await con.execute(
+                    "DELETE FROM currencies WHERE id = $1 AND deleted_at IS NOT NULL;",
+                    id,
+                )
+        return "done", 0
+
+    async def currency_stats(
+        self, id: int
+    ) -> Optional[Tuple[int, int, Optional[datetime.datetime]]]:
+        async with self._acquire() as con:
+            record = await self.statements.fetchrow(con, "currency_stats", id)
+        if record is None:
+            return None
+        return record["accounts"], record["supply"], record["reconciled_at"]
+
+    # Guild configs
+
+    async def fetch_config(self, guildid: int) -> List[int]:
+        async with self._acquire() as con:
+            records = await self.statements.fetch(con, "config", guildid)
+        return [r["currencyid"] for r in records]
+
+    async def add_guild_currency(self, guildid: int, currencyid: int) -> List[int]:
+        async with self._acquire() as con:
+            records = await self.statements.fetch(
+                con, "add_guild_currency", guildid, currencyid
+            )
+        return [r["currencyid"] for r in records]
+
+    async def remove_guild_currency(self, guildid: int, currencyid: int) -> List[int]:
+        async with self._acquire() as con:
+            records = await self.statements.fetch(
+                con, "remove_guild_currency", guildid, currencyid
+            )
+        return [r["currencyid"] for r in records]
+
+    # Accounts
+
+    async def fetch_accounts(
+        self, keys: Sequence[AccountKey]
+    ) -> Dict[AccountKey, Record]:
+        userids = [userid for userid, _ in keys]
+        currencyids = [currencyid for _, currencyid in keys]
+
+        async with self._acquire() as con:
+            records = await self.statements.fetch(con, "accounts", userids, currencyids)
+            found = {(r["userid"], r["currencyid"]): r for r in records}
+
+            # Accounts created concurrently are invisible to the statement above
+            if missing := [key for key in keys if key not in found]:
+                for r in await self.statements.fetch(
+                    con,
+                    "accounts_existing",
+                    [userid for userid, _ in missing],
+                    [currencyid for _, currencyid in missing],
+                ):
+                    found[(r["userid"], r["currencyid"])] = r
+
+        return found
+
+    async def add_money(
+        self, userid: int, currencyid: int, amount: int, to_wallet: bool
+    ) -> Optional[Record]:
+        async with self._acquire() as con:
+            return await self.statements.fetchrow(
+                con,
+                "add_to_wallet" if to_wallet else "add_to_bank",
+                amount,
+                currencyid,
+                userid,
+            )
+
+    async def apply_deltas(self, deltas: Sequence[Tuple[int, int, int, int]]) -> None:
+        userids, currencyids, wallets, banks = (list(c) for c in zip(*deltas))
+        async with self._acquire() as con:
+            # Locked in the same order as transfers, so concurrent flushes can not deadlock
+            await con.execute(
+                """WITH locked AS (
+                    SELECT 1 FROM banks
+                    JOIN unnest($1::bigint[], $2::integer[]) AS k(userid, currencyid)
+                    USING (userid, currencyid)
+                    ORDER BY banks.currencyid, banks.userid FOR UPDATE OF banks
+                )
+                UPDATE banks SET wallet = banks.wallet + d.wallet, bank = banks.bank + d.bank
+                FROM unnest($1::bigint[], $2::integer[], $3::integer[], $4::integer[])
+                AS d(userid, currencyid, wallet, bank)
+                WHERE banks.userid = d.userid AND banks.currencyid = d.currencyid
+                AND (SELECT count(*) FROM locked) > 0;""",
+                userids,
+                currencyids,
+                wallets,
+                banks,
+            )
+
+    async def spend(
+        self, userid: int, currencyid: int, amount: int
+    ) -> Tuple[bool, Optional[int]]:
+        async with self._acquire() as con:
+            record = await self.statements.fetchrow(
+                con, "spend", amount, userid, currencyid
+            )
+        return record["debited"], record["wallet"]
+
+    async def transfer(
+        self, userid: int, targetid: int, currencyid: int, amount: int
+    ) -> Tuple[bool, Optional[int], Optional[int]]:
+        async with self._acquire() as con:
+            record = await self.statements.fetchrow(
+                con, "transfer", amount, userid, currencyid, targetid
+            )
+        return record["debited"], record["wallet"], record["target_wallet"]
+
+    async def move(
+        self, userid: int, currencyid: int, amount: int, to_wallet: bool
+    ) -> Tuple[bool, Optional[Record]]:
+        async with self._acquire() as con:
+            record = await self.statements.fetchrow(
+                con,
+                "move_to_wallet" if to_wallet else "move_to_bank",
+                amount,
+                userid,
+                currencyid,
+            )
+        if record is None:
+            return False, None
+        return record["moved"], record
+
+    async def top_accounts(
+        self,
+        currencyid: int,
+        limit: int,
+        offset: int = 0,
+        after: Optional[Tuple[int, int]] = None,
+    ) -> List[Tuple[int, int]]:
+        async with self._acquire() as con:
+            if after is None:
+                rows = await con.fetch(
+                    """SELECT userid, wallet FROM banks WHERE currencyid = $1
+                    ORDER BY wallet DESC, userid OFFSET $2 LIMIT $3;""",
+                    currencyid,
+                    offset,
+                    limit,
+                )
+            else:
+                rows = await con.fetch(
+                    """SELECT userid, wallet FROM banks
+                    WHERE currencyid = $1 AND (wallet < $2 OR (wallet = $2 AND userid > $3))
+                    ORDER BY wallet DESC, userid OFFSET $4 LIMIT $5;""",
+                    currencyid,
+                    after[0],
+                    after[1],
+                    offset,
+                    limit,
+                )
+        return [(r["userid"], r["wallet"]) for r in rows]
+
+    async def balance_snapshots(
+        self,
+        userid: int,
+        currencyid: int,
+        start: datetime.date,
+        end: datetime.date,
+    ) -> List[Record]:
+        async with self._acquire() as con:
+            # The last snapshot before the range carries over to its first days
+            return await con.fetch(
+                """(SELECT day, wallet, bank FROM balance_snapshots
+                    WHERE userid = $1 AND currencyid = $2 AND day < $3
+                    ORDER BY day DESC LIMIT 1)
+                UNION ALL
+                (SELECT day, wallet, bank FROM balance_snapshots
+                    WHERE userid = $1 AND currencyid = $2 AND day BETWEEN $3 AND $4
+                    ORDER BY day);""",
+                userid,
+                currencyid,
+                start,
+                end,
+            )
+
+    # Ledger
+
+    async def insert_transactions(
+        self, columns: Sequence[str], rows: Sequence[Sequence[Any]]
+    ) -> None:
+        # Flushed in the background, apart from the commands that recorded them
+        async with self._bot.pool.acquire() as con:
+            await con.copy_records_to_table(
+                "transactions", records=rows, columns=columns
+            )
@@ -0,0 +1,60 @@
+from collections import Counter
+from typing import Any, Mapping
+
+import asyncpg
+
+
+class Connection(asyncpg.Connection):
+    """A pool connection, able to fill its statement cache ahead of time."""
+
+    async def prepare_cached(self, query: str) -> None:
+        """
+        Prepares a statement into the statement cache, where `fetch` and the
+        like look before preparing.
+
+        Statements from `prepare` can not be used once the connection went
+        back to the pool, cached ones live as long as the connection if the
+        pool is created with `max_cached_statement_lifetime=0`.
+
+        Relies on asyncpg's private `Connection._get_statement`, the same call
+        `fetch` makes, there is no public way to fill the cache.
+        """
+        await self._get_statement(query, None, use_cache=True)
+
+
+class Statements:
+    """
+    The registry of hot statements, prepared once per connection when it opens.
+
+    Executions go through the connection's statement cache, so they skip
+    parsing and planning while still reaching the query loggers. The cache
+    is shared with ad-hoc statements, the pool sizes it for both.
+
+    Attributes
+    ----------
+    sql : Mapping[str, str]
+        The statements, by name.
+    calls : Counter[str]
+        The amount of executions of each statement.
+    """
+
+    def __init__(self, sql: Mapping[str, str]) -> None:
+        self.sql = sql
+        self.calls: Counter[str] = Counter()
+
+    async def prepare(self, con: Connection) -> None:
+        """Prepares every statement on a new connection, used in the `init` of the pool."""
+        for sql in self.sql.values():
+            await con.prepare_cached(sql)
+
+    async def fetch(self, con: Connection, name: str, *args: Any) -> list:
+        self.calls[name] += 1
+        return await con.fetch(self.sql[name], *args)
+
+    async def fetchrow(self, con: Connection, name: str, *args: Any) -> Any:
+        self.calls[name] += 1
+        return await con.fetchrow(self.sql[name], *args)
+
+    async def fetchval(self, con: Connection, name: str, *args: Any) -> Any:
+        self.calls[name] += 1
+        return await con.fetchval(self.sql[name], *args)
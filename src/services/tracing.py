@@ -0,0 +1,137 @@
+import asyncio
+import contextvars
+import logging
+from collections import Counter
+from typing import Dict, Optional
+
+from asyncpg.connection import LoggedQuery
+from discord.ext import commands
+
+from services.metrics import fingerprint
+
+
+class QueryTrace:
+    """
+    The statements issued by a single command invocation.
+
+    Attributes
+    ----------
+    command : str
+        The qualified name of the command.
+    count : int
+        The amount of statements.
+    elapsed : float
+        The time spent in those statements, in seconds.
+    fingerprints : Counter[str]
+        How many times each statement ran.
+    finished : bool
+        Whether it was reported already.
+    """
+
+    __slots__ = ("command", "count", "elapsed", "fingerprints", "finished")
+
+    def __init__(self, command: str) -> None:
+        self.command = command
+        self.count = 0
+        self.elapsed = 0.0
+        self.fingerprints: Counter[str] = Counter()
+        self.finished = False
+
+
+class CommandQueries:
+    """The statements issued by a command, over all of its invocations."""
+
+    __slots__ = ("invocations", "queries", "elapsed", "most", "over_budget")
+
+    def __init__(self) -> None:
+        self.invocations = 0
+        self.queries = 0
+        self.elapsed = 0.0
+        self.most = 0
+        self.over_budget = 0
+
+
+_current: contextvars.ContextVar[Optional[QueryTrace]] = contextvars.ContextVar(
+    "query_trace", default=None
+)
+
+
+class QueryTracer:
+    """
+    Attributes every statement to the command invocation that issued it.
+
+    A trace is set in a context variable when the invocation's context is
+    created, before the checks and converters run, so it follows the command
+    into the tasks it spawns, and the query logger
+    of every pool connection adds to it. Invocations issuing more than
+    `budget` statements, or the same statement more than `repeat_limit`
+    times (usually a query in a loop), are logged.
+
+    Attributes
+    ----------
+    budget : int
+        The amount of statements a command may issue.
+    repeat_limit : int
+        The amount of times a command may issue the same statement.
+    commands : Dict[str, CommandQueries]
+        The statements issued by each command.
+    """
+
+    def __init__(self, budget: int = 10, repeat_limit: int = 3) -> None:
+        self.budget = budget
+        self.repeat_limit = repeat_limit
+        self.commands: Dict[str, CommandQueries] = {}
+        self.logger = logging.getLogger("discord.tracing")
+
+    def on_query(self, record: LoggedQuery) -> None:
+        trace = _current.get()
+        if trace is None:
+            return
+
+        trace.count += 1
+        trace.elapsed += record.elapsed
+        trace.fingerprints[fingerprint(record.query)] += 1
+
+    def start(self, ctx: commands.Context) -> None:
+        """Starts tracing the invocation, called when its context is created."""
+        assert ctx.command
+        _current.set(QueryTrace(ctx.command.qualified_name))
+
+    async def finish(self, _: commands.Context) -> None:
+        """Reports on the invocation, called after it and when it fails, only the first call does anything."""
+        # Query loggers are called soon after their statement, let the last ones run
+        await asyncio.sleep(0)
+        trace = _current.get()
+        # The error handler runs in its own task, with a copy of the variable
+        if trace is None or trace.finished:
+            return
+        trace.finished = True
+        _current.set(None)
+
+        stats = self.commands.get(trace.command)
+        if stats is None:
+            stats = self.commands[trace.command] = CommandQueries()
+        stats.invocations += 1
+        stats.queries += trace.count
+        stats.elapsed += trace.elapsed
+        stats.most = max(stats.most, trace.count)
+
+        if trace.count > self.budget:
+            stats.over_budget += 1
+            self.logger.warning(
+                "%s issued %d statements (budget %d) taking %.1fms",
+                trace.command,
+                trace.count,
+                self.budget,
+                trace.elapsed * 1000,
+            )
+
+        for statement, count in trace.fingerprints.most_common():
+            if count <= self.repeat_limit:
+                break
+            self.logger.warning(
+                "%s ran the same statement %d times, possible N+1 : %s",
+                trace.command,
+                count,
+                statement,
+            )
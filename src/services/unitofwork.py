@@ -0,0 +1,243 @@
+import asyncio
+import contextlib
+import logging
+from contextvars import ContextVar
+from typing import (
+    TYPE_CHECKING,
+    AsyncContextManager,
+    AsyncIterator,
+    Callable,
+    Hashable,
+    List,
+    Optional,
+)
+
+from asyncpg.pool import PoolConnectionProxy
+from asyncpg.transaction import Transaction
+from discord.ext import commands
+
+if TYPE_CHECKING:
+    from main import DebtBot
+    from services.metrics import InstrumentedPool
+
+_current: ContextVar[Optional["UnitOfWork"]] = ContextVar("unit_of_work", default=None)
+
+
+class UnitOfWork:
+    """
+    The database work of one command invocation.
+
+    Takes a single pool connection the first time a statement needs one and
+    shares it between the statements of the invocation, instead of one
+    acquisition per statement. It goes back to the pool once no statement
+    used it for `idle_timeout` seconds, so replies to discord do not hold it.
+    Commands marked `transactional` run every statement in one transaction,
+    committed when they succeed and rolled back otherwise, and keep the
+    connection until then. They call `UnitOfWork.commit` before replying.
+
+    Bound to the context as `ctx.unit_of_work` and to the invocation's task,
+    so the storage reaches it without being handed the context.
+
+    Attributes
+    ----------
+    transactional : bool
+        Whether the statements run in one transaction.
+    closed : bool
+        Whether the invocation ended, statements go through the pool afterwards.
+    error : Optional[Exception]
+        Why the transaction could not be committed, if it could not.
+    idle_timeout : float
+        The amount of seconds an unused connection is kept outside of transactions.
+    """
+
+    idle_timeout = 0.05
+
+    def __init__(self, pool: "InstrumentedPool") -> None:
+        self._pool = pool
+        self._con: Optional[PoolConnectionProxy] = None
+        self._transaction: Optional[Transaction] = None
+        # Statements of one invocation can run concurrently, a connection can not
+        self._lock = asyncio.Lock()
+        self._idle: Optional[asyncio.TimerHandle] = None
+        self._releasing: Optional[asyncio.Task] = None
+        self._after_commit: List[Callable[[], None]] = []
+        self._after_rollback: List[Callable[[], None]] = []
+        self.transactional = False
+        self.closed = False
+        self.error: Optional[Exception] = None
+        self.logger = logging.getLogger("discord.unitofwork")
+
+    @classmethod
+    def begin(cls, ctx: commands.Context["DebtBot"]) -> "UnitOfWork":
+        """Starts the unit of work of an invocation, called when its context is created."""
+        unit = cls(ctx.bot.pool)
+        ctx.unit_of_work = unit  # type: ignore
+        _current.set(unit)
+        return unit
+
+    @staticmethod
+    def current() -> Optional["UnitOfWork"]:
+        """Returns the unit of work of the running invocation, if any."""
+        unit = _current.get()
+        return None if unit is None or unit.closed else unit
+
+    @staticmethod
+    def scope() -> Optional[Hashable]:
+        """Returns what batched loads must not be shared across, the running transaction if any."""
+        unit = UnitOfWork.current()
+        return id(unit) if unit and unit.transactional else None
+
+    @staticmethod
+    def in_transaction() -> bool:
+        """Returns whether the running invocation runs its statements in a transaction."""
+        unit = UnitOfWork.current()
+        return unit is not None and unit.transactional
+
+    @staticmethod
+    def acquire(pool: "InstrumentedPool") -> AsyncContextManager[PoolConnectionProxy]:
+        """
+        Returns the connection of the running invocation, or one from the pool outside of them.
+
+        Parameters
+        ----------
+        pool : InstrumentedPool
+            Where to acquire a connection outside of invocations.
+        """
+        unit = UnitOfWork.current()
+        if unit is None:
+            return pool.acquire()
+        return unit._use()
+
+    @staticmethod
+    def after_commit(callback: Callable[[], None]) -> None:
+        """Runs a callback once the running transaction commits, right away without one."""
+        unit = UnitOfWork.current()
+        if unit is None or not unit.transactional:
+            callback()
+        else:
+            unit._after_commit.append(callback)
+
+    @staticmethod
+    def after_rollback(callback: Callable[[], None]) -> None:
+        """Runs a callback if the running transaction rolls back, never without one."""
+        unit = UnitOfWork.current()
+        if unit is not None and unit.transactional:
+            unit._after_rollback.append(callback)
+
+    @staticmethod
+    async def commit() -> None:
+        """
+        Ends the running invocation's unit of work early, committing it.
+
+        Called before replying, so the locks are not held during the round
+        trip to discord and the user only hears about committed changes.
+        Statements that come after it go through the pool.
+
+        Raises
+        ------
+        Exception
+            Why the commit failed, the transaction is rolled back.
+        """
+        unit = UnitOfWork.current()
+        if unit is None:
+            return
+        await unit.finish(failed=False)
+        if unit.error is not None:
+            raise unit.error
+
+    @contextlib.asynccontextmanager
+    async def _use(self) -> AsyncIterator[PoolConnectionProxy]:
+        async with self._lock:
+            # Waited for the lock while the invocation ended
+            if self.closed:
+                async with self._pool.acquire() as con:
+                    yield con
+                return
+
+            if self._idle is not None:
+                self._idle.cancel()
+                self._idle = None
+            if self._con is None:
+                self._con = await self._pool.acquire()
+                if self.transactional:
+                    self._transaction = self._con.transaction()
+                    await self._transaction.start()
+            try:
+                yield self._con
+            finally:
+                if self._transaction is None:
+                    self._idle = asyncio.get_running_loop().call_later(
+                        self.idle_timeout, self._on_idle
+                    )
+
+    def _on_idle(self) -> None:
+        self._idle = None
+        self._releasing = asyncio.create_task(self._release_idle())
+
+    async def _release_idle(self) -> None:
+        async with self._lock:
+            # Used again or ended while waiting for the lock
+            if self._idle is not None or self._con is None or self._transaction:
+                return
+            con, self._con = self._con, None
+            await self._pool.release(con)
+
+    async def finish(self, failed: bool) -> None:
+        """
+        Ends the invocation, committing or rolling back then giving the connection back.
+
+        Called after the command and when it fails, only the first call does anything.
+
+        Parameters
+        ----------
+        failed : bool
+            Whether the command failed, its transaction is rolled back.
+        """
+        if self.closed:
+            return
+        self.closed = True
+        if self._idle is not None:
+            self._idle.cancel()
+            self._idle = None
+
+        async with self._lock:
+            con, self._con = self._con, None
+            if con is None:
+                self._run_after_commit(failed)
+                return
+
+            try:
+                if self._transaction:
+                    if failed:
+                        await self._transaction.rollback()
+                    else:
+                        await self._transaction.commit()
+            except Exception as err:
+                failed = True
+                self.error = err
+                self.logger.error("Failed to end a transaction : %s", err)
+            finally:
+                await self._pool.release(con)
+
+        self._run_after_commit(failed)
+
+    def _run_after_commit(self, failed: bool) -> None:
+        committed, self._after_commit = self._after_commit, []
+        rolled_back, self._after_rollback = self._after_rollback, []
+        for callback in rolled_back if failed else committed:
+            try:
+                callback()
+            except Exception as err:
+                self.logger.error("Failed to run a commit callback : %s", err)
+
+
+def transactional():
+    """Runs every statement of a command in one transaction, committed if it succeeds."""
+
+    async def predicate(ctx: commands.Context["DebtBot"]) -> bool:
+        unit: Optional[UnitOfWork] = getattr(ctx, "unit_of_work", None)
+        if unit is not None:
+            unit.transactional = True
+        return True
+
+    return commands.check(predicate)
@@ -0,0 +1,171 @@
+import asyncio
+import logging
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Tuple
+
+from asyncpg import Record
+
+from services.unitofwork import UnitOfWork
+
+if TYPE_CHECKING:
+    from main import DebtBot
+
+
+Key = Tuple[int, int]
+
+
+class WriteBehind:
+    """
+    Coalesces balance changes per account and writes them in bulk.
+
+    Deltas added within the same interval for the same (userid, currencyid)
+    are merged, and every account touched is updated by a single statement.
+    Deltas being written stay visible until their write is done.
+
+    Attributes
+    ----------
+    interval : float
+        The amount of seconds between flushes.
+    last_merged : int
+        The amount of deltas merged during the last flush.
+    total_merged : int
+        The amount of deltas merged since startup.
+    total_flushes : int
+        The amount of flushes that wrote at least one account.
+    """
+
+    def __init__(self, bot: "DebtBot", interval: float) -> None:
+        self._bot = bot
+        self._pending: Dict[Key, List[int]] = {}
+        # The batches being written and when they are
+        self._flushing: List[Tuple[Dict[Key, List[int]], asyncio.Event]] = []
+        self._task: Optional[asyncio.Task] = None
+        self.logger = logging.getLogger("discord.writebehind")
+        self.interval = interval
+        self.last_merged = 0
+        self.total_merged = 0
+        self.total_flushes = 0
+
+    @property
+    def pending(self) -> int:
+        """Returns the number of accounts waiting to be written."""
+        return len(self._pending)
+
+    def add(self, userid: int, currencyid: int, amount: int, to_wallet: bool) -> None:
+        """
+        Queues a delta for an account.
+
+        Parameters
+        ----------
+        userid : int
+            The owner of the account.
+        currencyid : int
+            The currency of the account.
+        amount : int
+            The amount to add, if negative, it will be removed.
+        to_wallet : bool
+            Whether the delta applies to the wallet or the bank.
+        """
+        delta = self._pending.setdefault((userid, currencyid), [0, 0, 0])
+        delta[0 if to_wallet else 1] += amount
+        delta[2] += 1
+
+    def keys_of(self, currencyid: int) -> List[Key]:
+        """Returns the accounts of a currency waiting to be written or being written."""
+        batches = [self._pending, *(batch for batch, _ in self._flushing)]
+        return list({key for batch in batches for key in batch if key[1] == currencyid})
+
+    def get(self, userid: int, currencyid: int) -> Tuple[int, int]:
+        """Returns the (wallet, bank) delta of an account that is not written yet."""
+        wallet = bank = 0
+        for batch in [self._pending, *(batch for batch, _ in self._flushing)]:
+            if delta := batch.get((userid, currencyid)):
+                wallet += delta[0]
+                bank += delta[1]
+        return wallet, bank
+
+    def apply(self, record: Record) -> Dict:
+        """Returns a copy of a `banks` record with its pending delta applied."""
+        row = dict(record.items())
+        wallet, bank = self.get(row["userid"], row["currencyid"])
+        row["wallet"] += wallet
+        row["bank"] += bank
+        return row
+
+    async def flush(self, keys: Optional[Iterable[Key]] = None) -> int:
+        """
+        Writes the pending deltas to the storage.
+
+        Parameters
+        ----------
+        keys : Optional[Iterable[Tuple[int, int]]]
+            Only flush these accounts, defaults to every pending account.
+            Waits for the other flushes writing them, so they are up to date afterwards.
+
+        Returns
+        -------
+        int
+            The amount of deltas that were merged into this flush.
+        """
+        if keys is None:
+            batch, self._pending = self._pending, {}
+        else:
+            wanted = set(keys)
+            while writing := [
+                done for batch, done in self._flushing if not wanted.isdisjoint(batch)
+            ]:
+                await writing[0].wait()
+            batch = {k: self._pending.pop(k) for k in wanted if k in self._pending}
+
+        if not batch:
+            return 0
+
+        deltas = [(u, c, wallet, bank) for (u, c), (wallet, bank, _) in batch.items()]
+        merged = sum(count for _, _, count in batch.values())
+
+        flushing = (batch, asyncio.Event())
+        self._flushing.append(flushing)
+        try:
+            await self._bot.storage.apply_deltas(deltas)
+        except Exception:
+            # Put the deltas back so they are retried on the next flush
+            self._requeue(batch)
+            raise
+        finally:
+            self._flushing.remove(flushing)
+            flushing[1].set()
+        # Written in the command's transaction, they are lost if it rolls back
+        UnitOfWork.after_rollback(lambda: self._requeue(batch))
+
+        self.last_merged = merged
+        self.total_merged += merged
+        self.total_flushes += 1
+        self.logger.debug("Flushed %d deltas into %d accounts", merged, len(batch))
+        return merged
+
+    def _requeue(self, batch: Dict[Key, List[int]]) -> None:
+        """Merges deltas that could not be written back into the pending ones."""
+        for key, (wallet, bank, count) in batch.items():
+            delta = self._pending.setdefault(key, [0, 0, 0])
+            delta[0] += wallet
+            delta[1] += bank
+            delta[2] += count
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.flush()
+            except Exception as err:
+                self.logger.error("Failed to flush pending deltas : %s", err)
+
+    def start(self) -> None:
+        """Starts flushing in the background."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        """Stops the background flushes and writes everything that is left."""
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
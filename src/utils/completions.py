@@ -1,58 +1,82 @@
+import functools
 import re
-from typing import TYPE_CHECKING, List
+import time
+from typing import TYPE_CHECKING, Awaitable, Callable, List
 
 import discord
 from discord import app_commands
-from discord.ext.commands import Context
 
 if TYPE_CHECKING:
     from main import DebtBot
 
+Completion = Callable[
+    [discord.Interaction["DebtBot"], str], Awaitable[List[app_commands.Choice[str]]]
+]
 
+
+def timed(func: Completion) -> Completion:
+    """Records the latency of a completion, separately from the commands'."""
+
+    @functools.wraps(func)
+    async def wrapper(
+        interaction: discord.Interaction["DebtBot"], current: str
+    ) -> List[app_commands.Choice[str]]:
+        start = time.perf_counter()
+        try:
+            return await func(interaction, current)
+        finally:
+            interaction.client.cache.record_latency(time.perf_counter() - start)
+
+    return wrapper
+
+
+@timed
 async def user_currencies(
-    interaction: discord.Interaction["DebtBot"],
-    _: str,
+    interaction: discord.Interaction["DebtBot"], current: str
 ) -> List[app_commands.Choice[str]]:
-    ctx = await Context.from_interaction(interaction)
-    currencies = await interaction.client.cache.get_user_currencies(ctx)
+    index = await interaction.client.cache.get_user_index(interaction.user.id)
     return [
-        app_commands.Choice(name=currency.name, value=str(currency.id))
-        for currency in currencies
+        app_commands.Choice(name=record["name"], value=str(record["id"]))
+        for record in index.search(current)
     ]
 
 
+@timed
 async def guild_currencies(
     interaction: discord.Interaction["DebtBot"], current: str
 ) -> List[app_commands.Choice[str]]:
-    ctx = await Context.from_interaction(interaction)
-    currencies = await interaction.client.cache.get_guild_currencies(ctx)
+    index = await interaction.client.cache.get_guild_index(
+        (interaction.guild or interaction.user).id
+    )
     return [
-        app_commands.Choice(name=currency.name, value=str(currency.id))
-        for currency in currencies
-        if currency.name.lower().startswith(current.lower())
+        app_commands.Choice(name=record["name"], value=str(record["id"]))
+        for record in index.search(current)
     ]
 
 
+@timed
 async def currency_with_amount(
     interaction: discord.Interaction["DebtBot"], current: str
 ) -> List[app_commands.Choice[str]]:
-    ctx = await Context.from_interaction(interaction)
-    currencies = await interaction.client.cache.get_guild_currencies(ctx)
+    index = await interaction.client.cache.get_guild_index(
+        (interaction.guild or interaction.user).id
+    )
+    if len(index) == 0:
+        return []
 
-    match = re.match(r"([0-9,.]+) *([a-zA-Z ]+)?", current)
+    match = re.match(r"([0-9,.]+) *(.*)", current.strip())
     if not match:
+        record = index.records[0]
         return [
-            app_commands.Choice(
-                name=f"0 {currencies[0].name}", value=f"0 {currencies[0].name}"
-            )
+            app_commands.Choice(name=f"0 {record['name']}", value=f"0 {record['name']}")
         ]
 
     amount, query = match.groups()
+    amount = int(amount.replace(",", "").replace(".", "") or 0)
 
     return [
         app_commands.Choice(
-            name=f"{int(amount):,} {currency.name}", value=f"{amount} {currency.name}"
+            name=f"{amount:,} {record['name']}", value=f"{amount} {record['name']}"
         )
-        for currency in currencies
-        if not query or query.lower() in currency.name.lower() or query == currency.icon
+        for record in index.search(query)
     ]
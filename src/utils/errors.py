@@ -1,4 +1,5 @@
 import traceback
+from typing import List
 
 import discord
 from discord.ext import commands
@@ -18,6 +19,11 @@ class CurrencyNotFoundError(CommandError):
     pass
 
 
+class AmbiguousCurrencyError(CommandError):
+    def __init__(self, names: List[str]) -> None:
+        self.names = names
+
+
 class TooManyCurrenciesError(CommandError):
     def __init__(self, amount: int) -> None:
         self.amount = amount
@@ -48,6 +54,12 @@ async def global_error_handler(
             description="> Create it using `/currency create`",
             color=discord.Color.red(),
         )
+    elif isinstance(error, AmbiguousCurrencyError):
+        embed = discord.Embed(
+            title="Which currency ?",
+            description=f"> Could be any of `{'`, `'.join(error.names)}`",
+            color=discord.Color.red(),
+        )
     elif isinstance(error, NotEnoughMoneyError):
         embed = discord.Embed(
             title="You do not have enough money",
@@ -0,0 +1,92 @@
+import asyncio
+from typing import (
+    Awaitable,
+    Callable,
+    Dict,
+    Generic,
+    Hashable,
+    Iterable,
+    List,
+    Optional,
+    TypeVar,
+)
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class BatchLoader(Generic[K, V]):
+    """
+    Collects the keys requested during the same event loop iteration and resolves them with one call.
+
+    Concurrent requests for the same key share the same result. Requests
+    in different scopes are batched separately, each batch runs in the
+    context of the first request of its scope.
+
+    Attributes
+    ----------
+    batches : int
+        The amount of batches sent.
+    loaded : int
+        The amount of distinct keys resolved.
+    """
+
+    def __init__(
+        self,
+        batch: Callable[[List[K]], Awaitable[Dict[K, V]]],
+        scope: Callable[[], Hashable] = lambda: None,
+    ) -> None:
+        self._batch = batch
+        self._scope = scope
+        self._pending: Dict[Hashable, Dict[K, asyncio.Future[Optional[V]]]] = {}
+        self.batches = 0
+        self.loaded = 0
+
+    async def load(self, key: K) -> Optional[V]:
+        """
+        Loads a key.
+
+        Parameters
+        ----------
+        key : K
+            The key to load.
+
+        Returns
+        -------
+        Optional[V]
+            The value of the key, None if the batch did not return it.
+        """
+        scope = self._scope()
+        pending = self._pending.get(scope)
+        if pending is None:
+            pending = self._pending[scope] = {}
+            asyncio.get_running_loop().call_soon(self._dispatch, scope)
+
+        future = pending.get(key)
+        if future is None:
+            future = pending[key] = asyncio.get_running_loop().create_future()
+
+        # Shielded so one cancelled caller does not fail the others
+        return await asyncio.shield(future)
+
+    async def load_many(self, keys: Iterable[K]) -> List[Optional[V]]:
+        """Loads multiple keys in the same batch."""
+        return list(await asyncio.gather(*[self.load(key) for key in keys]))
+
+    def _dispatch(self, scope: Hashable) -> None:
+        asyncio.create_task(self._resolve(self._pending.pop(scope)))
+
+    async def _resolve(self, batch: Dict[K, asyncio.Future[Optional[V]]]) -> None:
+        self.batches += 1
+        self.loaded += len(batch)
+        try:
+            values = await self._batch(list(batch))
+        except Exception as err:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(err)
+            return
+
+        for key, future in batch.items():
+            if not future.done():
+                future.set_result(values.get(key))
@@ -0,0 +1,218 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import (
+    Awaitable,
+    Callable,
+    Dict,
+    Generic,
+    Hashable,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+    TypeVar,
+)
+
+from utils.utils import deep_sizeof
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class _Entry(NamedTuple):
+    value: object
+    expires_at: float
+    size: int
+
+
+class LRUCache(Generic[K, V]):
+    """
+    A bounded mapping that evicts the least recently used entries.
+
+    Any value is cached, including empty and None results, so known misses
+    do not reach the database again.
+
+    Attributes
+    ----------
+    maxsize : int
+        The maximum amount of entries.
+    ttl : Optional[float]
+        The amount of seconds before an entry expires, never if None.
+    max_bytes : Optional[int]
+        The maximum deep size of the entries, not tracked if None.
+    bytes : int
+        The deep size of the entries, if tracked.
+    hits : int
+        The amount of lookups that found an entry.
+    misses : int
+        The amount of lookups that did not.
+    evictions : int
+        The amount of entries dropped to stay under `maxsize` or `max_bytes`.
+    expirations : int
+        The amount of entries dropped because they expired.
+    """
+
+    def __init__(
+        self,
+        maxsize: int,
+        ttl: Optional[float] = None,
+        max_bytes: Optional[int] = None,
+    ) -> None:
+        self._data: OrderedDict[K, _Entry] = OrderedDict()
+        self._loading: Dict[K, asyncio.Future] = {}
+        # The loads made outside of get_or_load, by key
+        self._tokens: Dict[K, object] = {}
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: K) -> bool:
+        entry = self._data.get(key)
+        return entry is not None and entry.expires_at > time.monotonic()
+
+    @property
+    def hit_ratio(self) -> float:
+        """Returns the share of lookups that were hits."""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def _lookup(self, key: K) -> Optional[_Entry]:
+        entry = self._data.get(key)
+        if entry is not None and entry.expires_at <= time.monotonic():
+            self._drop(key)
+            self.expirations += 1
+            entry = None
+
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def _drop(self, key: K) -> None:
+        entry = self._data.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry.size
+
+    def get(self, key: K) -> Optional[V]:
+        """Returns the entry and marks it as recently used, or None."""
+        entry = self._lookup(key)
+        return entry.value if entry else None  # type: ignore
+
+    def put(self, key: K, value: V) -> None:
+        """Adds or replaces an entry, evicting the oldest ones if full, a load in flight will not overwrite it."""
+        self._drop(key)
+        self._loading.pop(key, None)
+        self._tokens.pop(key, None)
+        expires_at = time.monotonic() + self.ttl if self.ttl else float("inf")
+        size = deep_sizeof(value) if self.max_bytes is not None else 0
+
+        self._data[key] = _Entry(value, expires_at, size)
+        self.bytes += size
+        while len(self._data) > self.maxsize or (
+            self.max_bytes is not None
+            and self.bytes > self.max_bytes
+            and len(self._data) > 1
+        ):
+            _, evicted = self._data.popitem(last=False)
+            self.bytes -= evicted.size
+            self.evictions += 1
+
+    async def get_or_load(self, key: K, load: Callable[[], Awaitable[V]]) -> V:
+        """
+        Returns the entry or loads it, concurrent misses on the same key share a single load.
+
+        Parameters
+        ----------
+        key : K
+            The key of the entry.
+        load : Callable[[], Awaitable[V]]
+            Loads the value on a miss, its result is cached whatever it is.
+
+        Returns
+        -------
+        V
+            The cached or loaded value.
+        """
+        entry = self._lookup(key)
+        if entry is not None:
+            return entry.value  # type: ignore
+
+        future = self._loading.get(key)
+        if future is None:
+            future = self._loading[key] = asyncio.get_running_loop().create_future()
+            try:
+                value = await load()
+            except BaseException as err:
+                if isinstance(err, Exception):
+                    future.set_exception(err)
+                    # Retrieved here so waiter-less failures are not logged
+                    future.exception()
+                else:
+                    future.cancel()
+                raise
+            else:
+                # Skip caching if the key was invalidated while loading
+                if self._loading.get(key) is future:
+                    self.put(key, value)
+                future.set_result(value)
+            finally:
+                if self._loading.get(key) is future:
+                    del self._loading[key]
+            return value
+
+        return await asyncio.shield(future)
+
+    def begin_load(self, key: K) -> object:
+        """
+        Starts a load made outside of `get_or_load`, like a batch.
+
+        Like those of `get_or_load`, its value is not cached if the key is
+        put or invalidated before it ends.
+
+        Returns
+        -------
+        object
+            The token to end the load with.
+        """
+        token = self._tokens[key] = object()
+        return token
+
+    def end_load(self, key: K, token: object, value: Optional[V]) -> bool:
+        """Caches the value of a load started by `begin_load` unless it is stale, a None value only ends it."""
+        if self._tokens.get(key) is not token:
+            return False
+        del self._tokens[key]
+        if value is None:
+            return False
+        self.put(key, value)
+        return True
+
+    def items(self) -> List[Tuple[K, V]]:
+        """Returns the entries that have not expired, without marking them as used."""
+        now = time.monotonic()
+        return [(k, e.value) for k, e in self._data.items() if e.expires_at > now]  # type: ignore
+
+    def invalidate(self, key: K) -> None:
+        """Drops an entry, if present."""
+        self._drop(key)
+        self._loading.pop(key, None)
+        self._tokens.pop(key, None)
+
+    def clear(self) -> None:
+        """Drops every entry."""
+        self._data.clear()
+        self._loading.clear()
+        self._tokens.clear()
+        self.bytes = 0
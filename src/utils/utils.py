@@ -1,5 +1,7 @@
+import sys
 from math import log10, pow
-from typing import TYPE_CHECKING, Union
+from types import FunctionType, ModuleType
+from typing import TYPE_CHECKING, Any, Optional, Set, Union
 
 import discord
 from discord.ext import commands
@@ -11,11 +13,48 @@ if TYPE_CHECKING:
 def pretty_size(size: int) -> str:
     """Formats the size into a prettier format that uses numerical prefixes."""
     prefixes = ["", "k", "M", "G"]
-    power = int(log10(size) / 3)
+    power = min(int(log10(size) / 3), len(prefixes) - 1) if size > 0 else 0
     sized = size / pow(10, power * 3)
     return f"{sized:,.2f} {prefixes[power]}B"
 
 
+def deep_sizeof(obj: Any, seen: Optional[Set[int]] = None) -> int:
+    """
+    Returns the size of an object and everything it references, each object counted once.
+
+    Contexts, clients, modules, types and functions are not followed,
+    they are shared by the whole bot and would be counted for every entry.
+    """
+    if seen is None:
+        seen = set()
+
+    if id(obj) in seen or isinstance(
+        obj, (commands.Context, discord.Client, ModuleType, type, FunctionType)
+    ):
+        return 0
+    seen.add(id(obj))
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, (str, bytes, int, float, bool)) or obj is None:
+        return size
+
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(k, seen) + deep_sizeof(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_sizeof(item, seen) for item in obj)
+    elif hasattr(obj, "items") and callable(obj.items):
+        # Records and other mappings
+        size += sum(deep_sizeof(k, seen) + deep_sizeof(v, seen) for k, v in obj.items())
+
+    if hasattr(obj, "__dict__"):
+        size += deep_sizeof(vars(obj), seen)
+    for slot in getattr(type(obj), "__slots__", ()):
+        if hasattr(obj, slot):
+            size += deep_sizeof(getattr(obj, slot), seen)
+
+    return size
+
+
 def get_accent_color(user: Union[discord.User, discord.Member]) -> discord.Color:
     """
     Returns either the user's top role color, their accent color or white.
@@ -4,6 +4,7 @@ import discord
 from discord.ext import commands
 from discord.ui import Item
 
+import utils
 from services import Config, Currency
 from utils import errors
 
@@ -67,23 +68,32 @@ class DeleteCurrencyView(ManageCurrencyView):
         if self.currency.owner_id != interaction.user.id:
             raise commands.NotOwner("You do not own this currency")
 
-        async with self._ctx.bot.pool.acquire() as con:
-            await con.execute("DELETE FROM currencies WHERE id = $1;", self.currency.id)
-            await con.execute(
-                "DELETE FROM banks WHERE currencyid = $1;", self.currency.id
+        currency = self.currency
+        color = utils.get_accent_color(interaction.user)
+        await interaction.response.edit_message(
+            embed=discord.Embed(
+                title=f"Deleting ({currency.icon}) {currency.name}",
+                description="The currency is hidden, its accounts are being deleted.",
+                color=color,
+            ),
+            view=None,
+        )
+
+        async def progress(deleted: int, total: int, done: bool) -> None:
+            embed = discord.Embed(
+                title=f"{'Deleted' if done else 'Deleting'} ({currency.icon}) {currency.name}",
+                description=f"> {deleted}/{total} accounts deleted",
+                color=color,
             )
-            await con.execute(
-                "DELETE FROM transactions WHERE currencyid = $1;", self.currency.id
-            )
-            await con.execute(
-                "UPDATE guildconfigs SET currencies = array_remove(currencies, $1);",
-                self.currency.id,
-            )
-
-        await interaction.client.cache.sync(self._ctx, interaction.user)
-
-        if interaction.message:
-            await interaction.message.delete()
+            try:
+                await interaction.edit_original_response(embed=embed)
+            except discord.HTTPException:
+                # The message is gone or the interaction expired, the deletion goes on
+                pass
+
+        await interaction.client.deletion.delete(
+            currency.id, currency.owner_id, progress
+        )
 
     @discord.ui.button(label="No", style=discord.ButtonStyle.gray)
     async def no(
@@ -0,0 +1,37 @@
+import os
+import sys
+import types
+from unittest import mock
+
+import pytest
+
+# The bot runs from src, its modules import each other from there
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "src"))
+
+from services.account import Account  # noqa: E402
+from services.storage import MemoryStorage  # noqa: E402
+from services.writebehind import WriteBehind  # noqa: E402
+
+
+@pytest.fixture
+def bot(tmp_path):
+    """A bot with the memory storage and write-behind, its other services mocked."""
+    bot = types.SimpleNamespace(
+        storage=MemoryStorage(str(tmp_path / "state.json")),
+        leaderboards=mock.Mock(),
+        ledger=mock.Mock(),
+    )
+    bot.write_behind = WriteBehind(bot, interval=60)
+    return bot
+
+
+def make_account(bot, userid: int, currencyid: int) -> Account:
+    """Returns an account as a command would see it, it must be loaded."""
+    ctx = types.SimpleNamespace(bot=bot, guild=None, author=types.SimpleNamespace(id=1))
+    return Account(ctx, bot.storage._accounts[(userid, currencyid)])
+
+
+async def open_accounts(bot, keys) -> None:
+    """Creates currency 1 and loads the accounts."""
+    await bot.storage.create_currency("Coin", "🪙", 1)
+    await bot.storage.fetch_accounts(keys)
@@ -0,0 +1,68 @@
+import asyncio
+
+import pytest
+
+from conftest import make_account, open_accounts
+from utils.errors import CurrencyNotFoundError
+
+
+@pytest.fixture
+def deleted(bot):
+    """Two loaded accounts of a currency deleted and purged afterwards."""
+
+    async def setup():
+        await open_accounts(bot, [(1, 1), (2, 1)])
+        accounts = make_account(bot, 1, 1), make_account(bot, 2, 1)
+        await bot.storage.tombstone_currency(1)
+        while (await bot.storage.purge_currency(1, 100))[0] != "done":
+            pass
+        return accounts
+
+    return asyncio.run(setup())
+
+
+def test_spend_of_a_deleted_currency(bot, deleted):
+    with pytest.raises(CurrencyNotFoundError):
+        asyncio.run(deleted[0].spend(10))
+
+
+def test_transfer_of_a_deleted_currency(bot, deleted):
+    with pytest.raises(CurrencyNotFoundError):
+        asyncio.run(deleted[0].transfer_money(10, deleted[1]))
+
+
+def test_move_of_a_deleted_currency(bot, deleted):
+    with pytest.raises(CurrencyNotFoundError):
+        asyncio.run(deleted[0].transfer_money(10, to_wallet=False))
+
+
+def test_add_money_of_a_deleted_currency(bot, deleted):
+    bot.write_behind = None
+    with pytest.raises(CurrencyNotFoundError):
+        asyncio.run(deleted[0].add_money(10))
+
+
+def test_transfer_to_a_missing_account_debits_nothing(bot):
+    async def scenario():
+        await open_accounts(bot, [(1, 1)])
+        await bot.storage.add_money(1, 1, 50, True)
+        return await bot.storage.transfer(1, 2, 1, 10)
+
+    assert asyncio.run(scenario()) == (False, 50, None)
+    assert bot.storage._accounts[(1, 1)]["wallet"] == 50
+
+
+def test_spend_and_transfer(bot):
+    async def scenario():
+        await open_accounts(bot, [(1, 1), (2, 1)])
+        await bot.storage.add_money(1, 1, 50, True)
+        source, target = make_account(bot, 1, 1), make_account(bot, 2, 1)
+
+        assert await source.spend(20)
+        assert not await source.spend(40)
+        assert await source.transfer_money(30, target)
+        assert not await source.transfer_money(1, target)
+        assert (source.wallet, target.wallet) == (0, 30)
+
+    bot.write_behind = None
+    asyncio.run(scenario())
@@ -0,0 +1,33 @@
+from bench.run import change, report
+
+
+def test_change_without_a_baseline():
+    assert change(2.0, 1.0).strip() == "+100.0%"
+    assert change(0.0, 4.0).strip() == "-100.0%"
+    assert change(1.0, 0.0).strip() == "n/a"
+    assert change(None, 1.0).strip() == "n/a"
+    assert change(1.0, None).strip() == "n/a"
+
+
+def test_compare_with_skipped_operations(capsys):
+    results = {
+        "operations": {
+            "spend": {
+                "throughput": 10.0,
+                "p50": 1.0,
+                "p95": 2.0,
+                "p99": 3.0,
+                "errors": {},
+            },
+            "skipped": {"throughput": 0.0, "errors": {}},
+        }
+    }
+    previous = {
+        "commit": "abc1234",
+        "operations": {
+            "spend": {"throughput": 0.0, "p50": 0.0, "p95": 0.0, "p99": 0.0},
+            "skipped": {"throughput": 0.0},
+        },
+    }
+    report(results, previous)
+    assert "n/a" in capsys.readouterr().out
@@ -0,0 +1,30 @@
+import pytest
+
+from cluster import Supervisor, split_shards
+
+
+def test_shards_are_split_evenly():
+    assert split_shards(10, 3) == [[0, 1, 2, 3], [4, 5, 6], [7, 8, 9]]
+    assert split_shards(4, 2) == [[0, 1], [2, 3]]
+
+
+def test_never_more_workers_than_shards():
+    assert split_shards(2, 5) == [[0], [1]]
+    assert split_shards(3, 0) == [[0, 1, 2]]
+
+
+def test_every_shard_is_run_once():
+    ranges = split_shards(97, 8)
+    assert sorted(shard for shards in ranges for shard in shards) == list(range(97))
+    assert max(map(len, ranges)) - min(map(len, ranges)) <= 1
+
+
+def test_pools_stay_under_the_connection_limit():
+    supervisor = Supervisor(shard_count=16, workers=4, max_connections=100)
+    assert supervisor.pool_max == 23
+    assert supervisor.pool_max * 4 <= 100 - 5
+
+
+def test_too_many_workers_for_the_connections():
+    with pytest.raises(ValueError):
+        Supervisor(shard_count=16, workers=8, max_connections=20)
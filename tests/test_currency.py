@@ -0,0 +1,32 @@
+import asyncio
+import types
+
+from services.currency import Currency
+
+
+def test_batch_does_not_cache_a_currency_changed_meanwhile(monkeypatch):
+    fetched = asyncio.Event()
+    release = asyncio.Event()
+
+    async def fetch_currencies(ids):
+        fetched.set()
+        await release.wait()
+        return [{"id": id, "name": f"Coin {id}"} for id in ids]
+
+    bot = types.SimpleNamespace(
+        storage=types.SimpleNamespace(fetch_currencies=fetch_currencies)
+    )
+    monkeypatch.setattr(Currency, "cache", type(Currency.cache)(16))
+
+    async def scenario():
+        batch = asyncio.create_task(Currency.fetch_records(bot, [1, 2]))
+        await fetched.wait()
+        # Deleted by another process while the batch was querying
+        Currency.invalidate(1)
+        release.set()
+        return await batch
+
+    found = asyncio.run(scenario())
+    assert set(found) == {1, 2}
+    assert Currency.cache.get(1) is None
+    assert Currency.cache.get(2) == {"id": 2, "name": "Coin 2"}
@@ -0,0 +1,105 @@
+import asyncio
+import types
+from unittest import mock
+
+import pytest
+from discord.ext.commands import BadArgument
+
+from services.leaderboard import Board, Leaderboards
+
+
+def test_board_keeps_the_top_accounts():
+    board = Board(3, [(1, 10), (2, 30), (3, 20)])
+    assert not board.exhaustive
+    assert board.entries == [(2, 30), (3, 20), (1, 10)]
+
+    board.update(4, 25)
+    assert board.entries == [(2, 30), (4, 25), (3, 20)]
+
+    # Below the tail of a partial board, it may not be the next one
+    board.update(5, 1)
+    assert board.entries == [(2, 30), (4, 25), (3, 20)]
+
+    board.update(2, 5)
+    assert board.entries == [(4, 25), (3, 20)]
+
+
+def test_exhaustive_board_takes_everyone():
+    board = Board(5, [(1, 10)])
+    assert board.exhaustive
+
+    board.update(2, 0)
+    board.update(1, 3)
+    assert board.entries == [(1, 3), (2, 0)]
+
+
+def test_ties_are_ordered_by_userid():
+    board = Board(5, [(3, 10), (1, 10), (2, 20)])
+    assert board.entries == [(2, 20), (1, 10), (3, 10)]
+
+
+@pytest.fixture
+def leaderboards(bot):
+    async def setup():
+        await bot.storage.create_currency("Coin", "🪙", 1)
+        keys = [(userid, 1) for userid in range(1, 101)]
+        await bot.storage.fetch_accounts(keys)
+        for userid, _ in keys:
+            await bot.storage.add_money(userid, 1, userid * 10, True)
+
+    asyncio.run(setup())
+    bot.write_behind = None
+    return Leaderboards(bot, size=20, max_pages=8)
+
+
+def test_pages_past_the_board_follow_the_last_one(bot, leaderboards):
+    top_accounts = mock.AsyncMock(wraps=bot.storage.top_accounts)
+    bot.storage.top_accounts = top_accounts
+
+    async def scenario():
+        return [await leaderboards.get_page(1, page) for page in range(5)]
+
+    pages = asyncio.run(scenario())
+    assert [userid for page in pages for userid, _ in page] == list(range(100, 50, -1))
+    # Built once, then every page starts where the previous one stopped
+    offsets = [call.kwargs.get("offset", 0) for call in top_accounts.call_args_list]
+    assert offsets == [0] * 4
+
+
+def test_deep_page_skips_from_the_closest_page(bot, leaderboards):
+    top_accounts = mock.AsyncMock(wraps=bot.storage.top_accounts)
+    bot.storage.top_accounts = top_accounts
+
+    page = asyncio.run(leaderboards.get_page(1, 4))
+    assert [userid for userid, _ in page] == list(range(60, 50, -1))
+    assert top_accounts.call_args_list[-1].kwargs["offset"] == 20
+
+    with pytest.raises(BadArgument):
+        asyncio.run(leaderboards.get_page(1, 8))
+
+
+def test_changes_during_a_rebuild_are_replayed(bot):
+    release = asyncio.Event()
+
+    async def top_accounts(currencyid, limit, offset=0, after=None):
+        await release.wait()
+        return [(1, 10)]
+
+    bot.write_behind = None
+    bot.storage = types.SimpleNamespace(
+        top_accounts=mock.AsyncMock(side_effect=top_accounts)
+    )
+    leaderboards = Leaderboards(bot, size=10)
+
+    async def scenario():
+        first = asyncio.create_task(leaderboards.get(1))
+        second = asyncio.create_task(leaderboards.get(1))
+        await asyncio.sleep(0)
+        leaderboards.update(1, 2, 50)
+        release.set()
+        return await first, await second
+
+    first, second = asyncio.run(scenario())
+    assert first is second
+    assert first.entries == [(2, 50), (1, 10)]
+    assert bot.storage.top_accounts.await_count == 1
@@ -0,0 +1,84 @@
+import asyncio
+
+import pytest
+
+from utils.loader import BatchLoader
+
+
+def test_keys_of_one_iteration_share_a_batch():
+    batches = []
+
+    async def batch(keys):
+        batches.append(sorted(keys))
+        return {key: key * 2 for key in keys if key != 3}
+
+    async def scenario():
+        loader = BatchLoader(batch)
+        results = await asyncio.gather(
+            loader.load(1), loader.load(2), loader.load(1), loader.load(3)
+        )
+        again = await loader.load_many([4, 5])
+        return loader, results, again
+
+    loader, results, again = asyncio.run(scenario())
+    assert results == [2, 4, 2, None]
+    assert again == [8, 10]
+    assert batches == [[1, 2, 3], [4, 5]]
+    assert (loader.batches, loader.loaded) == (2, 5)
+
+
+def test_scopes_are_batched_apart():
+    batches = []
+    scope = {"current": None}
+
+    async def batch(keys):
+        batches.append((scope["current"], sorted(keys)))
+        return {key: key for key in keys}
+
+    async def load_in(loader, name, key):
+        scope["current"] = name
+        return await loader.load(key)
+
+    async def scenario():
+        loader = BatchLoader(batch, scope=lambda: scope["current"])
+        # Each task runs its batch in the scope it was requested from
+        tasks = [
+            asyncio.create_task(load_in(loader, name, key))
+            for name, key in (("a", 1), ("b", 2), ("a", 3))
+        ]
+        return await asyncio.gather(*tasks)
+
+    assert asyncio.run(scenario()) == [1, 2, 3]
+    assert sorted(keys for _, keys in batches) == [[1, 3], [2]]
+
+
+def test_failed_batch_fails_every_key():
+    async def batch(keys):
+        raise OSError("down")
+
+    async def scenario():
+        loader = BatchLoader(batch)
+        return await asyncio.gather(
+            loader.load(1), loader.load(2), return_exceptions=True
+        )
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(result, OSError) for result in results)
+
+
+def test_cancelled_caller_does_not_fail_the_others():
+    async def batch(keys):
+        await asyncio.sleep(0.01)
+        return {key: key for key in keys}
+
+    async def scenario():
+        loader = BatchLoader(batch)
+        cancelled = asyncio.create_task(loader.load(1))
+        kept = asyncio.create_task(loader.load(1))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await cancelled
+        return await kept
+
+    assert asyncio.run(scenario()) == 1
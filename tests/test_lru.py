@@ -0,0 +1,169 @@
+import asyncio
+
+import pytest
+
+from utils import lru
+from utils.lru import LRUCache
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(lru.time, "monotonic", clock)
+    return clock
+
+
+def test_least_recently_used_is_evicted():
+    cache = LRUCache(2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+
+    assert "b" not in cache
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.evictions == 1
+
+
+def test_misses_are_cached_too():
+    cache = LRUCache(2)
+    cache.put("a", None)
+    assert "a" in cache
+    assert "b" not in cache
+
+
+def test_entries_expire(clock):
+    cache = LRUCache(2, ttl=10)
+    cache.put("a", 1)
+    clock.now += 9
+    assert cache.get("a") == 1
+
+    clock.now += 2
+    assert cache.get("a") is None
+    assert cache.expirations == 1
+    assert len(cache) == 0
+
+
+def test_byte_budget():
+    cache = LRUCache(100, max_bytes=1)
+    cache.put("a", "x" * 100)
+    # An entry larger than the budget is still kept on its own
+    assert cache.get("a") is not None
+
+    cache.put("b", "y" * 100)
+    assert "a" not in cache
+    assert cache.get("b") is not None
+    assert cache.bytes > 0
+
+    cache.invalidate("b")
+    assert cache.bytes == 0
+
+
+def test_hit_ratio():
+    cache = LRUCache(2)
+    cache.put("a", 1)
+    cache.get("a")
+    cache.get("b")
+    assert cache.hit_ratio == 0.5
+
+
+def test_concurrent_misses_share_one_load():
+    calls = []
+
+    async def load():
+        calls.append(1)
+        await asyncio.sleep(0)
+        return "value"
+
+    async def scenario():
+        cache = LRUCache(2)
+        results = await asyncio.gather(
+            *[cache.get_or_load("a", load) for _ in range(5)]
+        )
+        return cache, results
+
+    cache, results = asyncio.run(scenario())
+    assert results == ["value"] * 5
+    assert len(calls) == 1
+    assert cache.get("a") == "value"
+
+
+def test_failed_load_reaches_every_waiter():
+    async def load():
+        await asyncio.sleep(0)
+        raise OSError("down")
+
+    async def scenario():
+        cache = LRUCache(2)
+        results = await asyncio.gather(
+            *[cache.get_or_load("a", load) for _ in range(3)], return_exceptions=True
+        )
+        return cache, results
+
+    cache, results = asyncio.run(scenario())
+    assert all(isinstance(result, OSError) for result in results)
+    assert "a" not in cache
+
+
+def test_load_invalidated_meanwhile_is_not_cached():
+    async def scenario():
+        cache = LRUCache(2)
+        release = asyncio.Event()
+
+        async def load():
+            await release.wait()
+            return "stale"
+
+        loading = asyncio.create_task(cache.get_or_load("a", load))
+        await asyncio.sleep(0)
+        cache.invalidate("a")
+        release.set()
+        return cache, await loading
+
+    cache, value = asyncio.run(scenario())
+    assert value == "stale"
+    assert "a" not in cache
+
+
+def test_put_wins_over_a_load_in_flight():
+    async def scenario():
+        cache = LRUCache(2)
+        release = asyncio.Event()
+
+        async def load():
+            await release.wait()
+            return "stale"
+
+        loading = asyncio.create_task(cache.get_or_load("a", load))
+        await asyncio.sleep(0)
+        cache.put("a", "fresh")
+        release.set()
+        await loading
+        return cache
+
+    assert asyncio.run(scenario()).get("a") == "fresh"
+
+
+def test_outside_loads_are_checked_the_same_way():
+    cache = LRUCache(4)
+    a, b, c = cache.begin_load("a"), cache.begin_load("b"), cache.begin_load("c")
+    cache.invalidate("a")
+
+    assert not cache.end_load("a", a, 1)
+    assert cache.end_load("b", b, 2)
+    # Nothing to cache, the load only ends
+    assert not cache.end_load("c", c, None)
+    assert "a" not in cache and cache.get("b") == 2 and "c" not in cache
+
+    # A newer load of the same key makes the older one stale
+    old, new = cache.begin_load("d"), cache.begin_load("d")
+    assert not cache.end_load("d", old, "old")
+    assert cache.end_load("d", new, "new")
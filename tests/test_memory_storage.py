@@ -0,0 +1,129 @@
+import asyncio
+
+import pytest
+
+from services.storage import MemoryStorage
+
+
+@pytest.fixture
+def storage(tmp_path):
+    return MemoryStorage(str(tmp_path / "state.json"))
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_currencies(storage):
+    gold = run(storage.create_currency("Gold", "🪙", owner=1))
+    silver = run(storage.create_currency("Silver", "🥈", owner=1))
+
+    assert run(storage.fetch_currencies([silver["id"], 99]))[0]["name"] == "Silver"
+    assert [c["id"] for c in run(storage.latest_currencies(1))] == [silver["id"]]
+    assert len(run(storage.fetch_user_currencies(1))) == 2
+
+    run(storage.tombstone_currency(gold["id"]))
+    assert run(storage.fetch_currencies([gold["id"]])) == []
+    assert run(storage.tombstoned_currencies()) == [gold["id"]]
+    assert [c["id"] for c in run(storage.list_currencies())] == [silver["id"]]
+
+
+def test_configs(storage):
+    assert run(storage.add_guild_currency(1, 10)) == [10]
+    assert run(storage.add_guild_currency(1, 11)) == [10, 11]
+    assert run(storage.add_guild_currency(1, 10)) == [10, 11]
+    assert run(storage.remove_guild_currency(1, 10)) == [11]
+    assert run(storage.fetch_config(1)) == [11]
+    assert run(storage.fetch_config(2)) == []
+
+
+def test_accounts_are_opened_on_first_load(storage):
+    id = run(storage.create_currency("Gold", "🪙", owner=1))["id"]
+    accounts = run(storage.fetch_accounts([(1, id), (2, id), (1, 99)]))
+
+    assert set(accounts) == {(1, id), (2, id)}
+    assert accounts[(1, id)]["wallet"] == 0
+    assert run(storage.currency_stats(id)) == (2, 0, None)
+
+
+def test_balance_changes_keep_the_supply(storage):
+    id = run(storage.create_currency("Gold", "🪙", owner=1))["id"]
+    run(storage.fetch_accounts([(1, id), (2, id)]))
+
+    assert run(storage.add_money(1, id, 100, True))["wallet"] == 100
+    run(storage.apply_deltas([(1, id, 5, 10), (2, id, 1, 0), (3, id, 7, 7)]))
+    assert run(storage.spend(1, id, 50)) == (True, 55)
+    assert run(storage.spend(1, id, 500)) == (False, 55)
+    assert run(storage.transfer(1, 2, id, 25)) == (True, 30, 26)
+    moved, account = run(storage.move(1, id, 10, False))
+    assert moved and (account["wallet"], account["bank"]) == (20, 20)
+
+    assert run(storage.currency_stats(id)) == (2, 66, None)
+
+
+def test_top_accounts(storage):
+    id = run(storage.create_currency("Gold", "🪙", owner=1))["id"]
+    run(storage.fetch_accounts([(userid, id) for userid in range(1, 6)]))
+    for userid, wallet in ((1, 10), (2, 30), (3, 20), (4, 20), (5, 0)):
+        run(storage.add_money(userid, id, wallet, True))
+
+    assert run(storage.top_accounts(id, 3)) == [(2, 30), (3, 20), (4, 20)]
+    assert run(storage.top_accounts(id, 2, offset=1)) == [(3, 20), (4, 20)]
+    assert run(storage.top_accounts(id, 2, after=(20, 3))) == [(4, 20), (1, 10)]
+
+
+def test_purge_goes_in_batches(storage):
+    id = run(storage.create_currency("Gold", "🪙", owner=1))["id"]
+    run(storage.fetch_accounts([(userid, id) for userid in range(5)]))
+    run(
+        storage.insert_transactions(
+            ("userid", "currencyid", "amount"), [(1, id, 5), (2, id + 1, 5)]
+        )
+    )
+    run(storage.tombstone_currency(id))
+
+    steps = []
+    while (step := run(storage.purge_currency(id, 2)))[0] != "done":
+        steps.append(step)
+    assert steps == [
+        ("accounts", 2),
+        ("accounts", 2),
+        ("accounts", 1),
+        ("transactions", 1),
+    ]
+    assert run(storage.currency_stats(id)) is None
+    assert len(storage._transactions) == 1
+
+
+def test_state_survives_a_restart(tmp_path):
+    path = str(tmp_path / "state.json")
+
+    async def first():
+        storage = MemoryStorage(path)
+        await storage.start()
+        id = (await storage.create_currency("Gold", "🪙", owner=1))["id"]
+        await storage.add_guild_currency(1, id)
+        await storage.fetch_accounts([(1, id)])
+        await storage.add_money(1, id, 42, True)
+        await storage.close()
+        return id
+
+    async def second(id):
+        storage = MemoryStorage(path)
+        await storage.start()
+        try:
+            return (
+                await storage.fetch_currencies([id]),
+                await storage.fetch_config(1),
+                await storage.fetch_accounts([(1, id)]),
+                await storage.currency_stats(id),
+            )
+        finally:
+            await storage.close()
+
+    id = run(first())
+    currencies, config, accounts, stats = run(second(id))
+    assert currencies[0]["name"] == "Gold"
+    assert config == [id]
+    assert accounts[(1, id)]["wallet"] == 42
+    assert stats == (1, 42, None)
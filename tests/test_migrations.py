@@ -0,0 +1,69 @@
+import asyncio
+import contextlib
+import logging
+
+import pytest
+
+from services import migrations
+
+
+def test_migrations_are_sorted(tmp_path):
+    (tmp_path / "0010_b.sql").write_text("SELECT 2;")
+    (tmp_path / "0002_a.sql").write_text("SELECT 1;")
+
+    loaded = migrations.load(tmp_path)
+    assert [(m.version, m.name, m.sql) for m in loaded] == [
+        (2, "a", "SELECT 1;"),
+        (10, "b", "SELECT 2;"),
+    ]
+
+
+def test_invalid_file_names(tmp_path):
+    (tmp_path / "first.sql").write_text("")
+    with pytest.raises(ValueError):
+        migrations.load(tmp_path)
+
+
+def test_duplicate_versions(tmp_path):
+    (tmp_path / "0001_a.sql").write_text("")
+    (tmp_path / "001_b.sql").write_text("")
+    with pytest.raises(ValueError):
+        migrations.load(tmp_path)
+
+
+def test_shipped_migrations_follow_each_other():
+    versions = [m.version for m in migrations.load()]
+    assert versions == list(range(1, len(versions) + 1))
+
+
+class FakeConnection:
+    def __init__(self, applied):
+        self.applied = applied
+        self.executed = []
+        self.transactions = 0
+
+    async def execute(self, sql, *args):
+        self.executed.append((sql, args))
+
+    async def fetch(self, sql):
+        return [{"version": version} for version in self.applied]
+
+    @contextlib.asynccontextmanager
+    async def transaction(self):
+        self.transactions += 1
+        yield
+
+
+def test_only_missing_migrations_are_applied():
+    shipped = migrations.load()
+    con = FakeConnection(applied=[m.version for m in shipped[:-2]])
+
+    applied = asyncio.run(migrations.migrate(con, logging.getLogger("test")))
+    assert applied == shipped[-2:]
+    assert con.transactions == 2
+
+    statements = [sql for sql, _ in con.executed]
+    assert statements[0] == "SELECT pg_advisory_lock($1);"
+    assert statements[-1] == "SELECT pg_advisory_unlock($1);"
+    for migration in applied:
+        assert migration.sql in statements
@@ -0,0 +1,89 @@
+import pytest
+
+from services.resolver import CurrencyResolver
+from utils.errors import (
+    AmbiguousCurrencyError,
+    CurrencyNotFoundError,
+    NoCurrenciesError,
+)
+from utils.lru import LRUCache
+
+
+def currency(id, name, icon=""):
+    return {"id": id, "name": name, "icon": icon}
+
+
+@pytest.fixture
+def resolver():
+    return CurrencyResolver(
+        [
+            currency(1, "Gold Coin", "🪙"),
+            currency(2, "Diamonds", "<:diamond:123456789012345678>"),
+            currency(3, "Star", "⭐️"),
+            currency(4, "Ruby"),
+        ]
+    )
+
+
+def test_icons(resolver):
+    assert resolver.resolve("🪙")["id"] == 1
+    assert resolver.resolve(" <:diamond:123456789012345678> ")["id"] == 2
+    # Sent without its variation selector
+    assert resolver.resolve("⭐")["id"] == 3
+
+
+def test_names_are_normalized(resolver):
+    assert resolver.resolve("gold   COIN")["id"] == 1
+    assert resolver.resolve("ruby")["id"] == 4
+
+
+def test_aliases(resolver):
+    assert resolver.resolve("gold coins")["id"] == 1
+    assert resolver.resolve("goldcoin")["id"] == 1
+    assert resolver.resolve("diamond")["id"] == 2
+    assert resolver.resolve("stars")["id"] == 3
+
+
+def test_fuzzy_names(resolver):
+    assert resolver.resolve("diamondss")["id"] == 2
+
+    with pytest.raises(CurrencyNotFoundError):
+        resolver.resolve("emerald")
+
+
+def test_exact_names_win_over_aliases():
+    resolver = CurrencyResolver([currency(1, "Coins"), currency(2, "Coin")])
+    assert resolver.resolve("coin")["id"] == 2
+    assert resolver.resolve("coins")["id"] == 1
+
+
+def test_ambiguous_aliases():
+    # The plural of one is the other without its space
+    resolver = CurrencyResolver([currency(1, "Coin"), currency(2, "Co ins")])
+    with pytest.raises(AmbiguousCurrencyError) as error:
+        resolver.resolve("coins")
+    assert error.value.names == ["Coin", "Co ins"]
+
+
+def test_ambiguous_fuzzy_matches():
+    resolver = CurrencyResolver(
+        [currency(1, "abcdefghij1"), currency(2, "abcdefghij2")]
+    )
+    with pytest.raises(AmbiguousCurrencyError):
+        resolver.resolve("abcdefghij")
+
+
+def test_no_currencies():
+    with pytest.raises(NoCurrenciesError):
+        CurrencyResolver([]).resolve("gold")
+
+
+def test_invalidated_by_currency(monkeypatch):
+    monkeypatch.setattr(CurrencyResolver, "cache", LRUCache(8))
+    resolver = CurrencyResolver([currency(1, "Gold")])
+    CurrencyResolver.cache.put(10, resolver)
+    CurrencyResolver.cache.put(11, CurrencyResolver([currency(2, "Silver")]))
+
+    CurrencyResolver.invalidate_currency(1)
+    assert 10 not in CurrencyResolver.cache
+    assert 11 in CurrencyResolver.cache
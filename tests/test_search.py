@@ -0,0 +1,50 @@
+from services.search import TrigramIndex, trigrams
+
+
+def test_trigrams_are_padded_like_pg_trgm():
+    assert trigrams("Cat") == {"  c", " ca", "cat", "at "}
+    assert trigrams("a-b") == {"  a", " a ", "  b", " b "}
+    assert trigrams("!!") == frozenset()
+
+
+def make_index():
+    index = TrigramIndex()
+    index.add(1, "Gold coins", "🪙")
+    index.add(2, "Golden tickets", "🎫")
+    index.add(3, "Silver", "🥈")
+    index.add(4, "Bold", "🪙")
+    return index
+
+
+def test_icons_come_first():
+    assert make_index().search("🪙") == [4, 1]
+
+
+def test_names_containing_the_query_before_similar_ones():
+    # The whole word first, then the name only starting with it, then similar ones
+    assert make_index().search("gold") == [1, 2, 4]
+
+
+def test_similar_names_are_found():
+    assert make_index().search("silvr") == [3]
+
+
+def test_short_queries_match_inside_names():
+    # "ld" shares no trigram with the middle of the names
+    assert sorted(make_index().search("ld")) == [1, 2, 4]
+
+
+def test_limit():
+    assert len(make_index().search("o", limit=2)) == 2
+
+
+def test_removed_and_replaced_currencies():
+    index = make_index()
+    index.remove(1)
+    index.add(2, "Copper", "🟤")
+    index.remove(99)
+
+    assert len(index) == 3
+    assert index.search("gold") == [4]
+    assert index.search("🪙") == [4]
+    assert index.search("copper") == [2]
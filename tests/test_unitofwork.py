@@ -0,0 +1,69 @@
+import asyncio
+
+from services.unitofwork import UnitOfWork, _current
+
+
+class FakePool:
+    def __init__(self) -> None:
+        self.acquired = 0
+        self.released = 0
+
+    async def acquire(self):
+        self.acquired += 1
+        return object()
+
+    async def release(self, con) -> None:
+        self.released += 1
+
+
+def test_statements_share_one_connection():
+    async def scenario():
+        pool = FakePool()
+        unit = UnitOfWork(pool)
+        for _ in range(3):
+            async with unit._use():
+                pass
+        await unit.finish(failed=False)
+        return pool
+
+    pool = asyncio.run(scenario())
+    assert (pool.acquired, pool.released) == (1, 1)
+
+
+def test_idle_connection_goes_back_to_the_pool():
+    async def scenario():
+        pool = FakePool()
+        unit = UnitOfWork(pool)
+        async with unit._use():
+            pass
+
+        # A reply to discord, nothing runs on the connection meanwhile
+        await asyncio.sleep(unit.idle_timeout * 3)
+        assert (pool.acquired, pool.released) == (1, 1)
+
+        async with unit._use():
+            pass
+        await unit.finish(failed=False)
+        return pool
+
+    pool = asyncio.run(scenario())
+    assert (pool.acquired, pool.released) == (2, 2)
+
+
+def test_after_commit_runs_once_committed():
+    async def scenario():
+        unit = UnitOfWork(FakePool())
+        unit.transactional = True
+        ran = []
+
+        async def command():
+            _current.set(unit)
+            UnitOfWork.after_commit(lambda: ran.append("commit"))
+            UnitOfWork.after_rollback(lambda: ran.append("rollback"))
+            assert ran == []
+
+        await asyncio.create_task(command())
+        await unit.finish(failed=False)
+        return ran
+
+    assert asyncio.run(scenario()) == ["commit"]
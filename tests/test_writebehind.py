@@ -0,0 +1,90 @@
+import asyncio
+from unittest import mock
+
+import pytest
+
+from conftest import make_account, open_accounts
+
+
+def test_deltas_are_merged_per_account(bot):
+    async def scenario():
+        await open_accounts(bot, [(1, 1), (2, 1)])
+        bot.write_behind.add(1, 1, 10, True)
+        bot.write_behind.add(1, 1, 5, False)
+        bot.write_behind.add(1, 1, -3, True)
+        bot.write_behind.add(2, 1, 7, True)
+
+        assert bot.write_behind.pending == 2
+        assert bot.write_behind.get(1, 1) == (7, 5)
+        assert await bot.write_behind.flush() == 4
+        assert bot.write_behind.pending == 0
+        assert bot.storage._accounts[(1, 1)]["wallet"] == 7
+        assert bot.storage._accounts[(1, 1)]["bank"] == 5
+        assert bot.storage._accounts[(2, 1)]["wallet"] == 7
+
+    asyncio.run(scenario())
+
+
+def test_keyed_flush_only_writes_its_accounts(bot):
+    async def scenario():
+        await open_accounts(bot, [(1, 1), (2, 1)])
+        bot.write_behind.add(1, 1, 10, True)
+        bot.write_behind.add(2, 1, 20, True)
+
+        assert await bot.write_behind.flush([(1, 1)]) == 1
+        assert bot.storage._accounts[(1, 1)]["wallet"] == 10
+        assert bot.storage._accounts[(2, 1)]["wallet"] == 0
+        assert bot.write_behind.get(2, 1) == (20, 0)
+
+    asyncio.run(scenario())
+
+
+def test_failed_flush_is_requeued(bot):
+    async def scenario():
+        await open_accounts(bot, [(1, 1)])
+        bot.write_behind.add(1, 1, 10, True)
+        bot.storage.apply_deltas = mock.AsyncMock(side_effect=OSError("down"))
+
+        with pytest.raises(OSError):
+            await bot.write_behind.flush()
+
+        bot.write_behind.add(1, 1, 5, True)
+        assert bot.write_behind.get(1, 1) == (15, 0)
+
+    asyncio.run(scenario())
+
+
+def test_spend_waits_for_a_background_flush(bot):
+    async def scenario():
+        await open_accounts(bot, [(1, 1)])
+        account = make_account(bot, 1, 1)
+        bot.write_behind.add(1, 1, 100, True)
+
+        # Holds the background flush in the middle of its write
+        release = asyncio.Event()
+        apply_deltas = bot.storage.apply_deltas
+
+        async def slow_apply(deltas):
+            await release.wait()
+            await apply_deltas(deltas)
+
+        bot.storage.apply_deltas = slow_apply
+        background = asyncio.create_task(bot.write_behind.flush())
+        await asyncio.sleep(0)
+        assert bot.write_behind.pending == 0
+
+        # Still part of the balance while it is written
+        assert bot.write_behind.get(1, 1) == (100, 0)
+        assert bot.write_behind.keys_of(1) == [(1, 1)]
+
+        spending = asyncio.create_task(account.spend(60))
+        await asyncio.sleep(0)
+        assert not spending.done()
+
+        release.set()
+        assert await background == 1
+        assert await spending
+        assert account.wallet == 40
+        assert bot.write_behind.get(1, 1) == (0, 0)
+
+    asyncio.run(scenario())